@@ -22,6 +22,20 @@ This lab visualizes the impact of covariance uncertainty on portfolio risk. It a
 
 page = st.sidebar.selectbox(label="Navigation", options=["Worst-Case Risk Analysis", "Sensitivity Analysis"])
 
+from definitions import definitions
+from definitions.definitions import (
+    cached_efficient_frontier, cached_min_variance_portfolio, cached_robust_portfolio, cached_sample_portfolio_risks,
+    cached_worst_case_curve, cached_worst_case_risk, configure_solver_pool, tracer,
+)
+# One solver pool per server process, shared by every session; SOLVER_POOL_WORKERS=0 solves inline.
+if definitions.solver_pool is None:
+    configure_solver_pool()
+show_timings = st.sidebar.checkbox("Show timings", key="show_timings")
+if show_timings:
+    tracer.enable()
+else:
+    tracer.disable()
+
 if page == "Worst-Case Risk Analysis":
     from application_pages.page1 import run_page1
     run_page1()
@@ -29,6 +43,30 @@ elif page == "Sensitivity Analysis":
     from application_pages.page2 import run_page2
     run_page2()
 
+if show_timings:
+    st.sidebar.subheader("Timings")
+    st.sidebar.dataframe(tracer.summary().round(2), hide_index=True)
+    st.sidebar.download_button("Download timings (JSONL)", tracer.export_jsonl(), file_name="timings.jsonl", mime="application/jsonl")
+    tracer.disable()
+
+# The content caches are shared by every session of this process; the stage counts are this session's.
+cache_info = cached_min_variance_portfolio.cache_info()
+st.sidebar.caption(f"Nominal solve cache: {cache_info.hits} hits, {cache_info.misses} misses ({cache_info.currsize}/{cache_info.maxsize} entries)")
+shared = [cached.cache_info() for cached in (cached_worst_case_risk, cached_worst_case_curve, cached_robust_portfolio,
+                                             cached_efficient_frontier, cached_sample_portfolio_risks)]
+st.sidebar.caption(f"Other shared caches: {sum(info.hits for info in shared)} hits, {sum(info.misses for info in shared)} misses")
+pipeline = st.session_state.get("analysis_pipeline")
+if pipeline is not None:
+    st.sidebar.caption(f"Analysis stages: {pipeline.stats['computed']} computed, {pipeline.stats['reused']} reused")
+if definitions.solver_pool is not None:
+    pool_metrics = definitions.solver_pool.metrics()
+    latency = "n/a" if pool_metrics["latency_p99"] is None else f"{pool_metrics['latency_p99']:.2f}s"
+    st.sidebar.caption(f"Solver pool: {pool_metrics['queue_depth']}/{pool_metrics['max_queue']} queued, "
+                       f"{pool_metrics['deduplicated']} deduplicated, {pool_metrics['timeouts'] + pool_metrics['rejected']} timed out, p99 latency {latency}")
+if definitions.result_store is not None:
+    store_stats = definitions.result_store.stats
+    st.sidebar.caption(f"Result store: {store_stats['hits']} hits, {store_stats['misses']} misses, {store_stats['writes']} writes")
+
 st.divider()
 st.write("© 2025 QuantUniversity. All Rights Reserved.")
 st.caption("This demonstration is solely for educational use and illustration. Any reproduction requires prior written consent from QuantUniversity.")
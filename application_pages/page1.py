@@ -1,9 +1,13 @@
 
 import streamlit as st
 import numpy as np
-import cvxpy as cp
 import plotly.express as px
 
+from definitions.definitions import calculate_portfolio_risk, tracer, visualize_risk_distribution
+from application_pages.pipeline import session_pipeline, submit_stage
+from application_pages.progressive import show_progressive
+
+@tracer.traced("page1")
 def run_page1():
     st.header("Worst-Case Risk Analysis")
     
@@ -18,29 +22,37 @@ def run_page1():
     """
     )
     
-    np.random.seed(2)
     n = 5  # number of assets
-    mu = np.abs(np.random.randn(n, 1)) / 15
-    Sigma_rand = np.random.uniform(-0.15, 0.8, size=(n, n))
-    Sigma_nom = Sigma_rand.T @ Sigma_rand
+    # Stages shared with the sensitivity page; a changed input recomputes only the stages downstream of it.
+    pipeline = session_pipeline(n=n, seed=2)
+    mu, Sigma_nom = pipeline.get("mu"), pipeline.get("Sigma_nom")
     
     st.subheader("Nominal Covariance Matrix")
     st.write("Sigma_nom:")
     st.write(np.round(Sigma_nom, 2))
-    fig_nom = px.imshow(Sigma_nom, text_auto=True, title="Nominal Covariance Matrix")
-    st.plotly_chart(fig_nom)
+    st.plotly_chart(pipeline.get("covariance_figure"))
     
     st.subheader("Portfolio Optimization")
-    st.markdown("We minimize portfolio risk while ensuring a minimum return of 0.1.")
+    max_return = pipeline.get("max_return")
+    target_return = st.number_input("Target return", min_value=0.0, max_value=max_return, value=min(0.1, max_return), step=0.01, key="target_return")
+    pipeline.set(target_return=target_return)
+    st.markdown(f"We minimize portfolio risk while ensuring a minimum return of {target_return:g}.")
     
-    w = cp.Variable(n)
-    ret = mu.T @ w
-    risk = cp.quad_form(w, Sigma_nom)
-    prob = cp.Problem(cp.Minimize(risk), [cp.sum(w) == 1, ret >= 0.1, cp.norm(w, 1) <= 2])
-    prob.solve()
+    try:
+        w_opt = pipeline.get("weights")
+    except TimeoutError:
+        st.warning("The solver is busy; please try again in a moment.")
+        st.stop()
     
     st.write("Optimal portfolio weights (w):")
-    st.write(np.round(w.value, 2))
+    st.write(np.round(w_opt, 2))
+    
+    frontier = pipeline.get("frontier")
+    fig_frontier = px.line(x=frontier["std"], y=frontier["return"], title="Efficient Frontier",
+                           labels={'x': 'Standard deviation', 'y': 'Expected return'})
+    fig_frontier.add_scatter(x=[np.sqrt(pipeline.get("nominal_risk"))], y=[float(mu.reshape(-1) @ w_opt)],
+                             mode="markers", name="Selected portfolio")
+    st.plotly_chart(fig_frontier)
     
     st.subheader("Worst-Case Risk Analysis")
     st.markdown(
@@ -51,30 +63,79 @@ def run_page1():
     )
     
     delta = st.slider("Uncertainty Parameter (delta)", min_value=0.0, max_value=0.5, value=0.2, step=0.01)
+    pipeline.set(delta=delta)
     
-    Sigma_var = cp.Variable((n, n), PSD=True)
-    Delta = cp.Variable((n, n), symmetric=True)
-    risk_var = cp.quad_form(w.value, Sigma_var)
-    prob_wc = cp.Problem(
-        cp.Maximize(risk_var),
-        [Sigma_var == Sigma_nom + Delta, cp.diag(Delta) == 0, cp.abs(Delta) <= delta]
-    )
-    prob_wc.solve()
-    
-    st.write("Nominal portfolio standard deviation:", np.sqrt(cp.quad_form(w.value, Sigma_nom).value))
-    st.write("Worst-case portfolio standard deviation:", np.sqrt(risk_var).value)
-    st.write("Perturbation (Delta) matrix:")
-    st.write(np.round(Delta.value, 2))
-    
-    num_samples = 100
-    risks = []
-    for _ in range(num_samples):
-        Delta_sample = np.random.uniform(-delta, delta, size=(n, n))
-        Delta_sample = np.triu(Delta_sample)
-        Delta_sample = Delta_sample + Delta_sample.T - np.diag(np.diag(Delta_sample))
-        Sigma_sample = Sigma_nom + Delta_sample
-        risk_sample = w.value.reshape(-1, 1).T @ Sigma_sample @ w.value.reshape(-1, 1)
-        risks.append(risk_sample[0][0])
-    
-    fig_hist = px.histogram(x=risks, nbins=30, title=f"Portfolio Risk Distribution (delta={delta})", labels={'x': 'Portfolio Risk'})
-    st.plotly_chart(fig_hist)
+    # The delta-dependent solves and sampling run in the background; moving the slider cancels the stale jobs.
+    with tracer.span("page1.worst_case", delta=delta):
+        worst_case_job = submit_stage("page1.worst_case", pipeline, "worst_case")
+    
+    st.write("Nominal portfolio standard deviation:", np.sqrt(pipeline.get("nominal_risk")))
+    
+    def show_worst_case(result, final):
+        if result is None:
+            st.caption("Solving the worst-case problem...")
+            return
+        risk_wc, Delta = result
+        st.write("Worst-case portfolio standard deviation:", np.sqrt(risk_wc))
+        st.write("Perturbation (Delta) matrix:")
+        st.write(np.round(Delta, 2))
+    show_progressive(worst_case_job, show_worst_case)
+    
+    curve = pipeline.get("worst_case_curve")
+    with tracer.span("page1.curve_figure"):
+        fig_curve = px.line(x=curve["delta"], y=curve["std"], title="Worst-Case Standard Deviation vs delta",
+                            labels={'x': 'delta', 'y': 'Worst-case standard deviation'})
+        fig_curve.add_vline(x=delta, line_dash="dash")
+    st.plotly_chart(fig_curve)
+    
+    st.subheader("Robust Portfolio")
+    st.markdown("Minimizing the worst-case risk directly, in one solve, under the same constraints.")
+    with tracer.span("page1.robust_optimize", delta=delta):
+        robust_job = submit_stage("page1.robust_optimize", pipeline, "robust_portfolio")
+    
+    def show_robust(result, final):
+        if result is None:
+            st.caption("Solving the robust portfolio problem...")
+            return
+        w_robust, risk_robust = result
+        st.write("Robust portfolio weights:")
+        st.write(np.round(w_robust, 2))
+        st.write("Worst-case standard deviation of the robust portfolio:", np.sqrt(max(risk_robust, 0.0)))
+        st.write("Nominal standard deviation of the robust portfolio:", np.sqrt(calculate_portfolio_risk(w_robust, Sigma_nom)))
+    show_progressive(robust_job, show_robust)
+    
+    method = st.radio("Risk distribution", ["Monte Carlo (adaptive)", "Variance-reduced (8192 samples)", "Exact (no sampling)"], horizontal=True, key="dist_method")
+    if method == "Exact (no sampling)":
+        distribution = pipeline.get("exact_distribution")
+        with tracer.span("page1.distribution_figure"):
+            fig_hist = visualize_risk_distribution(distribution, title=f"Portfolio Risk Distribution (delta={delta})")
+        st.plotly_chart(fig_hist)
+    elif method == "Variance-reduced (8192 samples)":
+        strategy = st.selectbox("Sampling strategy", ["sobol", "halton", "lhs", "antithetic"], key="sampling_method")
+        pipeline.set(sampling_method=strategy)
+        result = pipeline.get("risk_quantiles")
+        with tracer.span("page1.distribution_figure"):
+            fig_hist = visualize_risk_distribution(result["risks"], title=f"Portfolio Risk Distribution (delta={delta})")
+        ess = result["effective_sample_size"]
+        st.caption(f"95% quantile {result['quantiles'][0.95]:.4f}; effective sample size {ess['quantiles'][0.95]:,.0f} "
+                   f"for the 95% quantile and {ess['mean']:,.0f} for the mean (8,192 draws)")
+        st.plotly_chart(fig_hist)
+    else:
+        screening = st.selectbox("Non-PSD scenarios", ["Keep", "Reject", "Project to nearest PSD"], key="psd_mode",
+                                 help="Sigma_nom + Delta need not be a valid covariance matrix. Reject drops such scenarios; project replaces them with the nearest positive semi-definite matrix.")
+        psd = {"Keep": None, "Reject": "reject", "Project to nearest PSD": "project"}[screening]
+        pipeline.set(psd=psd)
+        with tracer.span("page1.risk_distribution", method="monte_carlo", psd=psd):
+            distribution_job = submit_stage("page1.risk_distribution", pipeline, "risk_statistics", progressive=True)
+        
+        def show_distribution(stats, final):
+            if stats is None or stats.count == 0:
+                st.caption("Sampling...")
+                return
+            fig_hist = visualize_risk_distribution(stats.histogram(30), title=f"Portfolio Risk Distribution (delta={delta})")
+            st.plotly_chart(fig_hist)
+            st.caption(f"{stats.count} samples: mean risk {stats.mean:.4f} ± {stats.mean_half_width():.4f}, "
+                       f"95% quantile {stats.quantile(0.95):.4f} ± {stats.quantile_half_width(0.95):.4f} (95% confidence)"
+                       + (f"; {stats.acceptance_rate:.1%} of {stats.count + stats.rejected:,} draws were PSD" if psd == "reject" else "")
+                       + ("" if final else " - refining..."))
+        show_progressive(distribution_job, show_distribution)
@@ -1,9 +1,12 @@
 
 import streamlit as st
 import numpy as np
-import cvxpy as cp
-import plotly.express as px
 
+from definitions.definitions import tracer, visualize_risk_distribution
+from application_pages.pipeline import session_pipeline, submit_stage
+from application_pages.progressive import show_progressive
+
+@tracer.traced("page2")
 def run_page2():
     st.header("Sensitivity Analysis")
     
@@ -14,39 +17,68 @@ def run_page2():
     """
     )
     
-    np.random.seed(2)
     n = 5
-    mu = np.abs(np.random.randn(n, 1)) / 15
-    Sigma_rand = np.random.uniform(-0.15, 0.8, size=(n, n))
-    Sigma_nom = Sigma_rand.T @ Sigma_rand
+    pipeline = session_pipeline(n=n, seed=2)
+    Sigma_nom = pipeline.get("Sigma_nom")
     
     st.subheader("Nominal Covariance Matrix Overview")
     st.write("Sigma_nom:")
     st.write(np.round(Sigma_nom, 2))
-    fig_nom = px.imshow(Sigma_nom, text_auto=True, title="Nominal Covariance Matrix")
-    st.plotly_chart(fig_nom)
+    st.plotly_chart(pipeline.get("covariance_figure"))
     
     st.subheader("Portfolio Optimization Recap")
-    w = cp.Variable(n)
-    ret = mu.T @ w
-    risk = cp.quad_form(w, Sigma_nom)
-    prob = cp.Problem(cp.Minimize(risk), [cp.sum(w)==1, ret>=0.1, cp.norm(w, 1)<=2])
-    prob.solve()
+    max_return = pipeline.get("max_return")
+    target_return = st.number_input("Target return", min_value=0.0, max_value=max_return, value=min(0.1, max_return), step=0.01, key="target_return_sens")
+    pipeline.set(target_return=target_return)
+    try:
+        w_opt = pipeline.get("weights")
+    except TimeoutError:
+        st.warning("The solver is busy; please try again in a moment.")
+        st.stop()
     st.write("Optimal portfolio weights (w):")
-    st.write(np.round(w.value, 2))
+    st.write(np.round(w_opt, 2))
     
     st.subheader("Sensitivity Analysis: Risk Distribution")
     delta = st.slider("Uncertainty Parameter (delta)", min_value=0.0, max_value=0.5, value=0.2, step=0.01, key="delta_sens")
+    pipeline.set(delta=delta)
     
-    num_samples = 100
-    risks = []
-    for _ in range(num_samples):
-        Delta_sample = np.random.uniform(-delta, delta, size=(n, n))
-        Delta_sample = np.triu(Delta_sample)
-        Delta_sample = Delta_sample + Delta_sample.T - np.diag(np.diag(Delta_sample))
-        Sigma_sample = Sigma_nom + Delta_sample
-        risk_sample = w.value.reshape(-1, 1).T @ Sigma_sample @ w.value.reshape(-1, 1)
-        risks.append(risk_sample[0][0])
+    method = st.radio("Risk distribution", ["Monte Carlo (adaptive)", "Variance-reduced (8192 samples)", "Exact (no sampling)"], horizontal=True, key="dist_method_sens")
+    if method == "Exact (no sampling)":
+        distribution = pipeline.get("exact_distribution")
+        with tracer.span("page2.distribution_figure"):
+            fig_risk = visualize_risk_distribution(distribution, title=f"Risk Distribution for delta={delta}")
+        st.plotly_chart(fig_risk)
+    elif method == "Variance-reduced (8192 samples)":
+        strategy = st.selectbox("Sampling strategy", ["sobol", "halton", "lhs", "antithetic"], key="sampling_method_sens")
+        pipeline.set(sampling_method=strategy)
+        result = pipeline.get("risk_quantiles")
+        with tracer.span("page2.distribution_figure"):
+            fig_risk = visualize_risk_distribution(result["risks"], title=f"Risk Distribution for delta={delta}")
+        ess = result["effective_sample_size"]
+        st.caption(f"95% quantile {result['quantiles'][0.95]:.4f}; effective sample size {ess['quantiles'][0.95]:,.0f} "
+                   f"for the 95% quantile and {ess['mean']:,.0f} for the mean (8,192 draws)")
+        st.plotly_chart(fig_risk)
+    else:
+        screening = st.selectbox("Non-PSD scenarios", ["Keep", "Reject", "Project to nearest PSD"], key="psd_mode_sens",
+                                 help="Sigma_nom + Delta need not be a valid covariance matrix. Reject drops such scenarios; project replaces them with the nearest positive semi-definite matrix.")
+        psd = {"Keep": None, "Reject": "reject", "Project to nearest PSD": "project"}[screening]
+        pipeline.set(psd=psd)
+        with tracer.span("page2.risk_distribution", method="monte_carlo", psd=psd):
+            distribution_job = submit_stage("page2.risk_distribution", pipeline, "risk_statistics", progressive=True)
+        
+        def show_distribution(stats, final):
+            if stats is None or stats.count == 0:
+                st.caption("Sampling...")
+                return
+            fig_risk = visualize_risk_distribution(stats.histogram(30), title=f"Risk Distribution for delta={delta}")
+            st.plotly_chart(fig_risk)
+            st.caption(f"{stats.count} samples: mean risk {stats.mean:.4f} ± {stats.mean_half_width():.4f}, "
+                       f"95% quantile {stats.quantile(0.95):.4f} ± {stats.quantile_half_width(0.95):.4f} (95% confidence)"
+                       + (f"; {stats.acceptance_rate:.1%} of {stats.count + stats.rejected:,} draws were PSD" if psd == "reject" else "")
+                       + ("" if final else " - refining..."))
+        show_progressive(distribution_job, show_distribution)
     
-    fig_risk = px.histogram(x=risks, nbins=30, title=f"Risk Distribution for delta={delta}", labels={'x': 'Portfolio Risk'})
-    st.plotly_chart(fig_risk)
+    st.subheader("Sensitivity Sweep")
+    st.markdown("Nominal, worst-case and sampled risk quantiles across the full delta range.")
+    st.plotly_chart(pipeline.get("sweep_figure"))
+    st.dataframe(pipeline.get("sensitivity_sweep"))
@@ -0,0 +1,18 @@
+
+import streamlit as st
+
+from definitions.definitions import analysis_pipeline
+from application_pages.progressive import submit
+
+def session_pipeline(**params):
+    """The analysis pipeline of the current browser session, shared by both pages, with params applied."""
+    pipeline = st.session_state.get("analysis_pipeline")
+    if pipeline is None:
+        pipeline = st.session_state["analysis_pipeline"] = analysis_pipeline()
+    pipeline.set(**params)
+    return pipeline
+
+def submit_stage(name, pipeline, stage, **kwargs):
+    """Runs a pipeline stage as this session's background job name (see progressive.submit)."""
+    func, args, options = pipeline.arguments(stage)
+    return submit(name, func, *args, **options, **kwargs)
@@ -0,0 +1,47 @@
+
+import uuid
+
+import streamlit as st
+
+from definitions.definitions import background
+
+def session_slot(name):
+    """A background-job slot private to the current browser session."""
+    token = st.session_state.setdefault("background_session", uuid.uuid4().hex)
+    return (token, name)
+
+def submit(name, func, *args, **kwargs):
+    """Starts (or reuses) the background job for this session's slot name; a newer input cancels the older job."""
+    return background.submit(session_slot(name), func, *args, **kwargs)
+
+def show_progressive(job, render, wait=0.2, interval=0.3):
+    """Renders a background job, refreshing while it runs.
+
+    Waits briefly so fast jobs render in the same run. Otherwise a fragment
+    re-renders the latest partial result every interval seconds without
+    rerunning the page, and a full rerun once the job is done stops the
+    refreshing.
+
+    Args:
+        job: A BackgroundJob.
+        render: Called as render(value, final) with the result (final=True)
+            or the latest partial result, which may be None.
+        wait: Seconds to wait for the job before rendering.
+        interval: Refresh interval in seconds while the job runs.
+    """
+    polling = not job.wait(wait)
+
+    def section():
+        if job.done():
+            if polling:
+                st.rerun()
+            if isinstance(job.future.exception(), TimeoutError):
+                st.warning("The solver is busy; this result timed out. Change an input or reload to retry.")
+                return
+            render(job.result(), True)
+        else:
+            render(job.partial(), False)
+
+    # Each fragment gets its own container so fragments from the same function do not share an id.
+    with st.container():
+        st.fragment(section, run_every=interval if polling else None)()
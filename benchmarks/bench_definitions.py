@@ -0,0 +1,238 @@
+"""Benchmarks for the functions in definitions/definitions.py.
+
+Sweeps the number of assets n and the number of Monte Carlo samples, and
+records wall time, peak traced memory, peak resident memory and, for
+cvxpy-based functions, the compile time and solver time separately. Results
+are written as JSON and can be compared against a stored baseline to flag
+wall-time and peak-RSS regressions. A case that raises (e.g. MemoryError) is
+recorded with its error and always counts as a regression, so one failure
+does not abort the sweep.
+
+benchmarks/baseline.json holds a --quick run; refresh it on the CI machine
+when the hardware changes.
+
+Usage:
+    python benchmarks/bench_definitions.py --output results.json
+    python benchmarks/bench_definitions.py --quick --baseline benchmarks/baseline.json
+    python benchmarks/bench_definitions.py --quick --output benchmarks/baseline.json  # refresh the baseline
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import cvxpy as cp
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from definitions.definitions import (  # noqa: E402
+    calculate_portfolio_risk, calculate_risk_distribution, generate_nominal_covariance_matrix,
+    generate_uncertainty_set, optimize_min_variance_portfolio, optimize_portfolio,
+    risk_distribution_exact, sample_portfolio_risks, solve_worst_case_sdp, worst_case_risk, WhatIfSession,
+)
+
+FULL_SIZES = [5, 50, 200, 500, 1000, 2000]
+FULL_SAMPLES = [100, 1000, 10000, 100000, 1000000]
+QUICK_SIZES = [5, 50, 200]
+QUICK_SAMPLES = [100, 10000]
+
+
+@contextlib.contextmanager
+def capture_solver_stats():
+    """Records compilation and solver time of every cvxpy solve in the block."""
+    stats = {"compile_time": 0.0, "solve_time": 0.0}
+    original_solve = cp.Problem.solve
+
+    def solve(problem, *args, **kwargs):
+        result = original_solve(problem, *args, **kwargs)
+        stats["compile_time"] += problem.compilation_time or 0.0
+        stats["solve_time"] += problem.solver_stats.solve_time or 0.0
+        return result
+
+    cp.Problem.solve = solve
+    try:
+        yield stats
+    finally:
+        cp.Problem.solve = original_solve
+
+
+def reset_peak_rss():
+    """Resets the kernel's peak-RSS counter of this process (Linux); returns whether that worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, since the last reset_peak_rss where supported."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS, and never resets.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def measure(func, repeats):
+    """Best-of-repeats wall time and cvxpy timings, plus peak traced memory of a separate run."""
+    best = {"wall_time": float("inf")}
+    reset_peak_rss()
+    for _ in range(repeats):
+        with capture_solver_stats() as stats:
+            start = time.perf_counter()
+            func()
+            wall_time = time.perf_counter() - start
+        if wall_time < best["wall_time"]:
+            best = {"wall_time": wall_time, **stats}
+    best["peak_rss"] = peak_rss()
+
+    # Memory is traced in its own run because tracemalloc slows allocation-heavy code.
+    tracemalloc.start()
+    func()
+    best["peak_memory"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best
+
+
+def make_inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    Sigma_nom = generate_nominal_covariance_matrix(n, rng=rng) / n + 0.1 * np.eye(n)
+    mu = rng.uniform(0.0, 0.2, size=n)
+    w = rng.dirichlet(np.ones(n))
+    return Sigma_nom, mu, w
+
+
+def cases(n, num_samples_grid, max_elements, max_sdp_n, max_qp_n):
+    """Yields (function name, num_samples, callable) for one problem size."""
+    Sigma_nom, mu, w = make_inputs(n)
+    delta = 0.1 / n
+
+    yield "generate_nominal_covariance_matrix", None, lambda: generate_nominal_covariance_matrix(n, rng=0)
+    yield "calculate_portfolio_risk", None, lambda: calculate_portfolio_risk(w, Sigma_nom)
+    yield "worst_case_risk", None, lambda: worst_case_risk(Sigma_nom, w, delta)
+    yield "risk_distribution_exact", None, lambda: risk_distribution_exact(Sigma_nom, w, delta)
+    if n <= max_qp_n:
+        yield "optimize_portfolio", None, lambda: optimize_portfolio(Sigma_nom, mu)
+        yield "optimize_min_variance_portfolio", None, lambda: optimize_min_variance_portfolio(Sigma_nom, mu, float(np.median(mu)))
+    yield "optimize_portfolio_native", None, lambda: optimize_portfolio(Sigma_nom, mu, backend="native")
+    session = WhatIfSession(Sigma_nom, mu, gamma=1.0, delta=delta)
+    yield "whatif_set_volatility", None, lambda: session.set_volatility(0, 1.01 * session.volatility(0))
+    yield "whatif_set_correlation", None, lambda: session.set_correlation(0, n - 1, 0.9 * session.correlation(0, n - 1))
+    if n <= max_sdp_n:
+        yield "solve_worst_case_sdp", None, lambda: solve_worst_case_sdp(Sigma_nom, w, delta)
+
+    for num_samples in num_samples_grid:
+        if num_samples * n * (n + 1) // 2 <= max_elements:
+            yield "sample_portfolio_risks", num_samples, lambda k=num_samples: sample_portfolio_risks(Sigma_nom, w, delta, k, rng=0)
+            yield "sample_portfolio_risks_psd_reject", num_samples, lambda k=num_samples: sample_portfolio_risks(Sigma_nom, w, delta, k, rng=0, psd="reject")
+        if num_samples * n * n <= max_elements:
+            uncertainty_set = generate_uncertainty_set(Sigma_nom, delta, num_samples, rng=0)
+            yield "generate_uncertainty_set", num_samples, lambda k=num_samples: generate_uncertainty_set(Sigma_nom, delta, k, rng=0)
+            yield "calculate_risk_distribution", num_samples, lambda s=uncertainty_set: calculate_risk_distribution(s, w)
+
+
+def run(sizes, num_samples_grid, repeats, max_elements, max_sdp_n, max_qp_n):
+    results = []
+    for n in sizes:
+        for name, num_samples, func in cases(n, num_samples_grid, max_elements, max_sdp_n, max_qp_n):
+            record = {"function": name, "n": n, "num_samples": num_samples}
+            try:
+                record.update(measure(func, repeats))
+            except Exception as error:  # e.g. MemoryError; reported as a regression, the sweep goes on
+                record["error"] = f"{type(error).__name__}: {error}"
+                results.append(record)
+                print(f"{name:36s} n={n:<5d} samples={str(num_samples):>8s} FAILED {record['error']}", flush=True)
+                continue
+            results.append(record)
+            print(f"{name:36s} n={n:<5d} samples={str(num_samples):>8s} "
+                  f"wall={record['wall_time']:.4f}s peak={record['peak_memory'] / 1e6:.1f}MB rss={record['peak_rss'] / 1e6:.0f}MB "
+                  f"compile={record['compile_time']:.4f}s solve={record['solve_time']:.4f}s", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold, rss_slack=64e6):
+    """Returns the failed records and those whose wall time or peak RSS regressed by more than threshold.
+
+    Peak RSS must also grow by more than rss_slack bytes, since the interpreter
+    and imported libraries dominate the RSS of small cases.
+    """
+    reference = {(r["function"], r["n"], r["num_samples"]): r for r in (baseline or {"results": []})["results"]}
+    regressions = []
+    for record in results:
+        if "error" in record:
+            regressions.append({**record, "metric": "error"})
+            continue
+        base = reference.get((record["function"], record["n"], record["num_samples"]))
+        if base is None or "error" in base:
+            continue
+        if record["wall_time"] > base["wall_time"] * (1 + threshold):
+            regressions.append({**record, "metric": "wall_time", "baseline": base["wall_time"],
+                                "ratio": record["wall_time"] / base["wall_time"]})
+        if "peak_rss" in base and record["peak_rss"] > max(base["peak_rss"] * (1 + threshold), base["peak_rss"] + rss_slack):
+            regressions.append({**record, "metric": "peak_rss", "baseline": base["peak_rss"],
+                                "ratio": record["peak_rss"] / base["peak_rss"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="run a small grid suitable for CI")
+    parser.add_argument("--sizes", type=int, nargs="+", help="asset counts to sweep")
+    parser.add_argument("--samples", type=int, nargs="+", help="Monte Carlo sample counts to sweep")
+    parser.add_argument("--repeats", type=int, default=3, help="timing repeats per case (best is kept)")
+    parser.add_argument("--max-elements", type=float, default=5e7,
+                        help="skip sampling cases drawing more than this many matrix entries")
+    parser.add_argument("--max-sdp-n", type=int, default=200, help="largest n for the worst-case SDP")
+    parser.add_argument("--max-qp-n", type=int, default=1000, help="largest n for the cvxpy portfolio QPs")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against this results file and flag regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else FULL_SIZES)
+    num_samples_grid = args.samples or (QUICK_SAMPLES if args.quick else FULL_SAMPLES)
+    results = run(sizes, num_samples_grid, args.repeats, args.max_elements, args.max_sdp_n, args.max_qp_n)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cvxpy": cp.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for r in regressions:
+        label = f"REGRESSION {r['function']} n={r['n']} samples={r['num_samples']}"
+        if r["metric"] == "error":
+            print(f"{label}: {r['error']}")
+        elif r["metric"] == "wall_time":
+            print(f"{label}: {r['wall_time']:.4f}s vs {r['baseline']:.4f}s ({r['ratio']:.2f}x)")
+        else:
+            print(f"{label}: peak RSS {r['peak_rss'] / 1e6:.0f}MB vs {r['baseline'] / 1e6:.0f}MB ({r['ratio']:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
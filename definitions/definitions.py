@@ -1,79 +1,758 @@
 import numpy as np
 
-def generate_nominal_covariance_matrix(n):
+def generate_nominal_covariance_matrix(n, rng=None):
     """Generates a synthetic nominal covariance matrix."""
     if n <= 0:
         raise Exception("n must be greater than 0")
-    A = np.random.rand(n, n)
+    A = _as_generator(rng).random((n, n))
     Sigma_nom = np.dot(A, A.T)
     return Sigma_nom
 
+def _as_generator(rng):
+    """Returns a numpy Generator for a Generator, seed, SeedSequence or None (fresh entropy)."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+def _as_seed_sequence(rng):
+    """Returns a SeedSequence for a Generator, seed, SeedSequence or None (fresh entropy).
+
+    A Generator is consumed for fresh entropy, so repeated calls with the
+    same Generator give different streams, as its draws would.
+    """
+    if isinstance(rng, np.random.SeedSequence):
+        return rng
+    if isinstance(rng, np.random.Generator):
+        return np.random.SeedSequence(rng.integers(0, 2 ** 63, size=4))
+    return np.random.SeedSequence(rng)
+
+def _block_generator(seed_seq, block):
+    """The child stream for one block of samples.
+
+    Children are addressed by block index rather than spawned in order, so any
+    block can be generated independently by any chunk or worker.
+    """
+    child = np.random.SeedSequence(seed_seq.entropy, spawn_key=tuple(seed_seq.spawn_key) + (block,), pool_size=seed_seq.pool_size)
+    return np.random.default_rng(child)
+
+SAMPLING_METHODS = ("random", "antithetic", "sobol", "halton", "lhs")
+
+# scipy's Sobol direction numbers (qmc.Sobol.MAXDIM) cover at most this many dimensions.
+_SOBOL_MAX_WIDTH = 21201
+
+def _check_sampling_method(method):
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"method must be one of {', '.join(SAMPLING_METHODS)}.")
+
+def _check_sampling_width(method, width):
+    """Rejects a Sobol draw over more free entries of Delta than scipy's direction numbers support."""
+    if method == "sobol" and width > _SOBOL_MAX_WIDTH:
+        raise ValueError(f'method="sobol" supports at most {_SOBOL_MAX_WIDTH} free entries of Delta, i.e. n <= 205 '
+                         f'for a symmetric Delta (n <= 206 with zero_diagonal, n <= 145 if not symmetric); got {width}. '
+                         'Use "halton" or "lhs" for larger n.')
+
+def _uniform_block(rng, block_size, count, width, delta, method):
+    """Draws count rows of uniform(-delta, delta) perturbations for one block.
+
+    "antithetic" returns pairs (U, -U) in consecutive rows. "sobol", "halton"
+    and "lhs" return one independently scrambled point set per block, so the
+    blocks are independent randomized QMC replicates.
+    """
+    if method == "random":
+        return rng.uniform(-delta, delta, size=(count, width))
+    if method == "antithetic":
+        U = rng.uniform(-delta, delta, size=(-(-count // 2), width))
+        return np.stack([U, -U], axis=1).reshape(-1, width)[:count]
+
+    from scipy.stats import qmc
+    if method == "sobol":
+        # Drawing the whole power-of-two block keeps the balance properties of a partial last block's prefix.
+        points = qmc.Sobol(width, seed=rng).random(block_size)[:count]
+    elif method == "halton":
+        points = qmc.Halton(width, seed=rng).random(count)
+    else:
+        points = qmc.LatinHypercube(width, seed=rng).random(count)
+    return delta * (2 * points - 1)
+
+def _uniform_blocks(seed_seq, block_size, first_block, last_block, num_samples, width, delta, method="random"):
+    """Draws uniform(-delta, delta) rows for samples [first_block * block_size, min(last_block * block_size, num_samples))."""
+    draws = []
+    for block in range(first_block, last_block):
+        count = min(block_size, num_samples - block * block_size)
+        draws.append(_uniform_block(_block_generator(seed_seq, block), block_size, count, width, delta, method))
+    return np.concatenate(draws)
+
+import contextlib
+import functools
+import io
+import json
+import threading
+import time
 import numpy as np
 
-def generate_uncertainty_set(Sigma_nom, delta, num_samples):
-    """Generates a set of covariance matrices within the uncertainty set.
+class _Span:
+    """An open tracing span; closed spans are stored as plain dict records."""
+
+    __slots__ = ("tracer", "record", "start")
+
+    def __init__(self, tracer, record):
+        self.tracer = tracer
+        self.record = record
+
+    def __enter__(self):
+        state = self.tracer._state()
+        self.record["depth"] = len(state.stack)
+        self.record["parent"] = state.stack[-1]["name"] if state.stack else None
+        self.record["start"] = time.perf_counter() - state.origin
+        state.stack.append(self.record)
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["duration"] = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        state = self.tracer._state()
+        state.stack.pop()
+        state.records.append(self.record)
+        return False
+
+class Tracer:
+    """Collects named timing spans, per thread, for the hot paths of the application.
+
+    Tracing is off by default. While it is off, span() returns a shared no-op
+    context manager and traced functions call straight through, so the only
+    cost is one attribute lookup. Each thread (one Streamlit script run) has
+    its own switch and records, so sessions do not see each other's timings.
+    """
+
+    _disabled_span = contextlib.nullcontext()
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _state(self):
+        return self._local
+
+    @property
+    def enabled(self):
+        return getattr(self._local, "enabled", False)
+
+    def enable(self):
+        """Turns tracing on for the current thread and clears its records."""
+        self.reset()
+        self._local.enabled = True
+
+    def disable(self):
+        """Turns tracing off for the current thread."""
+        self._local.enabled = False
+
+    def reset(self):
+        """Clears the records of the current thread."""
+        self._local.records = []
+        self._local.stack = []
+        self._local.origin = time.perf_counter()
+
+    def span(self, name, **attributes):
+        """A context manager timing the enclosed block as a span called name.
+        Args:
+            name: The span name, e.g. "page1.optimize".
+            **attributes: Extra JSON-serializable fields stored on the record.
+        Returns:
+            A context manager yielding the span record (None when disabled).
+        """
+        if not getattr(self._local, "enabled", False):
+            return self._disabled_span
+        return _Span(self, {"name": name, **attributes})
+
+    def traced(self, name=None):
+        """Decorator wrapping every call of the function in a span (named after the function by default)."""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not getattr(self._local, "enabled", False):
+                    return func(*args, **kwargs)
+                with _Span(self, {"name": span_name}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_problem(self, problem):
+        """Adds the cvxpy compilation and solver time of a just-solved problem to the innermost open span."""
+        if not getattr(self._local, "enabled", False) or not self._local.stack:
+            return
+        record = self._local.stack[-1]
+        stats = problem.solver_stats
+        record["compile_time"] = record.get("compile_time", 0.0) + (problem.compilation_time or 0.0)
+        record["solve_time"] = record.get("solve_time", 0.0) + ((stats.solve_time if stats is not None else None) or 0.0)
+        record["solver"] = stats.solver_name if stats is not None else None
+        record["status"] = problem.status
+
+    def records(self):
+        """The closed spans of the current thread, in the order they finished."""
+        return list(getattr(self._local, "records", []))
+
+    def summary(self):
+        """The current thread's spans as a DataFrame in start order, with times in milliseconds."""
+        import pandas as pd
+
+        rows = sorted(self.records(), key=lambda record: record["start"])
+        return pd.DataFrame({
+            "span": ["  " * record["depth"] + record["name"] for record in rows],
+            "ms": [1e3 * record["duration"] for record in rows],
+            "compile_ms": [1e3 * record.get("compile_time", np.nan) for record in rows],
+            "solve_ms": [1e3 * record.get("solve_time", np.nan) for record in rows],
+        }, columns=["span", "ms", "compile_ms", "solve_ms"])
+
+    def export_jsonl(self, file=None):
+        """Writes the current thread's spans as JSON lines.
+        Args:
+            file: A path or writable text file, or None.
+        Returns:
+            The JSON-lines text.
+        """
+        buffer = io.StringIO()
+        for record in sorted(self.records(), key=lambda record: record["start"]):
+            buffer.write(json.dumps(record, default=str) + "\n")
+        text = buffer.getvalue()
+        if isinstance(file, str):
+            with open(file, "w") as f:
+                f.write(text)
+        elif file is not None:
+            file.write(text)
+        return text
+
+tracer = Tracer()
+traced = tracer.traced
+
+import cvxpy as cp
+import numpy as np
+
+class FactorCovariance:
+    """A covariance matrix Sigma = B @ F @ B.T + diag(d) kept in factor form.
+
+    Supports w @ Sigma, Sigma @ x and w @ Sigma @ w without materializing the
+    n x n matrix, so it can be passed wherever a dense Sigma_nom is accepted.
+
+    Args:
+        B: Factor loadings, shape (n, k).
+        F: Factor covariance matrix, shape (k, k).
+        d: Idiosyncratic variances, shape (n,).
+    """
+
+    # Make numpy defer w @ Sigma to __rmatmul__ instead of coercing to an array.
+    __array_ufunc__ = None
+
+    def __init__(self, B, F, d):
+        B = np.asarray(B, dtype=float)
+        F = np.asarray(F, dtype=float)
+        d = np.asarray(d, dtype=float).reshape(-1)
+        if B.ndim != 2 or F.shape != (B.shape[1], B.shape[1]):
+            raise ValueError("B must be (n, k) and F must be (k, k).")
+        if d.shape != (B.shape[0],):
+            raise ValueError("d must have one entry per asset.")
+        if np.any(d < 0):
+            raise ValueError("Idiosyncratic variances must be non-negative.")
+
+        self.B = B
+        self.F = (F + F.T) / 2
+        self.d = d
+        eigenvalues, eigenvectors = np.linalg.eigh(self.F)
+        if eigenvalues.min() < -1e-10 * max(1.0, eigenvalues.max()):
+            raise ValueError("Factor covariance matrix must be positive semi-definite.")
+        # Sigma = G @ G.T + diag(d) with G = B @ F^(1/2).
+        self.G = B @ (eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None)))
+
+    @property
+    def shape(self):
+        return (self.B.shape[0], self.B.shape[0])
+
+    @property
+    def ndim(self):
+        return 2
+
+    def __matmul__(self, x):
+        x = np.asarray(x)
+        return self.G @ (self.G.T @ x) + (self.d * x.T).T
+
+    def __rmatmul__(self, x):
+        x = np.asarray(x)
+        return (x @ self.G) @ self.G.T + x * self.d
+
+    def quad_form(self, w):
+        """Portfolio risk w.T @ Sigma @ w for one (n,) or several (m, n) weight vectors."""
+        w = np.asarray(w)
+        return np.sum((w @ self.G) ** 2, axis=-1) + np.sum(self.d * w ** 2, axis=-1)
+
+    def diagonal(self):
+        """The asset variances, diag(Sigma)."""
+        return np.sum(self.G ** 2, axis=1) + self.d
+
+    def risk_expression(self, w):
+        """cvxpy expression for w.T @ Sigma @ w as a sum of squares of factor exposures."""
+        return cp.sum_squares(self.G.T @ w) + cp.sum_squares(cp.multiply(np.sqrt(self.d), w))
+
+    def to_dense(self):
+        """Materializes Sigma as an (n, n) numpy array."""
+        return self.G @ self.G.T + np.diag(self.d)
+
+def generate_factor_covariance(n, k, seed=None):
+    """Generates a synthetic factor covariance model Sigma = B F B.T + diag(d).
+    Args:
+        n: The number of assets.
+        k: The number of factors.
+        seed: The random seed.
+    Returns:
+        A FactorCovariance.
+    """
+    if n <= 0 or k <= 0:
+        raise ValueError("n and k must be greater than 0")
+    rng = np.random.default_rng(seed)
+    B = rng.normal(0.0, 1.0, size=(n, k)) / np.sqrt(k)
+    A = rng.normal(0.0, 1.0, size=(k, k)) / np.sqrt(k)
+    F = 0.04 * (A @ A.T + np.eye(k))
+    d = rng.uniform(0.01, 0.05, size=n)
+    return FactorCovariance(B, F, d)
+
+def _risk_expression(w, Sigma):
+    """cvxpy expression for w.T @ Sigma @ w for a dense or factor covariance."""
+    if isinstance(Sigma, FactorCovariance):
+        return Sigma.risk_expression(w)
+    return cp.quad_form(w, Sigma)
+
+def _default_solver(Sigma):
+    """Interior-point Clarabel handles the factor sum-of-squares form far better than OSQP."""
+    return cp.CLARABEL if isinstance(Sigma, FactorCovariance) else None
+
+import os
+import numpy as np
+
+def _numeric_columns(schema):
+    """The names of the numeric fields of a Parquet schema; dates or tickers are not returns."""
+    import pyarrow as pa
+    return [field.name for field in schema if pa.types.is_floating(field.type) or pa.types.is_integer(field.type)]
+
+def _return_chunks(source, chunk_rows, columns=None):
+    """Yields float64 (rows, n) chunks of a returns history without loading it whole.
+
+    .npy files are memory-mapped and Parquet files are read batch by batch, so
+    only one chunk is resident at a time.
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.splitext(source)[1].lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        if columns is None:
+            columns = _numeric_columns(parquet.schema_arrow)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield np.column_stack([batch.column(i).to_numpy(zero_copy_only=False) for i in range(batch.num_columns)]).astype(float)
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        returns = np.load(source, mmap_mode="r")
+    else:
+        returns = source
+    if returns.ndim != 2:
+        raise ValueError("Returns must be a 2-D (time, asset) array.")
+    if columns is not None:
+        returns = returns[:, list(columns)]
+    for start in range(0, returns.shape[0], chunk_rows):
+        yield np.asarray(returns[start:start + chunk_rows], dtype=float)
+
+def _column_count(source, columns):
+    """The number of asset columns _return_chunks yields for a source, read from metadata only."""
+    if columns is not None:
+        return len(columns)
+    if isinstance(source, np.ndarray):
+        return source.shape[1]
+    if os.path.splitext(source)[1].lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        return len(_numeric_columns(pq.ParquetFile(source).schema_arrow))
+    return np.load(source, mmap_mode="r").shape[1]
+
+def estimate_covariance(source, method="ledoit_wolf", halflife=None, chunk_rows=None, columns=None, return_mean=False):
+    """Estimates Sigma_nom from a returns history streamed in chunks.
+
+    Moments are accumulated about the first chunk's mean, so one pass over
+    the data suffices and peak memory is O(n^2) plus one chunk, independent
+    of the history length.
+
+    Args:
+        source: A (time, asset) returns array, a .npy path (memory-mapped) or
+            a .parquet path (read in batches; non-numeric columns are skipped).
+        method: "sample", "ledoit_wolf" (shrinkage towards a scaled identity,
+            Ledoit & Wolf 2004) or "ewma" (exponentially weighted).
+        halflife: The EWMA half-life in rows; required for method="ewma".
+        chunk_rows: Rows read per chunk; defaults to about 16 MiB per chunk.
+        columns: Optional column indices (.npy/arrays) or names (.parquet) to use.
+        return_mean: Also return the (weighted) mean return per asset.
+
+    Returns:
+        The (n, n) covariance matrix, or (mu, Sigma) if return_mean, in the
+        order of generate_market_data.
+    """
+    if not isinstance(source, (str, os.PathLike, np.ndarray)):
+        raise TypeError("source must be a .npy or .parquet path or a numpy array.")
+    if method not in ("sample", "ledoit_wolf", "ewma"):
+        raise ValueError("method must be 'sample', 'ledoit_wolf' or 'ewma'.")
+    if method == "ewma" and (halflife is None or halflife <= 0):
+        raise ValueError("halflife must be positive for method='ewma'.")
+    decay = 0.5 ** (1.0 / halflife) if method == "ewma" else 1.0
+
+    shift = cross = total = None
+    count = 0
+    weight = 0.0
+    # Ledoit-Wolf also needs sum ||z||^4 and sum ||z||^2 z to get the variance of z z.T.
+    fourth, weighted_norms, norms = 0.0, None, 0.0
+    for chunk in _return_chunks(source, chunk_rows or max(1, _CHUNK_ELEMENTS // _column_count(source, columns)), columns):
+        if not np.all(np.isfinite(chunk)):
+            raise ValueError("Returns must be finite.")
+        if shift is None:
+            n = chunk.shape[1]
+            shift = chunk.mean(axis=0)
+            cross, total, weighted_norms = np.zeros((n, n)), np.zeros(n), np.zeros(n)
+        z = chunk - shift
+        if method == "ewma":
+            # Row j of a k-row chunk is k-1-j rows older than the chunk's last row.
+            scale = decay ** np.arange(len(z) - 1, -1, -1)
+            cross *= decay ** len(z)
+            total *= decay ** len(z)
+            weight = weight * decay ** len(z) + scale.sum()
+            cross += (z * scale[:, None]).T @ z
+            total += scale @ z
+        else:
+            cross += z.T @ z
+            total += z.sum(axis=0)
+            weight += len(z)
+        if method == "ledoit_wolf":
+            squared = np.einsum("ij,ij->i", z, z)
+            fourth += squared @ squared
+            weighted_norms += squared @ z
+            norms += squared.sum()
+        count += len(z)
+
+    if count < 2:
+        raise ValueError("At least two rows of returns are required.")
+    mean = total / weight
+    Sigma = cross / weight - np.outer(mean, mean)
+    if method == "sample":
+        Sigma *= count / (count - 1)
+    elif method == "ledoit_wolf":
+        n = len(mean)
+        # pi = mean over t of ||y y.T - S||_F^2 with y = z - mean, expanded in the accumulated moments.
+        mean_norm = mean @ mean
+        sum_y4 = (fourth - 4 * mean @ weighted_norms + 2 * mean_norm * norms + 4 * mean @ cross @ mean
+                  - 4 * mean_norm * (mean @ total) + count * mean_norm ** 2)
+        pi = sum_y4 / count - np.sum(Sigma ** 2)
+        target = np.trace(Sigma) / n
+        distance = np.sum(Sigma ** 2) - 2 * target * np.trace(Sigma) + n * target ** 2
+        shrinkage = 0.0 if distance <= 0 else min(max(pi / count, 0.0), distance) / distance
+        Sigma = (1 - shrinkage) * Sigma
+        Sigma[np.diag_indices(n)] += shrinkage * target
+    Sigma = (Sigma + Sigma.T) / 2
+    if return_mean:
+        return shift + mean, Sigma
+    return Sigma
+
+import numpy as np
+
+# Below this size a Cholesky vectorized across the stack beats one LAPACK call per matrix.
+_VECTORIZED_CHOLESKY_MAX_N = 8
+
+def _symmetric_part(Sigmas):
+    """(A + A.T) / 2 for a stack of matrices; w.T @ A @ w only sees the symmetric part."""
+    return (Sigmas + np.swapaxes(Sigmas, -1, -2)) / 2
+
+def _symmetric_part_batch_last(A):
+    """(A + A.T) / 2 for a batch-last (n, n, k) stack."""
+    return (A + A.transpose(1, 0, 2)) / 2
+
+def _cholesky_succeeds(A):
+    """Column-by-column Cholesky of a batch-last (n, n, k) stack of symmetric matrices, in place.
+
+    Returns a boolean array of length k, True where every pivot was positive.
+    The batch axis is innermost so each step is one contiguous vector operation.
+    """
+    n, _, k = A.shape
+    ok = np.ones(k, dtype=bool)
+    for j in range(n):
+        ok &= A[j, j] > 0
+        # Failed matrices get a zero column so they cannot overflow the remaining updates.
+        column = np.where(ok, A[j + 1:, j] / np.sqrt(np.where(ok, A[j, j], 1.0)), 0.0)
+        A[j + 1:, j + 1:] -= column[:, None] * column[None, :]
+    return ok
+
+def _shift_diagonal(A, tol):
+    """Adds tol times the mean diagonal to the diagonal of each matrix of a batch-last stack, in place."""
+    n = A.shape[0]
+    diagonal = A[np.arange(n), np.arange(n)]
+    A[np.arange(n), np.arange(n)] = diagonal + tol * np.maximum(diagonal.mean(axis=0), np.finfo(float).tiny)
+
+def _psd_mask_batch_last(A, tol):
+    """psd_mask for a symmetric batch-last (n, n, k) stack, which is overwritten."""
+    _shift_diagonal(A, tol)
+    if A.shape[0] <= _VECTORIZED_CHOLESKY_MAX_N:
+        return _cholesky_succeeds(A)
+    from scipy.linalg import lapack
+    return np.array([lapack.dpotrf(A[:, :, i], lower=1, clean=0)[1] == 0 for i in range(A.shape[2])], dtype=bool)
+
+def psd_mask(Sigmas, tol=1e-10):
+    """Flags the matrices of a stack that are positive semi-definite, without eigendecompositions.
+
+    Each symmetric part, shifted by tol times its mean diagonal, is given a
+    Cholesky factorization; it succeeds exactly when the smallest eigenvalue
+    exceeds -tol * trace / n. Small matrices are factorized column by column
+    across the whole stack at once; larger ones with one LAPACK potrf call
+    each, which stops at the first non-positive pivot.
+
+    Args:
+        Sigmas: An array of shape (k, n, n) (or a list of n x n arrays).
+        tol: The relative tolerance below zero allowed for the smallest eigenvalue.
+    Returns:
+        A boolean numpy array of length k.
+    """
+    Sigmas = np.asarray(Sigmas, dtype=float)
+    if Sigmas.ndim != 3 or Sigmas.shape[1] != Sigmas.shape[2]:
+        raise ValueError("Covariance matrix must be square.")
+    return _psd_mask_batch_last(_symmetric_part_batch_last(Sigmas.transpose(1, 2, 0)), tol)
+
+def nearest_psd(Sigmas):
+    """Projects each matrix onto the positive semi-definite cone in the Frobenius norm.
+
+    The projection of the symmetric part clips its negative eigenvalues to
+    zero (Higham 1988).
+    Args:
+        Sigmas: An array of shape (k, n, n) or a single n x n matrix.
+    Returns:
+        The projected, symmetric matrices with the same shape.
+    """
+    A = _symmetric_part(np.asarray(Sigmas, dtype=float))
+    eigenvalues, eigenvectors = np.linalg.eigh(A)
+    return (eigenvectors * np.maximum(eigenvalues, 0.0)[..., None, :]) @ np.swapaxes(eigenvectors, -1, -2)
+
+def screen_psd(Sigmas, mode="reject", tol=1e-10):
+    """Removes or repairs the matrices of a stack that are not valid covariance matrices.
+    Args:
+        Sigmas: An array of shape (k, n, n).
+        mode: "reject" drops non-PSD matrices; "project" replaces them with
+            their nearest PSD matrix (only those are eigendecomposed).
+        tol: The tolerance of psd_mask.
+    Returns:
+        A tuple (matrices, stats) with stats a dict of "checked", "psd",
+        "acceptance_rate" and "projected".
+    """
+    if mode not in ("reject", "project"):
+        raise ValueError("mode must be 'reject' or 'project'.")
+    Sigmas = np.asarray(Sigmas, dtype=float)
+    mask = psd_mask(Sigmas, tol)
+    accepted = int(np.count_nonzero(mask))
+    stats = {"checked": len(mask), "psd": accepted, "acceptance_rate": accepted / len(mask) if len(mask) else np.nan,
+             "projected": 0}
+    if mode == "reject":
+        return Sigmas[mask], stats
+    if accepted < len(mask):
+        Sigmas = Sigmas.copy()
+        Sigmas[~mask] = nearest_psd(Sigmas[~mask])
+        stats["projected"] = len(mask) - accepted
+    return Sigmas, stats
+
+def _check_psd_mode(psd):
+    if psd not in (None, "reject", "project"):
+        raise ValueError("psd must be None, 'reject' or 'project'.")
+
+def _perturbed_matrices(Sigma_nom, Delta, symmetric=True, zero_diagonal=False):
+    """Symmetric parts of Sigma_nom + Delta for perturbation rows in the layout of _risk_weights, batch-last (n, n, k)."""
+    n = Sigma_nom.shape[0]
+    Sigmas = np.repeat(Sigma_nom[:, :, None], len(Delta), axis=2)
+    if not symmetric:
+        Sigmas += Delta.T.reshape(n, n, -1)
+        if zero_diagonal:
+            Sigmas[np.arange(n), np.arange(n)] = np.diag(Sigma_nom)[:, None]
+        return _symmetric_part_batch_last(Sigmas)
+    rows, cols = np.triu_indices(n, k=1 if zero_diagonal else 0)
+    Sigmas[rows, cols] += Delta.T
+    off = rows != cols
+    Sigmas[cols[off], rows[off]] += Delta.T[off]
+    return Sigmas
+
+def _screen_risks(risks, Delta, screen):
+    """Applies a PSD screen (Sigma_nom, w, symmetric, zero_diagonal, mode, tol) to sampled risks.
+
+    Returns the risks of the PSD samples for mode "reject", and all risks with
+    the non-PSD samples re-evaluated at their nearest PSD matrix for "project".
+    """
+    Sigma_nom, w, symmetric, zero_diagonal, mode, tol = screen
+    mask = _psd_mask_batch_last(_perturbed_matrices(Sigma_nom, Delta, symmetric, zero_diagonal), tol)
+    if mode == "reject":
+        return risks[mask]
+    risks = risks.copy()
+    if not np.all(mask):
+        failed = _perturbed_matrices(Sigma_nom, Delta[~mask], symmetric, zero_diagonal).transpose(2, 0, 1)
+        risks[~mask] = np.einsum("i,kij,j->k", w, nearest_psd(failed), w)
+    return risks
+
+def _psd_screen(Sigma_nom, w, symmetric, zero_diagonal, psd, tol):
+    """The screen argument of _sample_risk_chunk, or None without screening."""
+    if psd is None:
+        return None
+    Sigma_nom = Sigma_nom.to_dense() if isinstance(Sigma_nom, FactorCovariance) else np.asarray(Sigma_nom, dtype=float)
+    return (Sigma_nom, w, symmetric, zero_diagonal, psd, tol)
+
+def generate_uncertainty_tensor(Sigma_nom, delta, num_samples, rng=None, method="random", psd=None, psd_tol=1e-10):
+    """Generates a stacked array of covariance matrices within the uncertainty set.
     Args:
         Sigma_nom: The nominal covariance matrix.
         delta: The uncertainty parameter.
         num_samples: The number of covariance matrices to generate.
+        rng: A numpy.random.Generator or seed. Defaults to fresh entropy.
+        method: "random" perturbs every entry independently. The other
+            strategies of sample_portfolio_risks ("antithetic", "sobol",
+            "halton", "lhs") draw a symmetric Delta over the n(n-1)/2
+            off-diagonal entries.
+        psd: None keeps every sample; "reject" drops samples that are not
+            positive semi-definite, so fewer than num_samples may be
+            returned; "project" replaces them with their nearest PSD matrix.
+            See screen_psd.
+        psd_tol: The tolerance of the PSD check.
     Returns:
-        A list of numpy arrays.
+        A numpy array of shape (num_samples, n, n).
     """
     if not isinstance(Sigma_nom, np.ndarray):
         raise TypeError("Sigma_nom must be a numpy array")
     if not isinstance(delta, (int, float)):
         raise TypeError("delta must be a number")
+    _check_sampling_method(method)
+    _check_psd_mode(psd)
+
+    if method != "random":
+        Sigmas = generate_packed_uncertainty_set(Sigma_nom, delta, num_samples, zero_diagonal=True, rng=rng, method=method).to_dense()
+    else:
+        Sigmas = Sigma_nom + _as_generator(rng).uniform(low=-delta, high=delta, size=(num_samples,) + Sigma_nom.shape)
+    if psd is not None:
+        Sigmas = screen_psd(Sigmas, psd, psd_tol)[0]
+    return Sigmas
 
-    uncertainty_set = []
-    for _ in range(num_samples):
-        Delta = np.random.uniform(low=-delta, high=delta, size=Sigma_nom.shape)
-        Sigma = Sigma_nom + Delta
-        uncertainty_set.append(Sigma)
-    return uncertainty_set
+def generate_uncertainty_set(Sigma_nom, delta, num_samples, rng=None, method="random", psd=None, psd_tol=1e-10):
+    """Generates a set of covariance matrices within the uncertainty set.
+    Args:
+        Sigma_nom: The nominal covariance matrix.
+        delta: The uncertainty parameter.
+        num_samples: The number of covariance matrices to generate.
+        rng: A numpy.random.Generator or seed. Defaults to fresh entropy.
+        method: The sampling strategy; see generate_uncertainty_tensor.
+        psd: The PSD screening; see generate_uncertainty_tensor.
+        psd_tol: The tolerance of the PSD check.
+    Returns:
+        A list of numpy arrays.
+    """
+    return list(generate_uncertainty_tensor(Sigma_nom, delta, num_samples, rng, method, psd, psd_tol))
 
 import numpy as np
 
-            def calculate_portfolio_risk(w, Sigma):
-                """Calculates portfolio risk.
-                Args:
-                    w (np.array): Portfolio weights.
-                    Sigma (np.array): Covariance matrix.
-                Returns:
-                    float: Portfolio risk.
-                """
-                w = np.asarray(w)
-                Sigma = np.asarray(Sigma)
+def calculate_portfolio_risk(w, Sigma):
+    """Calculates portfolio risk.
+    Args:
+        w (np.array): Portfolio weights.
+        Sigma (np.array): Covariance matrix.
+    Returns:
+        float: Portfolio risk.
+    """
+    w = np.asarray(w)
+    if not isinstance(Sigma, FactorCovariance):
+        Sigma = np.asarray(Sigma)
+
+    if Sigma.shape[0] != Sigma.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
 
-                if Sigma.shape[0] != Sigma.shape[1]:
-                    raise ValueError("Covariance matrix must be square.")
+    if w.shape[0] != Sigma.shape[0]:
+        raise ValueError("Weight vector and covariance matrix must have compatible dimensions.")
 
-                if w.shape[0] != Sigma.shape[0]:
-                    raise ValueError("Weight vector and covariance matrix must have compatible dimensions.")
-                
-                risk = w.T @ Sigma @ w
-                return float(risk)
+    risk = w.T @ Sigma @ w
+    return float(risk)
 
-import plotly.express as px
 import numpy as np
 
-def visualize_risk_distribution(risk_values):
-    """Generates a histogram of portfolio risk values using plotly.express.
+def visualize_risk_distribution(risk_values, title='Distribution of Portfolio Risk', nbins=30, max_points=2048):
+    """Generates a histogram of portfolio risk values.
+
+    Samples are binned with numpy before plotting, so the figure carries nbins
+    bars however many samples there are.
+
     Args:
-        risk_values: A list or numpy array of portfolio risk values.
+        risk_values: A list or numpy array of portfolio risk values, a
+            (counts, bin_edges) tuple of precomputed bin counts, or the dict
+            returned by risk_distribution_exact (plotted as a density, or as
+            a single bar for a point mass).
+        title: The title of the figure.
+        nbins: The number of histogram bins for raw samples.
+        max_points: The largest number of density points sent to the figure.
     Returns:
         A plotly figure object.
     """
-    fig = px.histogram(risk_values, nbins=30, title='Distribution of Portfolio Risk')
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    if isinstance(risk_values, dict):
+        if len(risk_values["risk"]) == 1:
+            # A point mass (e.g. delta=0) has no area to plot; show its unit mass as a single bar.
+            fig = go.Figure(go.Bar(x=risk_values["risk"], y=risk_values["density"]))
+            fig.update_layout(title=title, xaxis_title='Portfolio Risk', yaxis_title='Probability')
+            return fig
+        step = max(1, -(-len(risk_values["risk"]) // max_points))
+        fig = px.area(x=risk_values["risk"][::step], y=risk_values["density"][::step], title=title,
+                      labels={'x': 'Portfolio Risk', 'y': 'Density'})
+        return fig
+
+    if isinstance(risk_values, tuple):
+        counts, edges = (np.asarray(part, dtype=float) for part in risk_values)
+    else:
+        values = np.asarray(risk_values)
+        if not np.issubdtype(values.dtype, np.number):
+            # Let plotly deal with mixed or non-numeric input as before.
+            return px.histogram(risk_values, nbins=nbins, title=title)
+        values = values[np.isfinite(values)]
+        counts, edges = np.histogram(values, bins=nbins)
+
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+    fig.update_layout(title=title, xaxis_title='Portfolio Risk', yaxis_title='Count', bargap=0)
     return fig
 
-import plotly.express as px
 import numpy as np
 
-def visualize_covariance_matrix(Sigma, title):
+def _block_edges(length, max_blocks):
+    """Start indices of at most max_blocks contiguous, nearly equal blocks covering range(length)."""
+    size = -(-length // max_blocks)
+    return np.arange(0, length, size)
+
+def _block_average(A, max_size):
+    """Averages a matrix over contiguous blocks so that neither side exceeds max_size.
+    Args:
+        A: A 2-D numpy array.
+        max_size: The largest number of rows or columns of the result.
+    Returns:
+        A tuple (block means, row block starts, column block starts).
+    """
+    rows, cols = _block_edges(A.shape[0], max_size), _block_edges(A.shape[1], max_size)
+    sums = np.add.reduceat(np.add.reduceat(A, rows, axis=0), cols, axis=1)
+    counts = np.outer(np.diff(np.append(rows, A.shape[0])), np.diff(np.append(cols, A.shape[1])))
+    return sums / counts, rows, cols
+
+def visualize_covariance_matrix(Sigma, title, region=None, max_size=200, text_max_size=20):
     """Generates a heatmap visualization of the covariance matrix using plotly.express.
+
+    Matrices larger than max_size on a side are shown as block averages, so
+    the figure payload stays bounded. Pass region to drill down into part of
+    the matrix at full resolution.
+
     Args:
         Sigma: A numpy array representing the covariance matrix.
         title: The title of the heatmap.
+        region: Optional ((row_start, row_stop), (col_start, col_stop)) to show
+            only that part of the matrix.
+        max_size: The largest number of rows or columns drawn.
+        text_max_size: Cell values are printed when the drawn matrix is at
+            most this size on both sides.
     Returns:
         A plotly figure object.
     """
@@ -86,25 +765,66 @@ def visualize_covariance_matrix(Sigma, title):
     if not np.issubdtype(Sigma.dtype, np.number):
         raise TypeError("Input matrix must be numeric")
 
-    fig = px.imshow(Sigma, title=title, color_continuous_scale="Viridis")
+    (row_start, row_stop), (col_start, col_stop) = region or ((0, Sigma.shape[0]), (0, Sigma.shape[1]))
+    block = Sigma[row_start:row_stop, col_start:col_stop]
+    if block.size == 0:
+        raise ValueError("region selects no entries")
+
+    if max(block.shape) > max_size:
+        block, rows, cols = _block_average(block, max_size)
+        y, x = rows + row_start, cols + col_start
+        title = f"{title} (block averages)"
+    else:
+        y, x = np.arange(row_start, row_start + block.shape[0]), np.arange(col_start, col_start + block.shape[1])
+
+    import plotly.express as px
+    fig = px.imshow(block, x=x, y=y, title=title, color_continuous_scale="Viridis",
+                    text_auto=".2f" if max(block.shape) <= text_max_size else False)
     return fig
 
+import concurrent.futures
+import multiprocessing
+import os
 import numpy as np
-import plotly.express as px
 import pandas as pd
 
-def sensitivity_analysis(Sigma_nom, delta_values, w):
-    """Re-calculates and re-visualizes the risk distribution for different values of the uncertainty parameter (delta).
+def _sensitivity_point(Sigma_nom, w, delta, num_samples, quantiles, seed):
+    """Evaluates one grid point of the sensitivity sweep."""
+    risks = sample_portfolio_risks(Sigma_nom, w, delta, num_samples, rng=seed)
+    row = {
+        "delta": delta,
+        "nominal_risk": float(w @ Sigma_nom @ w),
+        "worst_case_risk": worst_case_risk(Sigma_nom, w, delta)[0],
+        "mean_risk": float(np.mean(risks)),
+    }
+    for q, value in zip(quantiles, np.quantile(risks, quantiles)):
+        row[f"q{q:g}"] = float(value)
+    return row
+
+@traced()
+def sensitivity_sweep(Sigma_nom, w, delta_values, num_samples=10000, quantiles=(0.05, 0.5, 0.95), seed=0, max_workers=1):
+    """Computes nominal risk, worst-case risk and Monte Carlo risk quantiles for each delta in a grid.
+
+    Grid points can be spread across a process pool. Each point draws from
+    its own SeedSequence child stream, so the sampled columns do not depend
+    on the number of workers.
 
     Args:
         Sigma_nom: The nominal covariance matrix (numpy array).
-        delta_values: A list of delta values to explore.
         w: A numpy array representing the portfolio weight vector.
+        delta_values: A list of delta values to explore.
+        num_samples: The number of Monte Carlo samples per delta.
+        quantiles: The risk quantiles to report.
+        seed: The root seed for the per-point random streams.
+        max_workers: The number of worker processes; 1 runs in the calling
+            process and None uses one per CPU. Starting a pool only pays off
+            for long grids or large num_samples.
 
     Returns:
-        None (displays plots directly).
+        A pandas DataFrame with one row per delta and columns delta,
+        nominal_risk, worst_case_risk, mean_risk and one q<p> column per
+        quantile.
     """
-
     if not isinstance(Sigma_nom, np.ndarray) or not isinstance(w, np.ndarray):
         raise TypeError("Sigma_nom and w must be numpy arrays.")
 
@@ -113,31 +833,214 @@ def sensitivity_analysis(Sigma_nom, delta_values, w):
 
     if Sigma_nom.shape[0] != len(w):
         raise ValueError("Incompatible shapes between Sigma_nom and w.")
-    
-    portfolio_variances = []
 
-    for delta in delta_values:
-        Sigma_delta = Sigma_nom * (1 + delta)
-        portfolio_variance = w @ Sigma_delta @ w
-        portfolio_variances.append(portfolio_variance)
+    columns = ["delta", "nominal_risk", "worst_case_risk", "mean_risk"] + [f"q{q:g}" for q in quantiles]
+    delta_values = [float(delta) for delta in delta_values]
+    if not delta_values:
+        return pd.DataFrame(columns=columns)
+
+    seeds = np.random.SeedSequence(seed).spawn(len(delta_values))
+    args = [(Sigma_nom, w, delta, num_samples, tuple(quantiles), child) for delta, child in zip(delta_values, seeds)]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(args))
+    if max_workers <= 1:
+        rows = [_sensitivity_point(*point) for point in args]
+    else:
+        # spawn rather than fork: the parent may hold solver locks in other threads.
+        with concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            rows = list(executor.map(_sensitivity_point, *zip(*args)))
+
+    return pd.DataFrame(rows, columns=columns)
+
+def visualize_sensitivity(sweep):
+    """Generates a line chart of a sensitivity sweep using plotly.express.
+    Args:
+        sweep: The DataFrame returned by sensitivity_sweep.
+    Returns:
+        A plotly figure object.
+    """
+    import plotly.express as px
+
+    df = sweep.melt(id_vars="delta", var_name="Measure", value_name="Portfolio Variance")
+    fig = px.line(df, x="delta", y="Portfolio Variance", color="Measure", title="Sensitivity Analysis of Portfolio Variance")
+    return fig
+
+def sensitivity_analysis(Sigma_nom, delta_values, w, **sweep_options):
+    """Re-calculates the risk distribution for different values of the uncertainty parameter (delta).
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        delta_values: A list of delta values to explore.
+        w: A numpy array representing the portfolio weight vector.
+        **sweep_options: Passed through to sensitivity_sweep; it runs in the
+            calling process unless max_workers asks for a pool.
+
+    Returns:
+        The sensitivity_sweep DataFrame; render it with visualize_sensitivity.
+    """
+    return sensitivity_sweep(Sigma_nom, w, delta_values, **sweep_options)
+
+import numpy as np
+
+def _project_simplex(v):
+    """Euclidean projection of v onto the probability simplex {w : sum(w) = 1, w >= 0} (Duchi et al., O(n log n))."""
+    u = np.sort(v)[::-1]
+    cumulative = np.cumsum(u) - 1.0
+    rho = np.nonzero(u * np.arange(1, len(v) + 1) > cumulative)[0][-1]
+    return np.maximum(v - cumulative[rho] / (rho + 1.0), 0.0)
+
+def _max_eigenvalue(Sigma, iterations=50):
+    """Largest eigenvalue of a dense or factor covariance; exact for small dense matrices, power iteration otherwise."""
+    n = Sigma.shape[0]
+    if isinstance(Sigma, np.ndarray) and n <= 200:
+        return float(np.linalg.eigvalsh(Sigma)[-1])
+    x = np.random.default_rng(0).standard_normal(n)
+    value = 0.0
+    for _ in range(iterations):
+        y = Sigma @ x
+        norm = np.linalg.norm(y)
+        if norm == 0.0:
+            return 0.0
+        value, x = float(x @ y), y / norm
+    # Power iteration approaches from below; the margin keeps the gradient step stable.
+    return 1.05 * value
+
+def _complement_solve(R, support, rhs):
+    """Solves Sigma[S, S] @ x = rhs through the upper Cholesky factor R of Sigma, in O(n^2 |N| + |N|^3) for the complement N of S.
+
+    x is the restriction to S of Sigma^-1 (rhs on S, t on N), with t chosen
+    so the solution vanishes on N. With u = R^-T (rhs padded with zeros) and
+    Z = R^-T I[:, N] that condition reads Z.T (u + Z t) = 0.
+    """
+    from scipy.linalg import solve_triangular
+
+    n = R.shape[0]
+    outside = np.ones(n, dtype=bool)
+    outside[support] = False
+    padded = np.zeros((n, rhs.shape[1]))
+    padded[support] = rhs
+    # R.T is the Fortran-ordered lower factor, which LAPACK takes without a copy.
+    u = solve_triangular(R.T, padded, lower=True, check_finite=False)
+    if outside.any():
+        Z = solve_triangular(R.T, np.eye(n)[:, outside], lower=True, check_finite=False)
+        u -= Z @ np.linalg.solve(Z.T @ Z, Z.T @ u)
+    return solve_triangular(R.T, u, lower=True, trans="T", check_finite=False)[support]
+
+def _support_solve(Sigma, support, rhs, factor=None):
+    """Solves Sigma[S, S] @ x = rhs for the support S, using the Woodbury identity for a factor covariance.
+
+    Given the upper Cholesky factor of Sigma, the system is solved through it
+    (see _complement_solve) when most assets are in the support, since that
+    is cheaper than factoring Sigma[S, S] from scratch.
+    """
+    if factor is not None:
+        n, k = factor.shape[0], len(support)
+        if n * n * (n - k + 1) < k ** 3:
+            return _complement_solve(factor, support, rhs)
+    if isinstance(Sigma, FactorCovariance):
+        G, d = Sigma.G[support], Sigma.d[support]
+        if np.all(d > 0) and G.shape[1] < len(support):
+            scaled = rhs / d[:, None]
+            core = np.eye(G.shape[1]) + G.T @ (G / d[:, None])
+            return scaled - (G / d[:, None]) @ np.linalg.solve(core, G.T @ scaled)
+        return np.linalg.solve(G @ G.T + np.diag(d), rhs)
+    return np.linalg.solve(Sigma[support][:, support], rhs)
+
+def _simplex_qp(Sigma, mu, gamma, w0=None, tol=1e-10, max_iter=5000, factor=None):
+    """Maximizes mu @ w - gamma * w @ Sigma @ w over the probability simplex.
+
+    Accelerated projected gradient (FISTA with adaptive restart) finds the
+    support of the solution; a primal active-set method then solves the KKT
+    system on that support exactly and adds or drops assets until the
+    multipliers certify optimality. A warm start w0 skips the gradient phase,
+    and a known upper Cholesky factor of Sigma (factor) is reused for the KKT
+    systems where that is cheaper (see _support_solve).
+    """
+    n = len(mu)
+    if gamma == 0:
+        w = np.zeros(n)
+        w[np.argmax(mu)] = 1.0
+        return w
+
+    if w0 is not None:
+        w = _project_simplex(np.asarray(w0, dtype=float).reshape(-1))
+        # Rounding in the projection can lift exact zeros; keep the warm start's support.
+        w[w <= 1e-12] = 0.0
+        w /= w.sum()
+    elif n <= 20:
+        # Small problems go straight to the active-set phase from the full support.
+        w = np.full(n, 1.0 / n)
+    else:
+        # Gradient of the minimization form f(w) = gamma * w @ Sigma @ w - mu @ w.
+        step = 1.0 / max(2.0 * gamma * _max_eigenvalue(Sigma), np.finfo(float).tiny)
+        w = y = np.full(n, 1.0 / n)
+        t, stable = 1.0, 0
+        for _ in range(max_iter):
+            w_next = _project_simplex(y - step * (2.0 * gamma * (Sigma @ y) - mu))
+            if (w_next - w) @ (y - w_next) > 0:  # restart momentum when it points uphill
+                t = 1.0
+            t_next = (1.0 + np.sqrt(1.0 + 4.0 * t * t)) / 2.0
+            y = w_next + (t - 1.0) / t_next * (w_next - w)
+            stable = stable + 1 if np.array_equal(w_next > 0, w > 0) else 0
+            converged = np.max(np.abs(w_next - w)) <= 1e-8
+            w, t = w_next, t_next
+            if stable >= 20 or converged:
+                break
+
+    active = w > 0
+    ones = np.ones(n)
+    for _ in range(4 * n + 10):
+        support = np.flatnonzero(active)
+        # KKT on the support: 2 gamma Sigma_SS w_S = mu_S - nu, sum(w_S) = 1.
+        try:
+            a, b = _support_solve(Sigma, support, np.stack([mu[support], ones[support]], axis=1), factor).T
+        except np.linalg.LinAlgError:
+            return w
+        nu = (a.sum() - 2.0 * gamma) / b.sum()
+        candidate = np.zeros(n)
+        candidate[support] = (a - nu * b) / (2.0 * gamma)
+
+        blocking = support[candidate[support] < 0]
+        if len(blocking):
+            # Step from w towards the candidate until the first weight reaches zero, then drop it.
+            ratios = w[blocking] / (w[blocking] - candidate[blocking])
+            alpha = ratios.min()
+            w = np.maximum(w + alpha * (candidate - w), 0.0)
+            w[blocking[ratios <= alpha]] = 0.0
+            w /= w.sum()
+            active = w > 0
+            continue
 
-    if portfolio_variances:
-        df = pd.DataFrame({'Delta': delta_values, 'Portfolio Variance': portfolio_variances})
-        fig = px.line(df, x='Delta', y='Portfolio Variance', title='Sensitivity Analysis of Portfolio Variance')
-        fig.show()
+        w = candidate
+        multipliers = 2.0 * gamma * (Sigma @ w) - mu + nu
+        multipliers[support] = 0.0
+        entering = np.argmin(multipliers)
+        if multipliers[entering] >= -tol * max(1.0, np.abs(mu).max()):
+            break
+        active[entering] = True
+    return w
 
 import cvxpy as cp
 import numpy as np
 
-def optimize_portfolio(Sigma_nom, mu):
+@traced()
+def optimize_portfolio(Sigma_nom, mu, solver=None, gamma=0.1, backend="cvxpy", w0=None, verify=False, tol=1e-6):
     """Calculates the optimal portfolio weights using cvxpy subject to budget, return, and L1 norm constraints.
     Args:
         Sigma_nom: The nominal covariance matrix.
         mu: A numpy array of expected returns for each asset.
+        solver: The cvxpy solver name, or None to pick one for the covariance type.
+        gamma: The risk aversion. Use efficient_frontier for many values.
+        backend: "cvxpy", or "native" for the built-in NumPy simplex QP solver,
+            which avoids cvxpy's canonicalization cost on repeated solves.
+        w0: Optional warm start for the native backend, e.g. the previous solution.
+        verify: With the native backend, also solve with cvxpy and raise
+            cp.SolverError if the objectives differ by more than tol.
+        tol: The tolerance of the verification.
     Output:
         A numpy array representing the optimal portfolio weights.
     """
-    if not isinstance(Sigma_nom, np.ndarray) or not isinstance(mu, np.ndarray):
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(mu, np.ndarray):
         raise TypeError("Inputs must be numpy arrays.")
 
     if Sigma_nom.shape[0] != Sigma_nom.shape[1]:
@@ -146,13 +1049,25 @@ def optimize_portfolio(Sigma_nom, mu):
     if len(mu) != Sigma_nom.shape[0]:
         raise ValueError("mu and Sigma_nom must have compatible dimensions.")
 
+    if backend not in ("cvxpy", "native"):
+        raise ValueError("backend must be 'cvxpy' or 'native'.")
+    if backend == "native":
+        if gamma < 0:
+            raise ValueError("gamma must be non-negative.")
+        mu = np.asarray(mu, dtype=float).reshape(-1)
+        w = _simplex_qp(Sigma_nom, mu, gamma, w0=w0)
+        if verify:
+            reference = optimize_portfolio(Sigma_nom, mu, solver=solver, gamma=gamma)
+            utility = lambda x: mu @ x - gamma * calculate_portfolio_risk(x, Sigma_nom)
+            if abs(utility(w) - utility(reference)) > tol * max(1.0, abs(utility(reference))):
+                raise cp.SolverError("Native solver result differs from the cvxpy solution.")
+        return w
+
     n = len(mu)
     w = cp.Variable(n)
-    gamma = cp.Parameter(nonneg=True)
-    gamma.value = 0.1 # Set risk aversion
 
     ret = mu @ w
-    risk = cp.quad_form(w, Sigma_nom)
+    risk = _risk_expression(w, Sigma_nom)
     l1_norm = cp.norm(w, 1) # Encourage sparsity
 
     objective = cp.Maximize(ret - gamma * risk)
@@ -160,51 +1075,2259 @@ def optimize_portfolio(Sigma_nom, mu):
 
     problem = cp.Problem(objective, constraints)
     try:
-        problem.solve()
+        problem.solve(solver=solver or _default_solver(Sigma_nom))
     except cp.SolverError:
         raise cp.SolverError("Solver failed. Check if the covariance matrix is positive semi-definite.")
+    tracer.record_problem(problem)
 
     return w.value
 
+import concurrent.futures
+import multiprocessing
+import cvxpy as cp
+import numpy as np
+
+def _frontier_segment(Sigma_nom, mu, kind, values, l1_bound, solver, backend="cvxpy"):
+    """Solves one contiguous part of a frontier grid with a single compiled problem, warm-starting each point from the last."""
+    n = len(mu)
+    if backend == "native":
+        weights = np.empty((len(values), n))
+        w = None
+        for i, value in enumerate(values):
+            weights[i] = w = _simplex_qp(Sigma_nom, mu, value, w0=w)
+        return weights
+
+    w = cp.Variable(n)
+    parameter = cp.Parameter(nonneg=True) if kind == "gamma" else cp.Parameter()
+    risk = _risk_expression(w, Sigma_nom)
+    if kind == "gamma":
+        problem = cp.Problem(cp.Maximize(mu @ w - parameter * risk), [cp.sum(w) == 1, w >= 0])
+    else:
+        problem = cp.Problem(cp.Minimize(risk), [cp.sum(w) == 1, mu @ w >= parameter, cp.norm(w, 1) <= l1_bound])
+
+    weights = np.full((len(values), n), np.nan)
+    for i, value in enumerate(values):
+        parameter.value = value
+        try:
+            problem.solve(solver=solver, warm_start=True)
+        except cp.SolverError:
+            continue
+        tracer.record_problem(problem)
+        if w.value is not None and problem.status in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+            weights[i] = w.value
+    return weights
+
+@traced()
+def efficient_frontier(Sigma_nom, mu, gammas=None, target_returns=None, l1_bound=2.0, solver=None, max_workers=1, backend="cvxpy"):
+    """Traces the efficient frontier over a grid of risk aversions or target returns.
+
+    The problem is compiled once with the grid value as a cvxpy parameter
+    (DPP), so each further point only substitutes the new value, and every
+    solve is warm-started from the previous point's solution. With
+    max_workers > 1 the grid is split into contiguous segments, one compiled
+    problem per worker process.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array or FactorCovariance).
+        mu: A numpy array of expected returns for each asset.
+        gammas: Risk aversions for the optimize_portfolio problem
+            (maximize mu.T @ w - gamma * risk, long-only, fully invested).
+        target_returns: Minimum returns for the optimize_min_variance_portfolio
+            problem (budget, return and L1 constraints). Give either gammas
+            or target_returns; defaults to 50 log-spaced gammas in [0.01, 100].
+        l1_bound: The L1 bound used with target_returns.
+        solver: The cvxpy solver name, or None to pick one for the covariance type.
+        max_workers: The number of worker processes; 1 solves in the calling process.
+        backend: "cvxpy", or "native" to trace a gammas frontier with the
+            built-in simplex QP solver of optimize_portfolio.
+
+    Returns:
+        A dict with the grid ("gamma" or "target_return"), "weights" of shape
+        (k, n), and arrays "risk" (variance), "std" and "return". Points
+        without an optimal solution have NaN entries.
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(mu, np.ndarray):
+        raise TypeError("Inputs must be numpy arrays.")
+    if gammas is not None and target_returns is not None:
+        raise ValueError("Give either gammas or target_returns, not both.")
+    if backend not in ("cvxpy", "native"):
+        raise ValueError("backend must be 'cvxpy' or 'native'.")
+    if backend == "native" and target_returns is not None:
+        raise ValueError("The native backend only traces gammas frontiers.")
+
+    if Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    mu = mu.reshape(-1)
+    if len(mu) != Sigma_nom.shape[0]:
+        raise ValueError("mu and Sigma_nom must have compatible dimensions.")
+
+    kind = "gamma" if target_returns is None else "target_return"
+    values = np.asarray(np.logspace(-2, 2, 50) if gammas is None and target_returns is None else
+                        gammas if target_returns is None else target_returns, dtype=float).reshape(-1)
+    if backend == "native" and np.any(values < 0):
+        raise ValueError("gamma must be non-negative.")
+    solver = solver or _default_solver(Sigma_nom)
+
+    segments = [segment for segment in np.array_split(values, max(1, min(max_workers or 1, len(values)))) if len(segment)]
+    if len(segments) <= 1:
+        weights = _frontier_segment(Sigma_nom, mu, kind, values, l1_bound, solver, backend)
+    else:
+        # spawn rather than fork: the parent may hold solver locks in other threads.
+        with concurrent.futures.ProcessPoolExecutor(len(segments), mp_context=multiprocessing.get_context("spawn")) as executor:
+            parts = executor.map(_frontier_segment, *zip(*[(Sigma_nom, mu, kind, segment, l1_bound, solver, backend) for segment in segments]))
+            weights = np.concatenate(list(parts))
+
+    if isinstance(Sigma_nom, FactorCovariance):
+        risks = Sigma_nom.quad_form(weights)
+    else:
+        risks = np.einsum("ki,ij,kj->k", weights, Sigma_nom, weights)
+    return {kind: values, "weights": weights, "risk": risks, "std": np.sqrt(np.maximum(risks, 0.0)), "return": weights @ mu}
+
+import concurrent.futures
+import multiprocessing
+import os
 import numpy as np
 
+# Upper bound on the number of float64 entries materialized per chunk by the
+# batched samplers (2**21 entries = 16 MiB).
+_CHUNK_ELEMENTS = 2 ** 21
+
+def calculate_risk_batch(Sigmas, w):
+    """Calculates portfolio risk for a stack of covariance matrices in one contraction.
+
+    Args:
+        Sigmas: A numpy array of shape (k, n, n).
+        w: The portfolio weights (NumPy array of length n).
+
+    Returns:
+        A numpy array of k portfolio risk values.
+    """
+    if not isinstance(Sigmas, np.ndarray):
+        raise TypeError("Covariance matrix must be a NumPy array.")
+    if not isinstance(w, np.ndarray):
+        raise TypeError("Weights must be a NumPy array.")
+    if not np.issubdtype(Sigmas.dtype, np.number):
+        raise TypeError("Covariance matrix must contain numeric values.")
+
+    if Sigmas.ndim != 3 or Sigmas.shape[1] != Sigmas.shape[2]:
+        raise ValueError("Covariance matrix must be square.")
+
+    if Sigmas.shape[1] != len(w):
+        raise ValueError("Weight dimensions must match covariance matrix dimensions.")
+
+    return Sigmas @ w @ w
+
 def calculate_risk_distribution(uncertainty_set, w):
     """Calculates portfolio risk for each covariance matrix in the uncertainty set.
 
     Args:
-        uncertainty_set: A list of covariance matrices (NumPy arrays).
+        uncertainty_set: A list of covariance matrices (NumPy arrays), a
+            stacked array, or a PackedCovarianceSet.
         w: The portfolio weights (NumPy array).
 
     Returns:
         A list of portfolio risk values.
     """
-    risks = []
-    if not uncertainty_set:
-        return risks
+    if len(uncertainty_set) == 0:
+        return []
 
     if not isinstance(w, np.ndarray):
         raise TypeError("Weights must be a NumPy array.")
 
-    for covariance_matrix in uncertainty_set:
-        if not isinstance(covariance_matrix, np.ndarray):
-            raise TypeError("Covariance matrix must be a NumPy array.")
-            
-        if covariance_matrix.shape[0] != covariance_matrix.shape[1]:
-            raise ValueError("Covariance matrix must be square.")
+    if isinstance(uncertainty_set, PackedCovarianceSet):
+        return uncertainty_set.risks(w).tolist()
 
-        if covariance_matrix.shape[0] != len(w):
-            raise ValueError("Weight dimensions must match covariance matrix dimensions.")
+    if isinstance(uncertainty_set, np.ndarray):
+        return calculate_risk_batch(uncertainty_set, w).tolist()
 
-        try:
-            risk = w @ covariance_matrix @ w.T
-            risks.append(risk)
-        except TypeError:
-             raise TypeError("Covariance matrix must contain numeric values.")
+    if not all(isinstance(covariance_matrix, np.ndarray) for covariance_matrix in uncertainty_set):
+        raise TypeError("Covariance matrix must be a NumPy array.")
 
-    return risks
+    shapes = {covariance_matrix.shape for covariance_matrix in uncertainty_set}
+    if len(shapes) != 1:
+        raise ValueError("Covariance matrices must all have the same shape.")
+    shape, = shapes
+    if len(shape) != 2 or shape[0] != shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    return calculate_risk_batch(np.stack(uncertainty_set), w).tolist()
+
+def _stream_block_size(width, method="random"):
+    """Samples per child stream; depends only on the width and method so results never depend on chunking.
+
+    Antithetic blocks are even so pairs never straddle two streams. QMC and
+    Latin hypercube blocks are powers of two of at most 512, so a run holds
+    enough independent replicates to estimate its effective sample size.
+    """
+    size = max(1, min(4096, _CHUNK_ELEMENTS // width))
+    if method == "antithetic":
+        return max(2, size - size % 2)
+    if method in ("sobol", "halton", "lhs"):
+        return 2 ** int(np.log2(min(size, 512)))
+    return size
+
+def _risk_weights(w, symmetric=True, zero_diagonal=False):
+    """The coefficients c with w.T @ Delta @ w = c @ (free entries of Delta)."""
+    n = len(w)
+    if symmetric:
+        rows, cols = np.triu_indices(n, k=1 if zero_diagonal else 0)
+        return np.where(rows == cols, 1.0, 2.0) * w[rows] * w[cols]
+    W = np.outer(w, w)
+    if zero_diagonal:
+        np.fill_diagonal(W, 0.0)
+    return W.reshape(-1)
+
+def _sample_risk_chunk(W, nominal_risk, delta, seed_seq, block_size, first_block, last_block, num_samples, method="random", screen=None):
+    """Risks for the samples covered by blocks [first_block, last_block), PSD-screened if screen is given."""
+    Delta = _uniform_blocks(seed_seq, block_size, first_block, last_block, num_samples, len(W), delta, method)
+    risks = nominal_risk + Delta @ W
+    return risks if screen is None else _screen_risks(risks, Delta, screen)
+
+@traced()
+def sample_portfolio_risks(Sigma_nom, w, delta, num_samples, symmetric=True, chunk_size=None, zero_diagonal=False, rng=None, max_workers=1, method="random",
+                           psd=None, psd_tol=1e-10):
+    """Samples portfolio risks w.T @ (Sigma_nom + Delta) @ w for uniform perturbations |Delta_ij| <= delta.
+
+    The perturbations are drawn in chunks of at most chunk_size matrices and
+    contracted against the weights in a single product per chunk, so memory
+    stays bounded by the chunk size rather than by num_samples. Samples come
+    in fixed-size blocks, each with its own SeedSequence child stream, so the
+    result is bit-identical for any chunk_size or max_workers.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (NumPy array).
+        w: The portfolio weights (NumPy array).
+        delta: The uncertainty parameter.
+        num_samples: The number of perturbations to draw.
+        symmetric: If True, Delta is symmetric and only its upper triangle
+            (diagonal included, as in the application pages) is drawn;
+            otherwise every entry is independent.
+        chunk_size: Number of perturbations per chunk, rounded up to whole
+            stream blocks. Defaults to a chunk of roughly 16 MiB.
+        zero_diagonal: If True, the diagonal of Delta is held at zero, as in
+            the worst-case SDP.
+        rng: A numpy.random.Generator, seed or SeedSequence. Defaults to
+            fresh entropy.
+        max_workers: The number of worker processes to shard chunks across.
+        method: The sampling strategy over the free entries: "random"
+            (pseudo-random), "antithetic" (pairs Delta, -Delta in consecutive
+            samples), or scrambled "sobol", "halton" or Latin hypercube "lhs"
+            point sets, one independent replicate per stream block. "sobol"
+            is limited to 21201 free entries: n <= 205 for a symmetric Delta
+            (206 with zero_diagonal, 145 if not symmetric); larger n raise
+            ValueError.
+        psd: None keeps every sample. "reject" drops the samples whose
+            Sigma_nom + Delta is not positive semi-definite, so fewer than
+            num_samples risks are returned and len(result) / num_samples is
+            the acceptance rate. "project" evaluates those samples at their
+            nearest PSD matrix instead. Screening builds each chunk's
+            matrices, so it costs O(n^3) per sample.
+        psd_tol: The tolerance of the PSD check; see psd_mask.
+
+    Returns:
+        A numpy array of num_samples portfolio risk values.
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(w, np.ndarray):
+        raise TypeError("Sigma_nom and w must be numpy arrays.")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+    _check_sampling_method(method)
+    _check_psd_mode(psd)
+
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    w = w.reshape(-1)
+    n = Sigma_nom.shape[0]
+    if len(w) != n:
+        raise ValueError("Weight dimensions must match covariance matrix dimensions.")
+
+    # w.T @ Delta @ w is linear in the free entries of Delta, so each chunk
+    # reduces to a single matrix-vector product against the weight products.
+    W = _risk_weights(w, symmetric, zero_diagonal)
+    nominal_risk = float(w @ Sigma_nom @ w)
+    _check_sampling_width(method, len(W))
+
+    if num_samples == 0:
+        return np.empty(0)
+
+    seed_seq = _as_seed_sequence(rng)
+    block_size = _stream_block_size(len(W), method)
+    if chunk_size is None:
+        chunk_size = _CHUNK_ELEMENTS // len(W)
+    blocks_per_chunk = max(1, -(-chunk_size // block_size))
+    num_blocks = -(-num_samples // block_size)
+    chunks = [(first, min(first + blocks_per_chunk, num_blocks)) for first in range(0, num_blocks, blocks_per_chunk)]
+    screen = _psd_screen(Sigma_nom, w, symmetric, zero_diagonal, psd, psd_tol)
+    args = [(W, nominal_risk, delta, seed_seq, block_size, first, last, num_samples, method, screen) for first, last in chunks]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(chunks))
+    if max_workers <= 1:
+        return np.concatenate([_sample_risk_chunk(*chunk) for chunk in args])
+    with concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return np.concatenate(list(executor.map(_sample_risk_chunk, *zip(*args))))
+
+def _effective_sample_size(values, groups):
+    """Effective sample size of the mean of values, from the spread of the means of independent groups.
+
+    With B groups of m samples, Var(mean) = Var(group mean) / B, and the
+    effective sample size is the number of independent draws giving the same
+    variance: Var(values) * B / Var(group mean).
+    """
+    counts = np.bincount(groups)
+    group_means = np.bincount(groups, values) / counts
+    full = counts == counts.max()
+    if np.sum(full) < 2:
+        return np.nan
+    variance = np.var(values, ddof=1)
+    group_variance = np.var(group_means[full], ddof=1)
+    if variance == 0:
+        return float(len(values))
+    if group_variance <= np.finfo(float).eps * variance:
+        # Exact up to rounding, e.g. the mean under antithetic pairs, which is linear in Delta.
+        return np.inf
+    return float(variance / group_variance * len(values) / counts.max())
+
+@traced()
+def sample_risk_quantiles(Sigma_nom, w, delta, num_samples, method="sobol", quantiles=(0.05, 0.5, 0.95), symmetric=True, zero_diagonal=False, rng=None):
+    """Samples portfolio risks with a variance-reduced strategy and reports its effective sample size.
+
+    The effective sample size is the number of independent pseudo-random
+    draws that would estimate the same statistic as precisely. It is
+    measured from the spread across independent replicates: antithetic
+    pairs for "antithetic", stream blocks (each an independently scrambled
+    point set) for "sobol", "halton" and "lhs". For a quantile it refers to
+    the indicator risk <= quantile, i.e. the accuracy of the quantile level.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (NumPy array).
+        w: The portfolio weights (NumPy array).
+        delta: The uncertainty parameter.
+        num_samples: The number of perturbations to draw.
+        method: The sampling strategy; see sample_portfolio_risks.
+        quantiles: Probabilities at which to report quantiles.
+        symmetric: See sample_portfolio_risks.
+        zero_diagonal: See sample_portfolio_risks.
+        rng: A numpy.random.Generator, seed or SeedSequence.
+
+    Returns:
+        A dict with the sampled "risks", their "mean", a "quantiles" dict
+        mapping each probability to a risk value, and "effective_sample_size",
+        a dict with the value for the "mean" and a "quantiles" dict. The
+        effective sample size is num_samples for "random" and nan when fewer
+        than two replicates were drawn.
+    """
+    risks = sample_portfolio_risks(Sigma_nom, w, delta, num_samples, symmetric=symmetric, zero_diagonal=zero_diagonal, rng=rng, method=method)
+    return _summarize_risk_quantiles(risks, w, method, quantiles, symmetric, zero_diagonal)
+
+def _summarize_risk_quantiles(risks, w, method, quantiles, symmetric=True, zero_diagonal=False):
+    """The sample_risk_quantiles result for risks drawn by sample_portfolio_risks with the given options."""
+    num_samples = len(risks)
+    levels = dict(zip(quantiles, np.quantile(risks, quantiles))) if num_samples else {q: np.nan for q in quantiles}
+
+    if method == "random":
+        ess = {"mean": float(num_samples), "quantiles": {q: float(num_samples) for q in quantiles}}
+    else:
+        index = np.arange(num_samples)
+        groups = index // 2 if method == "antithetic" else index // _stream_block_size(len(_risk_weights(w.reshape(-1), symmetric, zero_diagonal)), method)
+        ess = {"mean": _effective_sample_size(risks, groups),
+               "quantiles": {q: _effective_sample_size((risks <= level).astype(float), groups) for q, level in levels.items()}}
+
+    return {"risks": risks, "mean": float(np.mean(risks)) if num_samples else np.nan,
+            "quantiles": {q: float(level) for q, level in levels.items()}, "effective_sample_size": ess}
+
+class PackedCovarianceSet:
+    """A stack of symmetric covariance matrices stored as packed upper triangles.
+
+    Each matrix keeps only its n(n+1)/2 upper-triangular entries, roughly
+    halving memory, or quartering it with float32 storage. Portfolio risks
+    are evaluated directly on the packed form with one product per chunk.
+
+    Args:
+        packed: Array of shape (k, n(n+1)/2) in np.triu_indices(n) order.
+        n: The number of assets.
+    """
+
+    def __init__(self, packed, n):
+        packed = np.asarray(packed)
+        if packed.ndim != 2 or packed.shape[1] != n * (n + 1) // 2:
+            raise ValueError("packed must have shape (k, n(n+1)/2).")
+        self.packed = packed
+        self.n = n
+
+    @classmethod
+    def from_dense(cls, Sigmas, dtype=np.float64):
+        """Packs a (k, n, n) stack (or list) of symmetric matrices."""
+        Sigmas = np.asarray(Sigmas)
+        if Sigmas.ndim != 3 or Sigmas.shape[1] != Sigmas.shape[2]:
+            raise ValueError("Covariance matrix must be square.")
+        n = Sigmas.shape[1]
+        rows, cols = np.triu_indices(n)
+        return cls(Sigmas[:, rows, cols].astype(dtype, copy=False), n)
+
+    @property
+    def dtype(self):
+        return self.packed.dtype
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __len__(self):
+        return self.packed.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PackedCovarianceSet(self.packed[index], self.n)
+        return self._unpack(self.packed[index][None])[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _unpack(self, packed):
+        rows, cols = np.triu_indices(self.n)
+        Sigmas = np.zeros((packed.shape[0], self.n, self.n))
+        Sigmas[:, rows, cols] = packed
+        Sigmas[:, cols, rows] = packed
+        return Sigmas
+
+    def to_dense(self):
+        """Unpacks the set into a float64 array of shape (k, n, n)."""
+        return self._unpack(self.packed)
+
+    def risks(self, w):
+        """Calculates w.T @ Sigma @ w for every matrix in the set.
+        Args:
+            w: The portfolio weights (numpy array of length n).
+        Returns:
+            A numpy array of len(self) portfolio risk values.
+        """
+        w = np.asarray(w, dtype=float).reshape(-1)
+        if len(w) != self.n:
+            raise ValueError("Weight dimensions must match covariance matrix dimensions.")
+        W = _risk_weights(w)
+        # Chunks are upcast to float64 so float32 storage does not lose precision in the sum.
+        chunk_size = max(1, _CHUNK_ELEMENTS // len(W))
+        risks = np.empty(len(self))
+        for start in range(0, len(self), chunk_size):
+            risks[start:start + chunk_size] = self.packed[start:start + chunk_size].astype(np.float64) @ W
+        return risks
+
+def generate_packed_uncertainty_set(Sigma_nom, delta, num_samples, dtype=np.float64, zero_diagonal=False, rng=None, method="random"):
+    """Generates symmetric covariance matrices within the uncertainty set in packed form.
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        delta: The uncertainty parameter.
+        num_samples: The number of covariance matrices to generate.
+        dtype: The storage dtype, np.float64 or np.float32.
+        zero_diagonal: If True, the diagonal of Delta is held at zero.
+        rng: A numpy.random.Generator, seed or SeedSequence. Defaults to
+            fresh entropy. Draws use the same block streams as
+            sample_portfolio_risks.
+        method: The sampling strategy over the free entries; see
+            sample_portfolio_risks.
+    Returns:
+        A PackedCovarianceSet.
+    """
+    if not isinstance(Sigma_nom, np.ndarray):
+        raise TypeError("Sigma_nom must be a numpy array")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+    _check_sampling_method(method)
+
+    n = Sigma_nom.shape[0]
+    rows, cols = np.triu_indices(n)
+    nominal = Sigma_nom[rows, cols]
+    # Only the free entries are drawn, so QMC dimensions are not spent on a held-fixed diagonal.
+    free = rows != cols if zero_diagonal else np.ones(len(rows), dtype=bool)
+    _check_sampling_width(method, int(np.sum(free)))
+    seed_seq = _as_seed_sequence(rng)
+    block_size = _stream_block_size(int(np.sum(free)), method)
+
+    packed = np.empty((num_samples, len(rows)), dtype=dtype)
+    packed[:, ~free] = nominal[~free]
+    for block in range(-(-num_samples // block_size)):
+        start = block * block_size
+        stop = min(start + block_size, num_samples)
+        packed[start:stop, free] = nominal[free] + _uniform_blocks(seed_seq, block_size, block, block + 1, num_samples, int(np.sum(free)), delta, method)
+    return PackedCovarianceSet(packed, n)
+
+import concurrent.futures
+import multiprocessing
+import os
+import statistics
+import numpy as np
+
+def _normal_quantile(confidence):
+    return statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+class RiskAccumulator:
+    """Streaming statistics of sampled portfolio risks in bounded memory.
+
+    Mean and variance are kept with Welford's update (Chan's formula for
+    batches and merges). Quantiles come from a merging t-digest style sketch:
+    values are kept as weighted centroids, and compression merges neighbours
+    under the arcsine scale function, which keeps the tails at fine
+    resolution. At most about compression centroids are kept.
+
+    Accumulators built from disjoint samples, e.g. by parallel workers, can
+    be combined with merge().
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.count = 0
+        self.rejected = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        difference = mean - self.mean
+        self.mean += difference * count / total
+        self._m2 += m2 + difference ** 2 * self.count * count / total
+        self.count = total
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        q = (np.cumsum(weights) - weights / 2) / np.sum(weights)
+        groups = np.floor(self.compression / np.pi * (np.arcsin(2 * q - 1) + np.pi / 2)).astype(np.intp)
+        merged_weights = np.bincount(groups, weights)
+        keep = merged_weights > 0
+        self._weights = merged_weights[keep]
+        self._means = np.bincount(groups, weights * means)[keep] / self._weights
+
+    def update(self, values):
+        """Adds a batch of risk values.
+        Args:
+            values: A numpy array of risk values.
+        Returns:
+            The accumulator itself.
+        """
+        values = np.asarray(values, dtype=float).reshape(-1)
+        if values.size == 0:
+            return self
+        mean = float(np.mean(values))
+        self._combine(values.size, mean, float(np.sum((values - mean) ** 2)))
+        self.min = min(self.min, float(np.min(values)))
+        self.max = max(self.max, float(np.max(values)))
+        self._compress(np.concatenate([self._means, values]), np.concatenate([self._weights, np.ones(values.size)]))
+        return self
+
+    def merge(self, other):
+        """Adds the samples summarized by another accumulator.
+        Args:
+            other: A RiskAccumulator built from different samples.
+        Returns:
+            The accumulator itself.
+        """
+        self.rejected += other.rejected
+        if other.count == 0:
+            return self
+        self._combine(other.count, other.mean, other._m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self._means, other._means]), np.concatenate([self._weights, other._weights]))
+        return self
+
+    @property
+    def acceptance_rate(self):
+        """The fraction of drawn samples kept, below one when non-PSD samples were rejected."""
+        drawn = self.count + self.rejected
+        return self.count / drawn if drawn else np.nan
+
+    @property
+    def variance(self):
+        """The sample variance (ddof=1) of the risks seen so far."""
+        return self._m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+    def quantile(self, q):
+        """Estimates the q-quantile (scalar or array) by interpolating between centroids."""
+        if self.count == 0:
+            raise ValueError("No samples have been accumulated.")
+        positions = np.cumsum(self._weights) - self._weights / 2
+        x = np.concatenate([[0.0], positions, [self.count]])
+        y = np.concatenate([[self.min], self._means, [self.max]])
+        return np.interp(np.asarray(q, dtype=float) * self.count, x, y)
+
+    def tail_mean(self, q):
+        """Estimates the mean risk above the q-quantile (the upper-tail expected shortfall)."""
+        if self.count == 0:
+            raise ValueError("No samples have been accumulated.")
+        above = np.clip(np.cumsum(self._weights) - q * self.count, 0.0, self._weights)
+        if np.sum(above) == 0:
+            return self.max
+        return float(np.sum(above * self._means) / np.sum(above))
+
+    def mean_half_width(self, confidence=0.95):
+        """Half-width of the normal confidence interval for the mean."""
+        if self.count < 2:
+            return np.inf
+        return _normal_quantile(confidence) * np.sqrt(self.variance / self.count)
+
+    def quantile_half_width(self, q, confidence=0.95):
+        """Half-width of the distribution-free (order statistic) confidence interval for the q-quantile."""
+        if self.count < 2:
+            return np.inf
+        spread = _normal_quantile(confidence) * np.sqrt(q * (1 - q) / self.count)
+        lower, upper = self.quantile([max(q - spread, 0.0), min(q + spread, 1.0)])
+        return (upper - lower) / 2
+
+    def histogram(self, bins=30):
+        """Approximate (counts, bin_edges) of the risks, for visualize_risk_distribution."""
+        value_range = (self.min, self.max) if self.count else None
+        return np.histogram(self._means, bins=bins, range=value_range, weights=self._weights)
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        """A dict of count, mean, std, min, max and the requested quantiles."""
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max,
+                **{f"q{q:g}": float(self.quantile(q)) for q in quantiles}}
+
+def _accumulate_risk_chunk(W, nominal_risk, delta, seed_seq, block_size, first_block, last_block, num_samples, compression, method="random", screen=None):
+    """A RiskAccumulator over the samples covered by blocks [first_block, last_block)."""
+    risks = _sample_risk_chunk(W, nominal_risk, delta, seed_seq, block_size, first_block, last_block, num_samples, method, screen)
+    accumulator = RiskAccumulator(compression).update(risks)
+    accumulator.rejected = min(last_block * block_size, num_samples) - first_block * block_size - len(risks)
+    return accumulator
+
+def _statistics_converged(accumulator, mean_tol, quantile_tol, quantiles, confidence, min_samples, max_samples):
+    """The stopping rule of sample_risk_statistics."""
+    if accumulator.count + accumulator.rejected >= max_samples:
+        return True
+    if accumulator.count < min_samples or (mean_tol is None and quantile_tol is None):
+        return False
+    if mean_tol is not None and accumulator.mean_half_width(confidence) > mean_tol:
+        return False
+    return quantile_tol is None or all(accumulator.quantile_half_width(q, confidence) <= quantile_tol for q in quantiles)
+
+@traced()
+def sample_risk_statistics(Sigma_nom, w, delta, mean_tol=None, quantile_tol=None, quantiles=(0.05, 0.5, 0.95), confidence=0.95,
+                           min_samples=1000, max_samples=1000000, batch_size=None, symmetric=True, zero_diagonal=False,
+                           rng=None, max_workers=1, compression=100, method="random", psd=None, psd_tol=1e-10, progress=None):
+    """Samples portfolio risks into a RiskAccumulator until the requested precision is reached.
+
+    Samples are drawn from the same block streams as sample_portfolio_risks,
+    so the first k samples are the ones sample_portfolio_risks(..., k, rng)
+    returns. After each batch (each round of max_workers batches in parallel)
+    sampling stops once at least min_samples are in and every requested
+    tolerance is met; without tolerances it runs to max_samples.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (NumPy array).
+        w: The portfolio weights (NumPy array).
+        delta: The uncertainty parameter.
+        mean_tol: Target half-width of the confidence interval for the mean risk.
+        quantile_tol: Target half-width of the confidence interval of each quantile.
+        quantiles: The quantiles checked against quantile_tol.
+        confidence: The confidence level of the intervals.
+        min_samples: Samples drawn before stopping is considered.
+        max_samples: Hard cap on the number of samples.
+        batch_size: Samples between stopping checks, rounded up to whole
+            stream blocks. Defaults to one block.
+        symmetric: See sample_portfolio_risks.
+        zero_diagonal: See sample_portfolio_risks.
+        rng: A numpy.random.Generator, seed or SeedSequence.
+        max_workers: The number of worker processes; each takes one batch per round.
+        compression: The sketch compression of the accumulator.
+        method: The sampling strategy; see sample_portfolio_risks. The
+            stopping intervals assume independent draws, so they are
+            conservative for the variance-reduced methods.
+        psd: PSD screening of the samples; see sample_portfolio_risks. With
+            "reject", max_samples caps the draws and the accumulator's
+            rejected and acceptance_rate report the screening.
+        psd_tol: The tolerance of the PSD check.
+        progress: Optional callable given the accumulator after each batch
+            (round); returning True stops sampling, e.g. when a background
+            job has been cancelled.
+
+    Returns:
+        A RiskAccumulator over the drawn samples.
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(w, np.ndarray):
+        raise TypeError("Sigma_nom and w must be numpy arrays.")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    w = w.reshape(-1)
+    if len(w) != Sigma_nom.shape[0]:
+        raise ValueError("Weight dimensions must match covariance matrix dimensions.")
+
+    _check_sampling_method(method)
+    _check_psd_mode(psd)
+
+    W = _risk_weights(w, symmetric, zero_diagonal)
+    _check_sampling_width(method, len(W))
+    nominal_risk = float(w @ Sigma_nom @ w)
+    seed_seq = _as_seed_sequence(rng)
+    block_size = _stream_block_size(len(W), method)
+    blocks_per_batch = max(1, -(-(batch_size or block_size) // block_size))
+    num_blocks = -(-max_samples // block_size)
+
+    def converged(accumulator):
+        return _statistics_converged(accumulator, mean_tol, quantile_tol, quantiles, confidence, min_samples, max_samples)
+
+    accumulator = RiskAccumulator(compression)
+    batches = [(first, min(first + blocks_per_batch, num_blocks)) for first in range(0, num_blocks, blocks_per_batch)]
+    screen = _psd_screen(Sigma_nom, w, symmetric, zero_diagonal, psd, psd_tol)
+    args = [(W, nominal_risk, delta, seed_seq, block_size, first, last, max_samples, compression, method, screen) for first, last in batches]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(args))
+    if max_workers <= 1:
+        for batch in args:
+            accumulator.merge(_accumulate_risk_chunk(*batch))
+            if converged(accumulator) or (progress is not None and progress(accumulator)):
+                break
+        return accumulator
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for start in range(0, len(args), max_workers):
+            for partial in executor.map(_accumulate_risk_chunk, *zip(*args[start:start + max_workers])):
+                accumulator.merge(partial)
+            if converged(accumulator) or (progress is not None and progress(accumulator)):
+                break
+    return accumulator
+
+import collections
+import functools
+import threading
+import cvxpy as cp
+import numpy as np
+
+def _problem_cache(maxsize=16):
+    """functools.lru_cache for problem factories taking numpy arrays, keyed on the argument contents."""
+    def decorator(build):
+        problems = collections.OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(build)
+        def wrapper(*args):
+            key = _content_hash(*args)
+            with lock:
+                if key in problems:
+                    problems.move_to_end(key)
+                    return problems[key]
+            problem = build(*args)
+            with lock:
+                problems[key] = problem
+                while len(problems) > maxsize:
+                    problems.popitem(last=False)
+            return problem
+
+        wrapper.cache_clear = problems.clear
+        return wrapper
+    return decorator
+
+class WorstCaseProblem:
+    """The worst-case risk SDP for one (Sigma_nom, w), compiled once and re-solved for new deltas.
+
+    Sigma_nom and the weight outer product w w.T are constants and only
+    delta is a cvxpy parameter, so the problem is DPP with a parameter that
+    enters only the bound |Delta_ij| <= delta: after the first solve cvxpy
+    substitutes the new delta instead of re-canonicalizing, and the solver is
+    warm-started from the previous solution where it supports it. (Making
+    the n x n inputs parameters as well would have cvxpy build an O(n^4)
+    parameter tensor.)
+    """
+
+    def __init__(self, Sigma_nom, w, solver=None):
+        w = np.asarray(w, dtype=float).reshape(-1)
+        n = len(w)
+        self.n = n
+        self.solver = solver
+        self.nominal_risk = float(w @ Sigma_nom @ w)
+        self.delta = cp.Parameter(nonneg=True)
+        self.Delta = cp.Variable((n, n), symmetric=True)
+        self.problem = cp.Problem(
+            cp.Maximize(cp.sum(cp.multiply(np.outer(w, w), self.Delta))),
+            [(Sigma_nom + Sigma_nom.T) / 2 + self.Delta >> 0, cp.diag(self.Delta) == 0, cp.abs(self.Delta) <= self.delta]
+        )
+        self._lock = threading.Lock()
+
+    def solve(self, delta):
+        """Solves the worst-case risk problem.
+        Args:
+            delta: The uncertainty parameter.
+        Returns:
+            A tuple (worst-case portfolio risk, optimal Delta matrix).
+        """
+        with self._lock:
+            self.delta.value = float(delta)
+            try:
+                self.problem.solve(solver=self.solver, warm_start=True)
+            except cp.SolverError:
+                raise cp.SolverError("Solver failed. Check if the covariance matrix is positive semi-definite.")
+            tracer.record_problem(self.problem)
+            if self.problem.value is None or not np.isfinite(self.problem.value):
+                raise cp.SolverError(f"Worst-case problem is {self.problem.status}.")
+            Delta = self.Delta.value.copy()
+        return self.nominal_risk + float(self.problem.value), Delta
+
+@_problem_cache(maxsize=16)
+def _worst_case_problem(Sigma_nom, w, solver=None):
+    return WorstCaseProblem(Sigma_nom, w, solver)
+
+@traced()
+def solve_worst_case_sdp(Sigma_nom, w, delta, solver=None):
+    """Solves the worst-case risk SDP over S = {Sigma_nom + Delta : |Delta_ij| <= delta, Delta_ii = 0, Sigma_nom + Delta PSD}.
+
+    The compiled problem is shared by every call with the same Sigma_nom and
+    w, so a delta sweep skips cvxpy canonicalization after the first solve.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        w: The portfolio weights (numpy array).
+        delta: The uncertainty parameter.
+        solver: The cvxpy solver name, or None for the cvxpy default.
+
+    Returns:
+        A tuple (worst-case portfolio risk, optimal Delta matrix).
+    """
+    w = np.asarray(w, dtype=float).reshape(-1)
+    return _worst_case_problem(np.asarray(Sigma_nom, dtype=float), w, solver).solve(delta)
+
+def _is_worst_case_psd(Sigma_nom, sign_w, delta):
+    """Whether Sigma_nom + Delta is PSD for the closed-form Delta = delta * (s s.T - diag(s^2)), s = sign(w).
+
+    Two O(n^2) Gershgorin certificates are tried first: diagonal dominance of
+    Sigma_nom + Delta, and of Sigma_nom - delta * diag(s^2), which suffices
+    since adding the PSD delta * s s.T keeps it PSD. Only when both fail is a
+    Cholesky factorization attempted, which costs O(n^3).
+    """
+    diagonal = np.diag(Sigma_nom)
+    off_diagonal = np.sum(np.abs(Sigma_nom), axis=1) - np.abs(diagonal)
+    if np.all(diagonal - delta * sign_w ** 2 >= off_diagonal):
+        return True
+    Sigma = Sigma_nom + delta * (np.outer(sign_w, sign_w) - np.diag(sign_w ** 2))
+    if np.all(np.diag(Sigma) >= np.sum(np.abs(Sigma), axis=1) - np.abs(np.diag(Sigma))):
+        return True
+    try:
+        np.linalg.cholesky(Sigma)
+    except np.linalg.LinAlgError:
+        return False
+    return True
+
+def worst_case_risk(Sigma_nom, w, delta):
+    """Calculates the worst-case portfolio risk over the box uncertainty set.
+
+    Without the PSD constraint the maximum of w.T @ (Sigma_nom + Delta) @ w is
+    attained at Delta_ij = delta * sign(w_i * w_j) off the diagonal, giving
+    nominal risk + delta * sum_{i != j} |w_i| |w_j|. That closed form is
+    returned whenever Sigma_nom + Delta is certified PSD; otherwise the SDP is
+    solved. The certificate costs O(n^2) when a Gershgorin bound settles it
+    (O(n) for a FactorCovariance) and falls back to an O(n^3) Cholesky
+    factorization, still far cheaper than the SDP, when it does not.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        w: The portfolio weights (numpy array).
+        delta: The uncertainty parameter.
+
+    Returns:
+        A tuple (worst-case portfolio risk, optimal Delta matrix).
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(w, np.ndarray):
+        raise TypeError("Sigma_nom and w must be numpy arrays.")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+    if delta < 0:
+        raise ValueError("delta must be non-negative.")
+
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Sigma_nom must be a square matrix.")
+
+    w = w.reshape(-1)
+    if Sigma_nom.shape[0] != len(w):
+        raise ValueError("Incompatible shapes between Sigma_nom and w.")
+
+    abs_w = np.abs(w)
+    nominal_risk = w @ Sigma_nom @ w
+    bound = nominal_risk + delta * (np.sum(abs_w) ** 2 - np.sum(abs_w ** 2))
+
+    sign_w = np.sign(w)
+    Delta = delta * np.outer(sign_w, sign_w)
+    np.fill_diagonal(Delta, 0.0)
+
+    if isinstance(Sigma_nom, FactorCovariance):
+        # Sigma_nom + Delta = G G.T + diag(d - delta s^2) + delta s s.T, which
+        # is PSD whenever every idiosyncratic variance covers delta.
+        if np.all(Sigma_nom.d >= delta * sign_w ** 2):
+            return float(bound), Delta
+        Sigma_nom = Sigma_nom.to_dense()
+
+    if _is_worst_case_psd(Sigma_nom, sign_w, delta):
+        return float(bound), Delta
+    return solve_worst_case_sdp(Sigma_nom, w, delta)
+
+def worst_case_curve(Sigma_nom, w, deltas, method="auto"):
+    """Calculates the worst-case portfolio risk across a sweep of delta values.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        w: The portfolio weights (numpy array).
+        deltas: A sequence of delta values.
+        method: "auto" uses the closed form wherever it is certified and the
+            compiled SDP elsewhere; "sdp" always solves the SDP.
+
+    Returns:
+        A dict with arrays "delta", "risk" (worst-case variance), "std"
+        (worst-case standard deviation) and "Delta" (one optimal Delta per
+        delta, shape (k, n, n)).
+    """
+    if method not in ("auto", "sdp"):
+        raise ValueError("method must be 'auto' or 'sdp'.")
+
+    deltas = np.asarray(deltas, dtype=float).reshape(-1)
+    n = Sigma_nom.shape[0]
+    risks = np.empty(len(deltas))
+    Deltas = np.empty((len(deltas), n, n))
+    for i, delta in enumerate(deltas):
+        if method == "auto":
+            risks[i], Deltas[i] = worst_case_risk(Sigma_nom, w, float(delta))
+        else:
+            risks[i], Deltas[i] = solve_worst_case_sdp(Sigma_nom, w, float(delta))
+
+    return {"delta": deltas, "risk": risks, "std": np.sqrt(np.maximum(risks, 0.0)), "Delta": Deltas}
+
+import numpy as np
+
+@traced()
+def risk_distribution_exact(Sigma_nom, w, delta, grid_size=2048, quantiles=(0.01, 0.05, 0.5, 0.95, 0.99), zero_diagonal=False, clt_threshold=20000):
+    """Computes the distribution of w.T @ (Sigma_nom + Delta) @ w for a symmetric uniform Delta without sampling.
+
+    w.T @ Delta @ w = sum_{i <= j} c_ij * Delta_ij is a weighted sum of
+    independent uniforms, whose characteristic function is a product of
+    sinc terms. The density is recovered by inverting that product with an
+    FFT; above clt_threshold terms the normal approximation is used instead.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array).
+        w: The portfolio weights (numpy array).
+        delta: The uncertainty parameter.
+        grid_size: Number of grid points for the density.
+        quantiles: Probabilities at which to report quantiles.
+        zero_diagonal: If True, the diagonal of Delta is held at zero.
+        clt_threshold: Number of free entries above which the normal
+            approximation is used.
+
+    Returns:
+        A dict with the risk grid ("risk"), its "density" and "cdf", and a
+        "quantiles" dict mapping each probability to a risk value. When no
+        entry can move the risk (e.g. delta=0) the distribution is a point
+        mass at the nominal risk: a one-point grid whose "density" is its
+        unit probability mass.
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(w, np.ndarray):
+        raise TypeError("Sigma_nom and w must be numpy arrays.")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+    if delta < 0:
+        raise ValueError("delta must be non-negative.")
+
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Sigma_nom must be a square matrix.")
+
+    w = w.reshape(-1)
+    n = Sigma_nom.shape[0]
+    if len(w) != n:
+        raise ValueError("Incompatible shapes between Sigma_nom and w.")
+
+    nominal_risk = float(w @ Sigma_nom @ w)
+    half_widths = delta * np.abs(_risk_weights(w, zero_diagonal=zero_diagonal))
+    half_widths = half_widths[half_widths > 0]
+
+    if half_widths.size == 0:
+        return {
+            "risk": np.array([nominal_risk]),
+            "density": np.array([1.0]),
+            "cdf": np.array([1.0]),
+            "quantiles": {q: nominal_risk for q in quantiles},
+        }
+
+    support = np.sum(half_widths)
+    std = np.sqrt(np.sum(half_widths ** 2) / 3)
+
+    if half_widths.size > clt_threshold:
+        x = np.linspace(-min(support, 8 * std), min(support, 8 * std), grid_size)
+        density = np.exp(-0.5 * (x / std) ** 2) / (std * np.sqrt(2 * np.pi))
+    else:
+        # The FFT window spans 1.5x the effective support on each side so the
+        # periodic images of the density do not overlap.
+        half = min(support, 8 * std)
+        length = 3 * half
+        dx = length / grid_size
+        x = -length / 2 + dx * np.arange(grid_size)
+        t = 2 * np.pi * np.fft.fftfreq(grid_size, dx)
+        phi = np.ones(grid_size)
+        step = max(1, _CHUNK_ELEMENTS // grid_size)
+        for start in range(0, half_widths.size, step):
+            phi *= np.prod(np.sinc(np.outer(half_widths[start:start + step], t) / np.pi), axis=0)
+        density = np.fft.fft(phi * np.exp(-1j * t * x[0])).real / length
+        inside = np.abs(x) <= half
+        x, density = x[inside], np.clip(density[inside], 0.0, None)
+
+    cdf = np.concatenate(([0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * np.diff(x))))
+    density = density / cdf[-1]
+    cdf = cdf / cdf[-1]
+    risk = nominal_risk + x
+
+    return {
+        "risk": risk,
+        "density": density,
+        "cdf": cdf,
+        "quantiles": {q: float(np.interp(q, cdf, risk)) for q in quantiles},
+    }
+
+import cvxpy as cp
+import numpy as np
+
+@traced()
+def generate_market_data(n=5, seed=2):
+    """Generates the synthetic expected returns and nominal covariance matrix used by the application pages.
+    Args:
+        n: The number of assets.
+        seed: The random seed.
+    Returns:
+        A tuple (mu, Sigma_nom) with mu of shape (n, 1).
+    """
+    if n <= 0:
+        raise ValueError("n must be greater than 0")
+    rng = np.random.RandomState(seed)
+    mu = np.abs(rng.randn(n, 1)) / 15
+    Sigma_rand = rng.uniform(-0.15, 0.8, size=(n, n))
+    Sigma_nom = Sigma_rand.T @ Sigma_rand
+    return mu, Sigma_nom
+
+@traced()
+def optimize_min_variance_portfolio(Sigma_nom, mu, target_return=0.1, l1_bound=2.0, solver=None):
+    """Minimizes portfolio risk subject to budget, minimum return and L1 norm constraints.
+    Args:
+        Sigma_nom: The nominal covariance matrix.
+        mu: A numpy array of expected returns for each asset.
+        target_return: The minimum expected portfolio return.
+        l1_bound: The bound on the L1 norm of the weights (gross leverage).
+        solver: The cvxpy solver name, or None to pick one for the covariance type.
+    Returns:
+        A numpy array representing the optimal portfolio weights.
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(mu, np.ndarray):
+        raise TypeError("Inputs must be numpy arrays.")
+
+    if Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    mu = mu.reshape(-1)
+    if len(mu) != Sigma_nom.shape[0]:
+        raise ValueError("mu and Sigma_nom must have compatible dimensions.")
+
+    w = cp.Variable(len(mu))
+    ret = mu @ w
+    risk = _risk_expression(w, Sigma_nom)
+    prob = cp.Problem(cp.Minimize(risk), [cp.sum(w) == 1, ret >= target_return, cp.norm(w, 1) <= l1_bound])
+    try:
+        prob.solve(solver=solver or _default_solver(Sigma_nom))
+    except cp.SolverError:
+        raise cp.SolverError("Solver failed. Check if the covariance matrix is positive semi-definite.")
+    tracer.record_problem(prob)
+
+    if w.value is None:
+        raise ValueError(f"Portfolio optimization is {prob.status}.")
+    return w.value
+
+import functools
+import threading
+import cvxpy as cp
+import numpy as np
+
+class RobustPortfolioProblem:
+    """The robust min-variance problem for one (Sigma_nom, mu), compiled once and re-solved for new scalars.
+
+    The inner maximization over S = {Sigma_nom + Delta : |Delta_ij| <= delta,
+    Delta_ii = 0, Sigma_nom + Delta PSD} is replaced by its SDP dual, so
+
+        min_w max_{Sigma in S} w.T @ Sigma @ w
+        = min_{w, Lambda} <Lambda, Sigma_nom> + delta * sum_{i != j} |Lambda_ij|
+          s.t. [[Lambda, w], [w.T, 1]] PSD
+
+    plus the budget, return and L1 constraints of
+    optimize_min_variance_portfolio. The optimal value is the worst-case
+    risk of the optimal w. As in WorstCaseProblem, the arrays are constants
+    and only the scalars delta, target_return and l1_bound are cvxpy
+    parameters, so re-solves skip canonicalization without an O(n^4)
+    parameter tensor.
+    """
+
+    def __init__(self, Sigma_nom, mu, solver=None):
+        mu = np.asarray(mu, dtype=float).reshape(-1)
+        n = len(mu)
+        self.n = n
+        self.solver = solver
+        self.delta = cp.Parameter(nonneg=True)
+        self.target_return = cp.Parameter()
+        self.l1_bound = cp.Parameter(nonneg=True)
+        self.w = cp.Variable(n)
+        self.Lambda = cp.Variable((n, n), symmetric=True)
+        off_diagonal = np.ones((n, n)) - np.eye(n)
+        self.problem = cp.Problem(
+            cp.Minimize(cp.sum(cp.multiply((Sigma_nom + Sigma_nom.T) / 2, self.Lambda))
+                        + self.delta * cp.sum(cp.multiply(off_diagonal, cp.abs(self.Lambda)))),
+            [cp.bmat([[self.Lambda, cp.reshape(self.w, (n, 1), order="F")],
+                      [cp.reshape(self.w, (1, n), order="F"), np.ones((1, 1))]]) >> 0,
+             cp.sum(self.w) == 1, mu @ self.w >= self.target_return, cp.norm(self.w, 1) <= self.l1_bound]
+        )
+        self._lock = threading.Lock()
+
+    def solve(self, delta, target_return=0.1, l1_bound=2.0):
+        """Solves the robust problem.
+        Args:
+            delta: The uncertainty parameter.
+            target_return: The minimum expected portfolio return.
+            l1_bound: The bound on the L1 norm of the weights.
+        Returns:
+            A tuple (robust weights, their worst-case portfolio risk).
+        """
+        with self._lock:
+            self.delta.value = float(delta)
+            self.target_return.value = float(target_return)
+            self.l1_bound.value = float(l1_bound)
+            try:
+                self.problem.solve(solver=self.solver)
+            except cp.SolverError:
+                raise cp.SolverError("Solver failed. Check if the covariance matrix is positive semi-definite.")
+            tracer.record_problem(self.problem)
+            if self.w.value is None:
+                raise ValueError(f"Portfolio optimization is {self.problem.status}.")
+            return self.w.value.copy(), float(self.problem.value)
+
+@_problem_cache(maxsize=16)
+def _robust_portfolio_problem(Sigma_nom, mu, solver=None):
+    return RobustPortfolioProblem(Sigma_nom, mu, solver)
+
+@traced()
+def optimize_robust_portfolio(Sigma_nom, mu, delta, target_return=0.1, l1_bound=2.0, solver=None):
+    """Minimizes the worst-case portfolio risk over the box uncertainty set in a single solve.
+
+    Instead of optimizing against Sigma_nom and then stressing the result,
+    the min-max problem is solved directly through the dual of the
+    worst-case SDP (see RobustPortfolioProblem), under the same budget,
+    minimum return and L1 constraints as optimize_min_variance_portfolio.
+
+    Args:
+        Sigma_nom: The nominal covariance matrix (numpy array or FactorCovariance).
+        mu: A numpy array of expected returns for each asset.
+        delta: The uncertainty parameter.
+        target_return: The minimum expected portfolio return.
+        l1_bound: The bound on the L1 norm of the weights (gross leverage).
+        solver: The cvxpy solver name, or None for the cvxpy default.
+
+    Returns:
+        A tuple (robust weights, worst-case portfolio risk of those weights).
+    """
+    if not isinstance(Sigma_nom, (np.ndarray, FactorCovariance)) or not isinstance(mu, np.ndarray):
+        raise TypeError("Inputs must be numpy arrays.")
+    if not isinstance(delta, (int, float)):
+        raise TypeError("delta must be a number")
+    if delta < 0:
+        raise ValueError("delta must be non-negative.")
+
+    if Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+        raise ValueError("Covariance matrix must be square.")
+
+    mu = mu.reshape(-1)
+    if len(mu) != Sigma_nom.shape[0]:
+        raise ValueError("mu and Sigma_nom must have compatible dimensions.")
+
+    if isinstance(Sigma_nom, FactorCovariance):
+        Sigma_nom = Sigma_nom.to_dense()
+    return _robust_portfolio_problem(np.asarray(Sigma_nom, dtype=float), mu.astype(float), solver).solve(delta, target_return, l1_bound)
+
+import collections
+import functools
+import hashlib
+import threading
+import numpy as np
+
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+def _content_hash(*args, **kwargs):
+    """Hashes positional and keyword arguments, using the raw bytes of numpy arrays."""
+    digest = hashlib.blake2b(digest_size=20)
+
+    def update(value):
+        if isinstance(value, FactorCovariance):
+            digest.update(b"FactorCovariance")
+            update((value.B, value.F, value.d))
+        elif isinstance(value, np.ndarray):
+            digest.update(b"ndarray")
+            digest.update(value.dtype.str.encode())
+            digest.update(repr(value.shape).encode())
+            digest.update(np.ascontiguousarray(value).view(np.uint8))
+        elif isinstance(value, (tuple, list)):
+            digest.update(f"{type(value).__name__}{len(value)}".encode())
+            for item in value:
+                update(item)
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b"|")
+
+    for value in args:
+        update(value)
+    for key in sorted(kwargs):
+        update(key)
+        update(kwargs[key])
+    return digest.hexdigest()
+
+def _freeze(value):
+    """Makes cached numpy results read-only so callers cannot corrupt the cache."""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    return value
+
+import inspect
+import json
+import os
+import shutil
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; eviction then runs unlocked
+    fcntl = None
+
+_MISSING = object()
+
+def _encode_result(value, arrays):
+    """A JSON description of a result whose arrays are appended to arrays; TypeError if unsupported."""
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("Object arrays cannot be stored.")
+        arrays.append(value)
+        return {"array": len(arrays) - 1}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {"value": value}
+    if isinstance(value, (tuple, list)):
+        return {type(value).__name__: [_encode_result(item, arrays) for item in value]}
+    if isinstance(value, dict):
+        return {"dict": [[_encode_result(key, arrays), _encode_result(item, arrays)] for key, item in value.items()]}
+    raise TypeError(f"{type(value).__name__} results cannot be stored.")
+
+def _decode_result(spec, load):
+    if "array" in spec:
+        return load(spec["array"])
+    if "value" in spec:
+        return spec["value"]
+    if "tuple" in spec:
+        return tuple(_decode_result(item, load) for item in spec["tuple"])
+    if "list" in spec:
+        return [_decode_result(item, load) for item in spec["list"]]
+    return {_decode_result(key, load): _decode_result(item, load) for key, item in spec["dict"]}
+
+def _load_array(path):
+    """Memory-maps a stored array read-only; empty arrays cannot be mapped and are read."""
+    array = np.load(path, mmap_mode="r")
+    return array.view(np.ndarray) if array.size else np.load(path)
+
+class ResultStore:
+    """A content-addressed on-disk store of computed results, shared by processes and containers.
+
+    Each entry is a directory named by its key holding one .npy file per
+    array and a meta.json describing the result's structure (arrays,
+    scalars, tuples, lists and dicts of those). Entries are written to a
+    temporary directory and renamed into place, so readers never see a
+    partial entry and concurrent writers of the same key simply race to an
+    identical result. Arrays are memory-mapped read-only on load.
+
+    Reads refresh an entry's modification time; once the store exceeds
+    max_bytes the least recently used entries are deleted under an
+    exclusive lock on the store.
+
+    Args:
+        root: The store directory, created if missing.
+        max_bytes: The size bound of the store.
+    """
+
+    def __init__(self, root, max_bytes=2 ** 30):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, default=None):
+        """The stored result for key, or default."""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                spec = json.load(f)
+            result = _decode_result(spec, lambda i: _load_array(os.path.join(path, f"{i}.npy")))
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            # Missing, or evicted by another process while being read.
+            self.stats["misses"] += 1
+            return default
+        self.stats["hits"] += 1
+        return result
+
+    def put(self, key, value):
+        """Stores value under key. Returns False if the value's type cannot be stored."""
+        arrays = []
+        try:
+            spec = _encode_result(value, arrays)
+        except TypeError:
+            return False
+        path = self._path(key)
+        if os.path.isdir(path):
+            return True
+        staging = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        os.makedirs(staging)
+        try:
+            for i, array in enumerate(arrays):
+                np.save(os.path.join(staging, f"{i}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(spec, f)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(staging, path)
+        except OSError:
+            # Another process stored the same key first.
+            shutil.rmtree(staging, ignore_errors=True)
+            return os.path.isdir(path)
+        self.stats["writes"] += 1
+        self.evict()
+        return True
+
+    def _entries(self):
+        """(mtime, size, path) of every entry."""
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name == "tmp":
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def size(self):
+        """The total size of the stored entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Deletes least recently used entries until the store fits in max_bytes."""
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                # Rename first so readers see the entry either whole or gone.
+                trash = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+                try:
+                    os.rename(path, trash)
+                except OSError:
+                    continue
+                shutil.rmtree(trash, ignore_errors=True)
+                total -= size
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Deletes every entry."""
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+result_store = None
+
+def configure_result_store(root=_MISSING, max_bytes=None):
+    """Sets the result store used by content_cache(persist=True) functions.
+
+    Without arguments the RESULT_STORE_DIR and RESULT_STORE_MAX_BYTES
+    environment variables are read; no directory disables the store.
+
+    Args:
+        root: The store directory, or None to disable persistence.
+        max_bytes: The size bound; defaults to RESULT_STORE_MAX_BYTES or 1 GiB.
+    Returns:
+        The ResultStore, or None.
+    """
+    global result_store
+    if root is _MISSING:
+        root = os.environ.get("RESULT_STORE_DIR") or None
+    if max_bytes is None:
+        max_bytes = int(os.environ.get("RESULT_STORE_MAX_BYTES", 2 ** 30))
+    result_store = ResultStore(root, max_bytes) if root else None
+    return result_store
+
+configure_result_store()
+
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+import numpy as np
+
+@contextlib.contextmanager
+def _script_main_hidden():
+    # Streamlit runs the app script as a __main__ module without a spec; spawned
+    # workers would re-run the whole script while starting up.
+    main = sys.modules.get("__main__")
+    if getattr(main, "__spec__", None) is not None or getattr(main, "__file__", None) is None:
+        yield
+        return
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+def _timed_call(func, args, kwargs):
+    # Runs in the worker; the solve time lets the pool split latency into queue wait and solve.
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+class SolverPool:
+    """A shared process pool for solver calls with a bounded queue and in-flight deduplication.
+
+    Every Streamlit session submits its solves here instead of running them
+    on its own script thread, so concurrent users share max_workers solver
+    processes. Identical requests (same function and argument contents)
+    that are queued or running share one future. At most max_queue distinct
+    requests are outstanding; further submissions wait for a free place and
+    fail with TimeoutError once their timeout expires, so an overloaded app
+    answers slowly or refuses requests instead of piling up work.
+
+    A request whose waiters all time out is cancelled if it has not yet been
+    handed to a worker; otherwise it finishes and its result is discarded.
+
+    Args:
+        max_workers: The number of solver processes; defaults to the number of CPUs.
+        max_queue: The number of distinct outstanding requests; defaults to
+            4 * max_workers.
+        timeout: The default per-request timeout in seconds, or None to wait
+            indefinitely.
+        history: The number of recent requests kept for latency percentiles.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, timeout=30.0, history=1024):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue or 4 * self.max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._in_flight = {}
+        self._waiters = collections.Counter()
+        self._condition = threading.Condition()
+        self._latencies = collections.deque(maxlen=history)
+        self._counts = collections.Counter()
+        self._peak_depth = 0
+
+    def _submit_locked(self, key, func, args, kwargs):
+        if self._executor is None:
+            # spawn rather than fork: cvxpy and BLAS thread pools do not survive a fork.
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        with _script_main_hidden():  # workers are started on demand by submit
+            future = self._executor.submit(_timed_call, func, args, kwargs)
+        submitted = time.perf_counter()
+        self._in_flight[key] = future
+        self._peak_depth = max(self._peak_depth, len(self._in_flight))
+        future.add_done_callback(lambda future: self._finish(key, future, submitted))
+        return future
+
+    def _finish(self, key, future, submitted):
+        latency = time.perf_counter() - submitted
+        with self._condition:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if future.cancelled():
+                self._counts["cancelled"] += 1
+            elif future.exception() is not None:
+                self._counts["failed"] += 1
+                if isinstance(future.exception(), concurrent.futures.process.BrokenProcessPool):
+                    self._executor = None
+            else:
+                self._counts["completed"] += 1
+                self._latencies.append((latency, future.result()[1]))
+            self._condition.notify_all()
+
+    def submit(self, func, *args, timeout=None, **kwargs):
+        """Queues func(*args, **kwargs), or joins an identical queued or running request.
+
+        Args:
+            func: A picklable (module-level) function.
+            *args: Positional arguments for func.
+            timeout: Seconds to wait for a free queue place; defaults to the pool's timeout.
+            **kwargs: Keyword arguments for func.
+        Returns:
+            A concurrent.futures.Future of (result, solve time in seconds).
+        """
+        key = _content_hash(func.__module__, func.__qualname__, *args, **kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._counts["submitted"] += 1
+            while True:
+                future = self._in_flight.get(key)
+                if future is not None:
+                    self._counts["deduplicated"] += 1
+                    return future
+                if len(self._in_flight) < self.max_queue:
+                    return self._submit_locked(key, func, args, kwargs)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._counts["rejected"] += 1
+                    raise TimeoutError(f"Solver queue is full ({self.max_queue} requests).")
+                self._condition.wait(remaining)
+
+    def solve(self, func, *args, timeout=None, **kwargs):
+        """Runs func(*args, **kwargs) on the pool and returns its result.
+
+        Args:
+            func: A picklable (module-level) function.
+            *args: Positional arguments for func.
+            timeout: Seconds to wait in total, queueing included; defaults to the pool's timeout.
+            **kwargs: Keyword arguments for func.
+        Returns:
+            The result of func.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        future = self.submit(func, *args, timeout=timeout, **kwargs)
+        with self._condition:
+            self._waiters[future] += 1
+        try:
+            remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0.0)
+            return future.result(remaining)[0]
+        except concurrent.futures.TimeoutError:
+            with self._condition:
+                self._counts["timeouts"] += 1
+                abandoned = self._waiters[future] == 1
+            if abandoned:
+                future.cancel()
+            raise TimeoutError(f"Solver request timed out after {timeout:g}s.") from None
+        finally:
+            with self._condition:
+                self._waiters[future] -= 1
+                if self._waiters[future] <= 0:
+                    del self._waiters[future]
+
+    def metrics(self):
+        """Queue depth, request counts and latency percentiles in seconds.
+
+        Returns:
+            A dict with workers, max_queue, queue_depth (outstanding requests),
+            peak_queue_depth, the counts submitted, deduplicated, completed,
+            failed, cancelled, rejected and timeouts, and p50/p95/p99 of the
+            end-to-end latency, the solve time and the queue wait of recent
+            requests.
+        """
+        with self._condition:
+            metrics = {"workers": self.max_workers, "max_queue": self.max_queue, "queue_depth": len(self._in_flight),
+                       "peak_queue_depth": self._peak_depth}
+            metrics.update({name: self._counts[name] for name in ("submitted", "deduplicated", "completed", "failed", "cancelled", "rejected", "timeouts")})
+            latencies = np.array(self._latencies).reshape(-1, 2)
+        columns = {"latency": latencies[:, 0], "solve": latencies[:, 1], "queue_wait": latencies[:, 0] - latencies[:, 1]}
+        for name, values in columns.items():
+            for q in (50, 95, 99):
+                metrics[f"{name}_p{q}"] = float(np.percentile(values, q)) if len(values) else None
+        return metrics
+
+    def shutdown(self, wait=True):
+        """Cancels queued requests and stops the solver processes."""
+        with self._condition:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+solver_pool = None
+
+def configure_solver_pool(max_workers=_MISSING, max_queue=None, timeout=None):
+    """Sets the SolverPool used by pooled functions, shutting down the previous one.
+
+    Without arguments the SOLVER_POOL_WORKERS, SOLVER_POOL_QUEUE and
+    SOLVER_POOL_TIMEOUT environment variables are read; SOLVER_POOL_WORKERS=0
+    disables the pool.
+
+    Args:
+        max_workers: The number of solver processes (None for the number of
+            CPUs), or 0 to run solves inline.
+        max_queue: The number of distinct outstanding requests; defaults to
+            SOLVER_POOL_QUEUE or 4 * max_workers.
+        timeout: The per-request timeout in seconds; defaults to
+            SOLVER_POOL_TIMEOUT or 30.
+    Returns:
+        The SolverPool, or None.
+    """
+    global solver_pool
+    if max_workers is _MISSING:
+        workers = os.environ.get("SOLVER_POOL_WORKERS")
+        max_workers = int(workers) if workers else None
+    if max_queue is None and os.environ.get("SOLVER_POOL_QUEUE"):
+        max_queue = int(os.environ["SOLVER_POOL_QUEUE"])
+    if timeout is None:
+        timeout = float(os.environ.get("SOLVER_POOL_TIMEOUT", 30.0))
+    previous, solver_pool = solver_pool, (SolverPool(max_workers, max_queue, timeout) if max_workers != 0 else None)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return solver_pool
+
+def pooled(func):
+    """Wraps func to run on the configured solver pool, or inline when there is none."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        pool = solver_pool
+        if pool is None:
+            return func(*args, **kwargs)
+        return pool.solve(func, *args, **kwargs)
+    return wrapper
+
+# Bump when persisted results change without an edit to this file, e.g. after a solver upgrade.
+RESULT_STORE_VERSION = 1
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+def _source_hash(func):
+    """A hash of the source file defining func, or of its bytecode when the file cannot be read."""
+    try:
+        return _file_hash(inspect.getsourcefile(func))
+    except (OSError, TypeError):
+        return hashlib.blake2b(func.__code__.co_code, digest_size=8).hexdigest()
+
+def content_cache(maxsize=128, persist=False):
+    """Memoizes a function on a content hash of its (numpy) arguments with LRU eviction.
+
+    The cache is shared by every caller in the process (all Streamlit sessions)
+    and is safe to use from multiple threads. The wrapped function exposes
+    cache_info() and cache_clear() like functools.lru_cache.
+
+    Args:
+        maxsize: The maximum number of cached results.
+        persist: Also look results up in, and write them to, the configured
+            ResultStore (see configure_result_store), so they survive restarts
+            and are shared between processes. The disk key adds the function's
+            name, RESULT_STORE_VERSION and a hash of the source file defining
+            the function, so editing that file (the function or any helper in
+            it) starts a fresh set of entries. Changes elsewhere, e.g. in a
+            solver library, need a RESULT_STORE_VERSION bump.
+    Returns:
+        A decorator.
+    """
+    def decorator(func):
+        entries = collections.OrderedDict()
+        lock = threading.Lock()
+        stats = {"hits": 0, "misses": 0}
+        code = _source_hash(inspect.unwrap(func)) if persist else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _content_hash(*args, **kwargs)
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return entries[key]
+                stats["misses"] += 1
+
+            store = result_store if persist else None
+            stored_key = _content_hash(RESULT_STORE_VERSION, func.__module__, func.__qualname__, code, key) if store is not None else None
+            result = store.get(stored_key, _MISSING) if store is not None else _MISSING
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                if store is not None:
+                    store.put(stored_key, result)
+            result = _freeze(result)
+
+            with lock:
+                entries[key] = result
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(stats["hits"], stats["misses"], maxsize, len(entries))
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+                stats["hits"] = stats["misses"] = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+cached_market_data = content_cache(maxsize=32, persist=True)(generate_market_data)
+# Solves run on the solver pool when one is configured (see configure_solver_pool).
+cached_portfolio = content_cache(maxsize=128, persist=True)(pooled(optimize_portfolio))
+cached_min_variance_portfolio = content_cache(maxsize=128, persist=True)(pooled(optimize_min_variance_portfolio))
+cached_robust_portfolio = content_cache(maxsize=128, persist=True)(pooled(optimize_robust_portfolio))
+cached_worst_case_risk = content_cache(maxsize=128, persist=True)(pooled(worst_case_risk))
+cached_efficient_frontier = content_cache(maxsize=32, persist=True)(efficient_frontier)
+cached_worst_case_curve = content_cache(maxsize=32, persist=True)(worst_case_curve)
+cached_sensitivity_sweep = content_cache(maxsize=16)(sensitivity_sweep)
+_cached_portfolio_risks = content_cache(maxsize=32, persist=True)(sample_portfolio_risks)
+
+def cached_sample_portfolio_risks(Sigma_nom, w, delta, num_samples, rng, **options):
+    """sample_portfolio_risks memoized in memory and in the result store.
+
+    rng must be an integer seed: fresh entropy or a Generator's state cannot
+    be reproduced from a cache key.
+    """
+    if isinstance(rng, bool) or not isinstance(rng, (int, np.integer)):
+        raise TypeError("rng must be an integer seed for cached sampling.")
+    return _cached_portfolio_risks(Sigma_nom, w, delta, num_samples, rng=int(rng), **options)
+
+cached_sample_portfolio_risks.cache_info = _cached_portfolio_risks.cache_info
+cached_sample_portfolio_risks.cache_clear = _cached_portfolio_risks.cache_clear
+
+import collections
+import concurrent.futures
+import copy
+import os
+import threading
+
+class BackgroundJob:
+    """A computation running on a BackgroundRunner thread, with cooperative cancellation and partial results.
+
+    Long computations that accept a progress callback (e.g.
+    sample_risk_statistics) report snapshots through report(), which also
+    tells them to stop once the job is cancelled. Others, such as a cvxpy
+    solve, run to completion and their result is simply discarded.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.updates = 0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._partial = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Marks the job stale: it is dropped from the queue, or asked to stop at its next report."""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, partial):
+        """Stores a snapshot of a partial result. Returns True if the job has been cancelled."""
+        snapshot = copy.deepcopy(partial)
+        with self._lock:
+            self._partial = snapshot
+            self.updates += 1
+        return self.cancelled
+
+    def partial(self):
+        """The latest reported partial result, or None."""
+        with self._lock:
+            return self._partial
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """Waits up to timeout seconds for the job. Returns whether it is done."""
+        concurrent.futures.wait([self.future], timeout)
+        return self.done()
+
+    def result(self, timeout=None):
+        """The job's result, re-raising its exception."""
+        return self.future.result(timeout)
+
+    def _run(self, func, args, kwargs, progressive):
+        if progressive:
+            kwargs = dict(kwargs, progress=self.report)
+        return func(*args, **kwargs)
+
+class BackgroundRunner:
+    """Runs computations on a shared thread pool, keyed by their inputs.
+
+    Each consumer (e.g. one chart in one browser session) owns a slot. A
+    submission whose inputs differ from the slot's previous job cancels that
+    job unless another slot still uses it, so dragging a slider leaves only
+    the newest job running. Submissions with the same inputs share one job,
+    and finished jobs are kept in an LRU of max_results, so revisiting an
+    input is immediate.
+
+    Args:
+        max_workers: The number of worker threads; defaults to the number
+            of CPUs, clamped to [2, 4].
+        max_results: The number of jobs kept for reuse.
+    """
+
+    def __init__(self, max_workers=None, max_results=64):
+        # At least two threads, so one slow solve does not hold back a progressive chart.
+        self.max_workers = max_workers or max(2, min(4, os.cpu_count() or 1))
+        self.max_results = max_results
+        self._executor = None
+        self._jobs = collections.OrderedDict()
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def submit(self, slot, func, *args, progressive=False, **kwargs):
+        """Returns the job computing func(*args, **kwargs) for slot, starting it if needed.
+        Args:
+            slot: A hashable identifying the consumer, e.g. (session id, chart name).
+            func: The function to run.
+            *args: Positional arguments for func.
+            progressive: Pass the job's report method to func as progress=.
+            **kwargs: Keyword arguments for func.
+        Returns:
+            A BackgroundJob.
+        """
+        key = _content_hash(func.__module__, func.__qualname__, progressive, *args, **kwargs)
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="background")
+            previous = self._slots.get(slot)
+            self._slots[slot] = key
+            if previous is not None and previous != key and previous not in self._slots.values():
+                stale = self._jobs.get(previous)
+                if stale is not None and not stale.done():
+                    stale.cancel()
+                    del self._jobs[previous]
+
+            job = self._jobs.get(key)
+            if job is None or job.cancelled:
+                job = BackgroundJob(key)
+                job.future = self._executor.submit(job._run, func, args, kwargs, progressive)
+                self._jobs[key] = job
+            self._jobs.move_to_end(key)
+
+            in_use = set(self._slots.values())
+            for old_key in list(self._jobs):
+                if len(self._jobs) <= self.max_results:
+                    break
+                if old_key not in in_use and self._jobs[old_key].done():
+                    del self._jobs[old_key]
+        return job
+
+    def job(self, slot):
+        """The current job of slot, or None."""
+        with self._lock:
+            return self._jobs.get(self._slots.get(slot))
+
+    def shutdown(self, wait=True):
+        """Cancels every job and stops the worker threads."""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+            self._jobs.clear()
+            self._slots.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+background = BackgroundRunner()
+
+import collections
+import threading
+import numpy as np
+
+class Pipeline:
+    """A lazy graph of named stages over named parameters, with memoized stage outputs.
+
+    Each stage declares the parameters and stages it reads. get() computes a
+    stage (and, first, whatever it depends on) only if it has no memoized
+    output. set() changes parameters and drops the outputs of the stages
+    downstream of the changed ones, so moving the delta slider recomputes the
+    delta-dependent stages while the market data and the nominal optimization
+    are reused.
+
+    Args:
+        **params: The parameters and their initial values.
+    """
+
+    def __init__(self, **params):
+        self._params = dict(params)
+        self._stages = {}
+        self._dependents = collections.defaultdict(set)
+        self._values = {}
+        self._lock = threading.RLock()
+        self.stats = {"computed": 0, "reused": 0}
+
+    def add_stage(self, name, func, inputs=(), **options):
+        """Declares stage name as func(*inputs, **options).
+
+        Args:
+            name: The stage name.
+            func: The function computing the stage.
+            inputs: Names of the parameters and earlier stages passed to func, in order.
+            **options: Fixed keyword arguments for func.
+        """
+        if name in self._params or name in self._stages:
+            raise ValueError(f"'{name}' is already defined.")
+        unknown = [node for node in inputs if node not in self._params and node not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on undefined inputs: {', '.join(unknown)}.")
+        self._stages[name] = (func, tuple(inputs), options)
+        for node in inputs:
+            self._dependents[node].add(name)
+
+    def downstream(self, name):
+        """The names of all stages depending, directly or not, on the parameter or stage name."""
+        found, pending = set(), [name]
+        while pending:
+            for dependent in self._dependents[pending.pop()]:
+                if dependent not in found:
+                    found.add(dependent)
+                    pending.append(dependent)
+        return found
+
+    def set(self, **params):
+        """Changes parameters, dropping the memoized outputs downstream of those whose value changed.
+
+        Returns:
+            The names of the invalidated stages.
+        """
+        invalidated = set()
+        with self._lock:
+            for name, value in params.items():
+                if name not in self._params:
+                    raise ValueError(f"Unknown parameter: {name}")
+                if _content_hash(value) == _content_hash(self._params[name]):
+                    continue
+                self._params[name] = value
+                invalidated |= self.downstream(name)
+            for name in invalidated:
+                self._values.pop(name, None)
+        return invalidated
+
+    def arguments(self, name):
+        """The resolved (func, args, options) of stage name, e.g. to run it as a background job."""
+        func, inputs, options = self._stages[name]
+        return func, tuple(self.get(node) for node in inputs), dict(options)
+
+    def get(self, name):
+        """The value of the parameter or stage name, computing the stage if needed."""
+        with self._lock:
+            if name in self._params:
+                return self._params[name]
+            if name not in self._stages:
+                raise ValueError(f"Unknown stage or parameter: {name}")
+            if name in self._values:
+                self.stats["reused"] += 1
+                return self._values[name]
+            func, args, options = self.arguments(name)
+            with tracer.span(f"pipeline.{name}"):
+                value = func(*args, **options)
+            self._values[name] = value
+            self.stats["computed"] += 1
+            return value
+
+    def is_current(self, name):
+        """Whether stage name has a memoized output."""
+        with self._lock:
+            return name in self._values
+
+def _max_target_return(mu, l1_bound):
+    # The highest return reachable within the L1 bound: (1 + l1_bound) / 2 long the best asset,
+    # (l1_bound - 1) / 2 short the worst.
+    return float(np.floor(((1 + l1_bound) * mu.max() - (l1_bound - 1) * mu.min()) / 2 * 100) / 100)
+
+def _frontier_stage(Sigma_nom, mu, max_return, l1_bound):
+    return cached_efficient_frontier(Sigma_nom, mu, target_returns=np.linspace(0.0, max_return, 41), l1_bound=l1_bound)
+
+def _risk_quantiles_stage(Sigma_nom, w, delta, sampling_method):
+    risks = cached_sample_portfolio_risks(Sigma_nom, w, delta, 8192, rng=2, method=sampling_method)
+    return _summarize_risk_quantiles(risks, w, sampling_method, (0.05, 0.95))
+
+def _risk_statistics_stage(Sigma_nom, w, delta, psd, progress=None, quantile_tol=0.002, max_samples=200000):
+    """sample_risk_statistics over seeded risk arrays from the result store, so a warm store serves it without sampling.
+
+    Sample counts double from 8192 until the stopping rule of
+    sample_risk_statistics holds. The block streams make each array a prefix
+    of the next, so stopping is checked per array instead of per block, and
+    a cold store draws about twice the samples of sample_risk_statistics.
+    """
+    num_samples = 8192
+    while True:
+        num_samples = min(num_samples, max_samples)
+        risks = cached_sample_portfolio_risks(Sigma_nom, w, delta, num_samples, rng=2, psd=psd)
+        accumulator = RiskAccumulator().update(risks)
+        accumulator.rejected = num_samples - len(risks)
+        if _statistics_converged(accumulator, None, quantile_tol, (0.05, 0.5, 0.95), 0.95, 1000, max_samples):
+            return accumulator
+        if progress is not None and progress(accumulator):
+            return accumulator
+        num_samples *= 2
+
+def analysis_pipeline(n=5, seed=2, target_return=0.1, l1_bound=2.0, delta=0.2, sampling_method="sobol", psd=None):
+    """The worst-case risk analysis as a Pipeline: market data -> nominal portfolio -> worst-case and robust analyses.
+
+    Stages call the content-cached functions, so a stage recomputed in one
+    session is still shared with every other session and with the result
+    store.
+
+    Args:
+        n: The number of assets.
+        seed: The market data seed.
+        target_return: The minimum expected return of the portfolios.
+        l1_bound: The bound on the L1 norm of the portfolio weights.
+        delta: The uncertainty parameter.
+        sampling_method: The variance-reduced sampling strategy of risk_quantiles.
+        psd: The screening of non-PSD scenarios in risk_statistics.
+    Returns:
+        A Pipeline with stages market_data, mu, Sigma_nom, max_return,
+        weights, nominal_risk, frontier, worst_case, worst_case_curve,
+        robust_portfolio, exact_distribution, risk_quantiles,
+        risk_statistics (which accepts a progress callback),
+        sensitivity_sweep, covariance_figure and sweep_figure.
+    """
+    pipeline = Pipeline(n=n, seed=seed, target_return=target_return, l1_bound=l1_bound, delta=delta,
+                        sampling_method=sampling_method, psd=psd)
+    pipeline.add_stage("market_data", cached_market_data, ("n", "seed"))
+    pipeline.add_stage("mu", lambda market_data: market_data[0], ("market_data",))
+    pipeline.add_stage("Sigma_nom", lambda market_data: market_data[1], ("market_data",))
+    pipeline.add_stage("max_return", _max_target_return, ("mu", "l1_bound"))
+    pipeline.add_stage("weights", cached_min_variance_portfolio, ("Sigma_nom", "mu", "target_return", "l1_bound"))
+    pipeline.add_stage("nominal_risk", calculate_portfolio_risk, ("weights", "Sigma_nom"))
+    pipeline.add_stage("frontier", _frontier_stage, ("Sigma_nom", "mu", "max_return", "l1_bound"))
+    pipeline.add_stage("worst_case", cached_worst_case_risk, ("Sigma_nom", "weights", "delta"))
+    pipeline.add_stage("worst_case_curve", cached_worst_case_curve, ("Sigma_nom", "weights"), deltas=np.linspace(0.0, 0.5, 51))
+    pipeline.add_stage("robust_portfolio", cached_robust_portfolio, ("Sigma_nom", "mu", "delta", "target_return", "l1_bound"))
+    pipeline.add_stage("exact_distribution", risk_distribution_exact, ("Sigma_nom", "weights", "delta"))
+    pipeline.add_stage("risk_quantiles", _risk_quantiles_stage, ("Sigma_nom", "weights", "delta", "sampling_method"))
+    pipeline.add_stage("risk_statistics", _risk_statistics_stage, ("Sigma_nom", "weights", "delta", "psd"))
+    pipeline.add_stage("sensitivity_sweep", cached_sensitivity_sweep, ("Sigma_nom", "weights"),
+                       delta_values=np.linspace(0.0, 0.5, 11), num_samples=2000, max_workers=1)
+    pipeline.add_stage("covariance_figure", visualize_covariance_matrix, ("Sigma_nom",), title="Nominal Covariance Matrix")
+    pipeline.add_stage("sweep_figure", visualize_sensitivity, ("sensitivity_sweep",))
+    return pipeline
+
+import numpy as np
+
+def _cholesky_update(R, updates=(), downdates=()):
+    """Updates the upper Cholesky factor R in place to that of R.T @ R + sum x x.T - sum y y.T, in O(n^2) per vector.
+
+    All vectors are applied in one sweep over the rows, starting at the first
+    non-zero entry, since rows above it do not change. Raises ValueError if
+    the result is not positive definite, leaving R partially updated.
+    """
+    vectors = [(np.array(x, dtype=float), 1.0) for x in updates] + [(np.array(y, dtype=float), -1.0) for y in downdates]
+    n = R.shape[0]
+    first = min((np.flatnonzero(x)[0] for x, _ in vectors if np.any(x)), default=n)
+    for k in range(first, n):
+        row = R[k, k + 1:]
+        for x, sign in vectors:
+            xk = float(x[k])
+            if xk == 0.0:
+                continue
+            diagonal = float(R[k, k])
+            square = diagonal * diagonal + sign * xk * xk
+            if square <= 0.0:
+                raise ValueError("The edited covariance matrix is not positive definite.")
+            r = square ** 0.5
+            c, s = r / diagonal, xk / diagonal
+            R[k, k] = r
+            tail = x[k + 1:]
+            row += (sign * s) * tail
+            row *= 1.0 / c
+            tail *= c
+            tail -= s * row
+
+class WhatIfSession:
+    """Interactive what-if edits of a covariance matrix, re-solved incrementally.
+
+    Keeps the upper Cholesky factor R of Sigma (Sigma = R.T @ R) current
+    through edits instead of refactorizing: a volatility edit scales one
+    column of R (O(n)) and a correlation edit is a rank-one update plus a
+    rank-one downdate (O(n^2)). After each edit the long-only portfolio
+    maximizing mu @ w - gamma * w @ Sigma @ w is re-solved with the native
+    solver, warm-started from the previous weights, and the nominal and
+    worst-case risks are recomputed. Its KKT systems on the support S go
+    through R with triangular solves, in O(n^2 (n - |S|) + (n - |S|)^3),
+    when most assets are held; for a small support factoring Sigma[S, S]
+    directly, in O(|S|^3), is cheaper and is used instead. The worst-case closed form is certified
+    PSD from R through a Schur complement on the portfolio's support, in
+    O(n^2 k) for k held assets. When that fails the SDP is solved for up to
+    max_sdp_n assets; for larger books the closed form is reported as an
+    upper bound (result()["worst_case_exact"] is False).
+
+    Args:
+        Sigma_nom: The nominal covariance matrix; must be positive definite.
+        mu: A numpy array of expected returns for each asset.
+        gamma: The risk aversion.
+        delta: The uncertainty parameter of the worst-case risk.
+        max_sdp_n: The largest number of assets for which the SDP is solved.
+    """
+
+    def __init__(self, Sigma_nom, mu, gamma=0.1, delta=0.0, max_sdp_n=200):
+        from scipy.linalg import LinAlgError, cholesky
+
+        if not isinstance(Sigma_nom, np.ndarray) or not isinstance(mu, np.ndarray):
+            raise TypeError("Inputs must be numpy arrays.")
+        if Sigma_nom.ndim != 2 or Sigma_nom.shape[0] != Sigma_nom.shape[1]:
+            raise ValueError("Covariance matrix must be square.")
+        if len(mu) != Sigma_nom.shape[0]:
+            raise ValueError("mu and Sigma_nom must have compatible dimensions.")
+        if gamma <= 0 or delta < 0:
+            raise ValueError("gamma must be positive and delta non-negative.")
+
+        self.Sigma = np.array((Sigma_nom + Sigma_nom.T) / 2.0, dtype=float)
+        self.mu = np.asarray(mu, dtype=float).reshape(-1)
+        self.gamma = gamma
+        self.delta = delta
+        self.max_sdp_n = max_sdp_n
+        try:
+            # Row-major, so the row sweeps of the updates are contiguous and R.T is LAPACK's column-major lower factor.
+            self._R = np.ascontiguousarray(cholesky(self.Sigma, lower=False))
+        except LinAlgError:
+            raise ValueError("Sigma_nom must be positive definite.")
+        self.weights = None
+        self.solve()
+
+    @property
+    def n(self):
+        return len(self.mu)
+
+    @property
+    def factor(self):
+        """The upper Cholesky factor R of Sigma (read-only view)."""
+        view = self._R.view()
+        view.setflags(write=False)
+        return view
+
+    def volatility(self, i):
+        return float(np.sqrt(self.Sigma[i, i]))
+
+    def correlation(self, i, j):
+        return float(self.Sigma[i, j] / np.sqrt(self.Sigma[i, i] * self.Sigma[j, j]))
+
+    def set_volatility(self, i, volatility):
+        """Sets the volatility of asset i, keeping its correlations. Returns the new result()."""
+        if volatility <= 0:
+            raise ValueError("volatility must be positive.")
+        scale = volatility / self.volatility(i)
+        # Sigma -> D Sigma D with D = I + (scale - 1) e_i e_i.T, so R -> R D.
+        self.Sigma[i, :] *= scale
+        self.Sigma[:, i] *= scale
+        self._R[:, i] *= scale
+        return self.solve()
+
+    def set_correlation(self, i, j, correlation):
+        """Sets the correlation of assets i and j, keeping the volatilities. Returns the new result().
+
+        Raises ValueError, leaving the session unchanged, if the edited matrix
+        would not be positive definite.
+        """
+        if i == j:
+            raise ValueError("i and j must be different assets.")
+        if not -1.0 < correlation < 1.0:
+            raise ValueError("correlation must be in (-1, 1).")
+        change = (correlation - self.correlation(i, j)) * self.volatility(i) * self.volatility(j)
+        if change == 0.0:
+            return self.result()
+        # change * (e_i e_j.T + e_j e_i.T) = |change| / 2 * (u u.T - v v.T) with u, v = e_i +- e_j (swapped when negative).
+        u, v = np.zeros(self.n), np.zeros(self.n)
+        u[[i, j]] = v[[i, j]] = np.sqrt(abs(change) / 2.0)
+        (u if change < 0 else v)[j] *= -1.0
+        # Rows and columns before the first edited asset do not change. Within a row the update
+        # comes before the downdate, so the intermediate matrix stays positive definite.
+        start = min(i, j)
+        R = self._R[start:, start:].copy()
+        _cholesky_update(R, updates=[u[start:]], downdates=[v[start:]])
+        self._R[start:, start:] = R
+        self.Sigma[i, j] += change
+        self.Sigma[j, i] += change
+        return self.solve()
+
+    def set_delta(self, delta):
+        """Changes the uncertainty parameter; the weights do not depend on it. Returns the new result()."""
+        if delta < 0:
+            raise ValueError("delta must be non-negative.")
+        self.delta = delta
+        self._update_risks()
+        return self.result()
+
+    def solve(self):
+        """Re-solves the portfolio, warm-started from the current weights, and updates the risks. Returns result()."""
+        self.weights = _simplex_qp(self.Sigma, self.mu, self.gamma, w0=self.weights, factor=self._R)
+        self._update_risks()
+        return self.result()
+
+    def _worst_case_certified(self, w):
+        # Delta = delta * (s s.T - diag(s^2)) lives on the support S of w, so Sigma + Delta is PSD iff the
+        # Schur complement of Sigma onto S, ((Sigma^-1)_SS)^-1 = (X.T X)^-1 with R.T X = I[:, S], plus Delta_SS is.
+        from scipy.linalg import solve_triangular
+
+        support = np.flatnonzero(w)
+        if self.delta == 0.0 or len(support) < 2:
+            return True
+        selector = np.zeros((self.n, len(support)))
+        selector[support, np.arange(len(support))] = 1.0
+        # R.T is the Fortran-ordered lower factor, which LAPACK takes without a copy.
+        X = solve_triangular(self._R.T, selector, lower=True, check_finite=False)
+        s = np.sign(w[support])
+        schur = np.linalg.inv(X.T @ X) + self.delta * (np.outer(s, s) - np.eye(len(support)))
+        return np.linalg.eigvalsh((schur + schur.T) / 2.0)[0] >= -1e-10 * np.abs(schur).max()
+
+    def _update_risks(self):
+        w = self.weights
+        support = np.flatnonzero(w)
+        self.nominal_risk = float(w[support] @ self.Sigma[np.ix_(support, support)] @ w[support])
+        abs_w = np.abs(w)
+        self.worst_case_risk = self.nominal_risk + self.delta * float(np.sum(abs_w) ** 2 - np.sum(abs_w ** 2))
+        certified = self._worst_case_certified(w)
+        self.worst_case_exact = certified or self.n <= self.max_sdp_n
+        if not certified and self.worst_case_exact:
+            self.worst_case_risk = solve_worst_case_sdp(self.Sigma, w, self.delta)[0]
+
+    def result(self):
+        """The current weights, expected return, nominal and worst-case risk and standard deviation, and whether
+        the worst case is exact rather than the closed-form upper bound."""
+        return {
+            "weights": self.weights.copy(),
+            "expected_return": float(self.mu @ self.weights),
+            "nominal_risk": self.nominal_risk,
+            "nominal_std": float(np.sqrt(max(self.nominal_risk, 0.0))),
+            "worst_case_risk": self.worst_case_risk,
+            "worst_case_std": float(np.sqrt(max(self.worst_case_risk, 0.0))),
+            "worst_case_exact": self.worst_case_exact,
+        }
 
 import numpy as np
-import plotly.graph_objects as go
 
 def visualize_optimal_weights(w):
     """Generates a bar chart of the optimal portfolio weights using plotly.express.
@@ -223,6 +3346,7 @@ def visualize_optimal_weights(w):
     if np.any(np.isinf(w)):
         raise ValueError("Weights cannot contain infinite values.")
 
+    import plotly.graph_objects as go
     fig = go.Figure(data=[go.Bar(x=[f'Asset {i+1}' for i in range(len(w))], y=w)])
     fig.update_layout(title='Optimal Portfolio Weights',
                       xaxis_title='Assets',
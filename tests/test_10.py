@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+from definition_d32a4b68569c4fb2acb63cf5b4e2c388 import WorstCaseProblem, solve_worst_case_sdp, worst_case_curve, generate_market_data, optimize_min_variance_portfolio
+
+@pytest.fixture
+def page_inputs():
+    mu, Sigma_nom = generate_market_data(5, 2)
+    w = optimize_min_variance_portfolio(Sigma_nom, mu)
+    return Sigma_nom, w
+
+def test_worst_case_curve_shapes(page_inputs):
+    Sigma_nom, w = page_inputs
+    curve = worst_case_curve(Sigma_nom, w, [0.0, 0.1, 0.2])
+    assert curve["risk"].shape == (3,)
+    assert curve["Delta"].shape == (3, 5, 5)
+    assert np.allclose(curve["std"] ** 2, curve["risk"])
+
+def test_worst_case_curve_monotone_in_delta(page_inputs):
+    Sigma_nom, w = page_inputs
+    curve = worst_case_curve(Sigma_nom, w, np.linspace(0.0, 0.5, 6), method="sdp")
+    assert np.all(np.diff(curve["risk"]) >= -1e-6)
+    assert curve["risk"][0] == pytest.approx(w @ Sigma_nom @ w, abs=1e-5)
+
+def test_worst_case_curve_methods_agree(page_inputs):
+    Sigma_nom, w = page_inputs
+    deltas = [0.05, 0.3]
+    auto = worst_case_curve(Sigma_nom, w, deltas)
+    sdp = worst_case_curve(Sigma_nom, w, deltas, method="sdp")
+    assert np.allclose(auto["risk"], sdp["risk"], rtol=1e-4)
+
+def test_worst_case_problem_reused_across_inputs(page_inputs):
+    Sigma_nom, w = page_inputs
+    problem = WorstCaseProblem(Sigma_nom, w)
+    first, _ = problem.solve(0.1)
+    second, _ = problem.solve(0.2)
+    again, _ = problem.solve(0.1)
+    assert second >= first
+    assert again == pytest.approx(first, rel=1e-5)
+    assert first == pytest.approx(solve_worst_case_sdp(Sigma_nom, w, 0.1)[0], rel=1e-5)
+
+def test_new_delta_does_not_recompile():
+    rng = np.random.default_rng(0)
+    n = 40
+    A = rng.normal(size=(n, n))
+    Sigma_nom = A @ A.T / n
+    w = np.full(n, 1.0 / n)
+    problem = WorstCaseProblem(Sigma_nom, w)
+    problem.solve(0.01)
+    program, first_compile = problem.problem._cache.param_prog, problem.problem.compilation_time
+    problem.solve(0.02)
+    assert problem.problem._cache.param_prog is program
+    assert problem.problem.compilation_time < first_compile
+
+def test_worst_case_curve_invalid_method(page_inputs):
+    Sigma_nom, w = page_inputs
+    with pytest.raises(ValueError):
+        worst_case_curve(Sigma_nom, w, [0.1], method="bogus")
@@ -0,0 +1,51 @@
+import concurrent.futures
+import pytest
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from definition_b796597efcf74cb29a190cecb3458840 import sensitivity_sweep, visualize_sensitivity
+
+@pytest.fixture
+def sweep_inputs():
+    Sigma_nom = np.array([[1.0, 0.1, 0.0],
+                          [0.1, 1.0, 0.2],
+                          [0.0, 0.2, 1.0]])
+    w = np.array([0.2, 0.3, 0.5])
+    return Sigma_nom, w
+
+def test_sensitivity_sweep_columns(sweep_inputs):
+    Sigma_nom, w = sweep_inputs
+    df = sensitivity_sweep(Sigma_nom, w, [0.0, 0.1], num_samples=100, quantiles=(0.05, 0.95), max_workers=1)
+    assert isinstance(df, pd.DataFrame)
+    assert list(df.columns) == ["delta", "nominal_risk", "worst_case_risk", "mean_risk", "q0.05", "q0.95"]
+    assert len(df) == 2
+
+def test_sensitivity_sweep_worst_case_dominates_samples(sweep_inputs):
+    Sigma_nom, w = sweep_inputs
+    df = sensitivity_sweep(Sigma_nom, w, [0.05, 0.1, 0.2], num_samples=1000, max_workers=1)
+    assert np.all(df["worst_case_risk"] >= df["q0.95"])
+    assert np.allclose(df["nominal_risk"], w @ Sigma_nom @ w)
+
+def test_sensitivity_sweep_independent_of_worker_count(sweep_inputs):
+    Sigma_nom, w = sweep_inputs
+    deltas = [0.05, 0.1, 0.15]
+    serial = sensitivity_sweep(Sigma_nom, w, deltas, num_samples=500, seed=3, max_workers=1)
+    parallel = sensitivity_sweep(Sigma_nom, w, deltas, num_samples=500, seed=3, max_workers=2)
+    assert np.array_equal(serial["q0.5"].values, parallel["q0.5"].values)
+
+def test_sensitivity_sweep_runs_inline_by_default(sweep_inputs, monkeypatch):
+    Sigma_nom, w = sweep_inputs
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started")
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+    assert len(sensitivity_sweep(Sigma_nom, w, [0.0, 0.1, 0.2], num_samples=100)) == 3
+
+def test_sensitivity_sweep_empty(sweep_inputs):
+    Sigma_nom, w = sweep_inputs
+    df = sensitivity_sweep(Sigma_nom, w, [])
+    assert df.empty
+
+def test_visualize_sensitivity_returns_figure(sweep_inputs):
+    Sigma_nom, w = sweep_inputs
+    df = sensitivity_sweep(Sigma_nom, w, [0.0, 0.1], num_samples=100, max_workers=1)
+    assert isinstance(visualize_sensitivity(df), go.Figure)
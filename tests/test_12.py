@@ -0,0 +1,35 @@
+import pytest
+import numpy as np
+from definition_86b2276730394dbcbe058bcad93e3dc3 import FactorCovariance, generate_factor_covariance, calculate_portfolio_risk, optimize_portfolio, worst_case_risk
+
+@pytest.fixture
+def factor_model():
+    return generate_factor_covariance(40, 3, seed=0)
+
+def test_factor_covariance_matches_dense(factor_model):
+    Sigma = factor_model.to_dense()
+    w = np.linspace(0.0, 1.0, 40)
+    assert np.allclose(w @ factor_model, w @ Sigma)
+    assert np.allclose(factor_model @ w, Sigma @ w)
+    assert factor_model.quad_form(w) == pytest.approx(w @ Sigma @ w)
+    assert np.allclose(factor_model.diagonal(), np.diag(Sigma))
+
+def test_factor_covariance_accepted_by_risk_functions(factor_model):
+    w = np.full(40, 1 / 40)
+    Sigma = factor_model.to_dense()
+    assert calculate_portfolio_risk(w, factor_model) == pytest.approx(w @ Sigma @ w)
+    assert worst_case_risk(factor_model, w, 0.005)[0] == pytest.approx(worst_case_risk(Sigma, w, 0.005)[0])
+
+def test_factor_covariance_optimization_matches_dense(factor_model):
+    mu = np.linspace(0.01, 0.1, 40)
+    w_factor = optimize_portfolio(factor_model, mu)
+    w_dense = optimize_portfolio(factor_model.to_dense(), mu)
+    assert np.allclose(w_factor, w_dense, atol=1e-4)
+
+def test_factor_covariance_invalid_shapes():
+    with pytest.raises(ValueError):
+        FactorCovariance(np.ones((4, 2)), np.eye(3), np.ones(4))
+
+def test_factor_covariance_negative_idiosyncratic_variance():
+    with pytest.raises(ValueError):
+        FactorCovariance(np.ones((2, 1)), np.eye(1), np.array([0.1, -0.1]))
@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+from definition_ada70ac0ee9840e58c96cc46b44348b1 import PackedCovarianceSet, generate_packed_uncertainty_set, calculate_risk_distribution
+
+@pytest.fixture
+def sample_sigma():
+    return np.array([[0.1, 0.05, 0.02],
+                     [0.05, 0.2, 0.03],
+                     [0.02, 0.03, 0.3]])
+
+def test_packed_round_trip(sample_sigma):
+    Sigmas = np.stack([sample_sigma, 2 * sample_sigma])
+    packed = PackedCovarianceSet.from_dense(Sigmas)
+    assert len(packed) == 2
+    assert np.allclose(packed.to_dense(), Sigmas)
+    assert np.allclose(packed[1], 2 * sample_sigma)
+
+def test_packed_risks_match_dense(sample_sigma):
+    w = np.array([0.2, 0.3, 0.5])
+    packed = generate_packed_uncertainty_set(sample_sigma, 0.05, 50)
+    dense = packed.to_dense()
+    assert np.allclose(packed.risks(w), [w @ Sigma @ w for Sigma in dense])
+    assert np.allclose(calculate_risk_distribution(packed, w), packed.risks(w))
+
+@pytest.mark.parametrize("dtype, ratio", [(np.float64, 2), (np.float32, 4)])
+def test_packed_memory_savings(dtype, ratio):
+    n = 20
+    packed = generate_packed_uncertainty_set(np.eye(n), 0.1, 10, dtype=dtype)
+    assert packed.dtype == dtype
+    assert packed.nbytes * ratio == pytest.approx(10 * n * n * 8, rel=0.1)
+
+def test_packed_respects_bounds_and_symmetry(sample_sigma):
+    packed = generate_packed_uncertainty_set(sample_sigma, 0.05, 20, zero_diagonal=True)
+    for Sigma in packed:
+        assert np.allclose(Sigma, Sigma.T)
+        assert np.allclose(np.diag(Sigma), np.diag(sample_sigma))
+        assert np.all(np.abs(Sigma - sample_sigma) <= 0.05 + 1e-12)
+
+def test_packed_invalid_shape():
+    with pytest.raises(ValueError):
+        PackedCovarianceSet(np.zeros((2, 5)), 3)
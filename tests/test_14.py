@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+from definition_d7c89c8ce95a457082ce90ee74128d6c import sample_portfolio_risks, generate_uncertainty_set, generate_nominal_covariance_matrix, generate_packed_uncertainty_set
+
+@pytest.fixture
+def sample_inputs():
+    n = 8
+    return np.eye(n), np.full(n, 1 / n)
+
+@pytest.mark.parametrize("chunk_size", [1, 37, 4096, 100000])
+def test_sample_portfolio_risks_independent_of_chunk_size(sample_inputs, chunk_size):
+    Sigma_nom, w = sample_inputs
+    expected = sample_portfolio_risks(Sigma_nom, w, 0.1, 9000, rng=11)
+    result = sample_portfolio_risks(Sigma_nom, w, 0.1, 9000, rng=11, chunk_size=chunk_size)
+    assert np.array_equal(result, expected)
+
+def test_sample_portfolio_risks_independent_of_worker_count(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    expected = sample_portfolio_risks(Sigma_nom, w, 0.1, 9000, rng=11)
+    result = sample_portfolio_risks(Sigma_nom, w, 0.1, 9000, rng=11, chunk_size=4096, max_workers=2)
+    assert np.array_equal(result, expected)
+
+def test_generator_streams_advance(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    rng = np.random.default_rng(0)
+    first = sample_portfolio_risks(Sigma_nom, w, 0.1, 10, rng=rng)
+    second = sample_portfolio_risks(Sigma_nom, w, 0.1, 10, rng=rng)
+    assert not np.array_equal(first, second)
+
+def test_seeded_generators_reproducible(sample_inputs):
+    Sigma_nom, _ = sample_inputs
+    assert np.array_equal(generate_nominal_covariance_matrix(4, rng=5), generate_nominal_covariance_matrix(4, rng=5))
+    first = generate_uncertainty_set(Sigma_nom, 0.1, 3, rng=np.random.default_rng(5))
+    second = generate_uncertainty_set(Sigma_nom, 0.1, 3, rng=np.random.default_rng(5))
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+def test_packed_set_shares_sampling_streams(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    packed = generate_packed_uncertainty_set(Sigma_nom, 0.1, 500, rng=3)
+    assert np.allclose(packed.risks(w), sample_portfolio_risks(Sigma_nom, w, 0.1, 500, rng=3))
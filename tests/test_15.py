@@ -0,0 +1,71 @@
+import json
+import threading
+import pytest
+import numpy as np
+from definition_50fc148f8caf42dfa0bae12ac0c1cd23 import Tracer, optimize_min_variance_portfolio, generate_market_data
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.enable()
+    yield tracer
+    tracer.disable()
+
+def test_spans_nest_and_time(tracer):
+    with tracer.span("outer", delta=0.1):
+        with tracer.span("inner"):
+            pass
+    records = sorted(tracer.records(), key=lambda record: record["start"])
+    assert [record["name"] for record in records] == ["outer", "inner"]
+    assert records[1]["parent"] == "outer" and records[1]["depth"] == 1
+    assert records[0]["delta"] == 0.1
+    assert records[0]["duration"] >= records[1]["duration"] >= 0
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+
+    @tracer.traced()
+    def add(a, b):
+        return a + b
+
+    with tracer.span("ignored") as record:
+        assert record is None
+    assert add(1, 2) == 3
+    assert tracer.records() == []
+
+def test_traced_records_exceptions(tracer):
+    @tracer.traced("failing")
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        fail()
+    assert tracer.records()[0]["error"] == "ValueError"
+
+def test_record_problem_captures_solver_stats(tracer):
+    import definition_50fc148f8caf42dfa0bae12ac0c1cd23 as module
+    mu, Sigma_nom = generate_market_data(5, 2)
+    module.tracer.enable()
+    try:
+        with module.tracer.span("solve"):
+            optimize_min_variance_portfolio(Sigma_nom, mu)
+        records = {record["name"]: record for record in module.tracer.records()}
+    finally:
+        module.tracer.disable()
+    assert records["optimize_min_variance_portfolio"]["parent"] == "solve"
+    assert records["optimize_min_variance_portfolio"]["compile_time"] > 0
+    assert records["optimize_min_variance_portfolio"]["solve_time"] >= 0
+    assert "compile_time" not in records["solve"]
+
+def test_export_jsonl_and_thread_isolation(tracer, tmp_path):
+    with tracer.span("main"):
+        pass
+    worker = threading.Thread(target=lambda: tracer.span("other").__enter__())
+    worker.start()
+    worker.join()
+    path = tmp_path / "timings.jsonl"
+    text = tracer.export_jsonl(str(path))
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert text == path.read_text()
+    assert [line["name"] for line in lines] == ["main"]
+    assert list(tracer.summary().columns) == ["span", "ms", "compile_ms", "solve_ms"]
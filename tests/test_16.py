@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, "worst_case_batch.py", *args], cwd=ROOT, capture_output=True, text=True, timeout=300)
+
+@pytest.fixture
+def books(tmp_path):
+    rng = np.random.default_rng(0)
+    A = rng.uniform(-0.15, 0.8, size=(5, 5))
+    path = tmp_path / "books.npz"
+    np.savez(path, Sigma_nom=A.T @ A, mu=np.abs(rng.standard_normal(5)) / 15, weights=rng.dirichlet(np.ones(5), size=4))
+    return path
+
+def test_startup_does_not_import_ui_libraries():
+    code = "import sys, worst_case_batch; print(sorted({m.split('.')[0] for m in sys.modules} & {'streamlit', 'plotly'}))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+def test_batch_writes_one_record_per_portfolio(books, tmp_path):
+    output = tmp_path / "results.jsonl"
+    result = run_cli("--npz", str(books), "--optimize", "--target-returns", "0.04", "--deltas", "0.0", "0.1", "--workers", "2", "--output", str(output))
+    assert result.returncode == 0, result.stderr
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(record["portfolio"] for record in records) == ["0", "1", "2", "3", "min_variance@0.04"]
+    for record in records:
+        assert record["status"] == "ok"
+        assert [point["delta"] for point in record["worst_case"]] == [0.0, 0.1]
+        assert record["worst_case"][0]["risk"] == pytest.approx(record["nominal_risk"])
+        assert record["worst_case"][1]["risk"] >= record["nominal_risk"]
+
+def test_monte_carlo_reports_quantiles(books):
+    result = run_cli("--npz", str(books), "--method", "monte-carlo", "--samples", "200", "--quantiles", "0.5", "--workers", "1")
+    assert result.returncode == 0, result.stderr
+    record = json.loads(result.stdout.splitlines()[0])
+    assert set(record["distribution"][0]["quantiles"]) == {"0.5"}
+
+def test_csv_inputs_with_labels(books, tmp_path):
+    pd = pytest.importorskip("pandas")
+    data = np.load(books)
+    pd.DataFrame(data["Sigma_nom"]).to_csv(tmp_path / "sigma.csv", index=False)
+    weights = pd.DataFrame(data["weights"])
+    weights.insert(0, "book", ["a", "b", "c", "d"])
+    weights.to_csv(tmp_path / "weights.csv", index=False)
+    result = run_cli("--sigma", str(tmp_path / "sigma.csv"), "--weights", str(tmp_path / "weights.csv"), "--workers", "1")
+    assert result.returncode == 0, result.stderr
+    assert [json.loads(line)["portfolio"] for line in result.stdout.splitlines()] == ["a", "b", "c", "d"]
+
+def test_missing_mu_for_optimization_fails(tmp_path):
+    path = tmp_path / "sigma.npz"
+    np.savez(path, Sigma_nom=np.eye(3))
+    result = run_cli("--npz", str(path))
+    assert result.returncode != 0
+    assert "mu is required" in result.stderr
+
+def test_headerless_csv_keeps_first_row(books, tmp_path):
+    data = np.load(books)
+    np.savetxt(tmp_path / "sigma.csv", data["Sigma_nom"], delimiter=",")
+    np.savetxt(tmp_path / "weights.csv", data["weights"], delimiter=",")
+    result = run_cli("--sigma", str(tmp_path / "sigma.csv"), "--weights", str(tmp_path / "weights.csv"), "--workers", "1")
+    assert result.returncode == 0, result.stderr
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [record["portfolio"] for record in records] == ["0", "1", "2", "3"]
+    w = data["weights"][0]
+    assert records[0]["nominal_risk"] == pytest.approx(w @ data["Sigma_nom"] @ w)
@@ -0,0 +1,42 @@
+import pytest
+import numpy as np
+from definition_f4ceabb313854e8b9c89a0c0302874d3 import visualize_risk_distribution, visualize_covariance_matrix
+
+def test_risk_histogram_is_binned_server_side():
+    values = np.random.default_rng(0).normal(size=200000)
+    fig = visualize_risk_distribution(values, nbins=40)
+    assert len(fig.data[0].x) == 40
+    assert np.sum(fig.data[0].y) == len(values)
+
+def test_risk_histogram_accepts_bin_counts_and_drops_non_finite():
+    counts, edges = np.histogram([0.1, 0.2, 0.2, 0.3], bins=3)
+    fig = visualize_risk_distribution((counts, edges))
+    assert np.array_equal(fig.data[0].y, counts)
+    assert np.allclose(fig.data[0].x, (edges[:-1] + edges[1:]) / 2)
+    fig = visualize_risk_distribution(np.array([0.1, np.nan, np.inf, 0.3]))
+    assert np.sum(fig.data[0].y) == 2
+
+def test_large_covariance_is_block_averaged():
+    Sigma = np.arange(300 * 300, dtype=float).reshape(300, 300)
+    fig = visualize_covariance_matrix(Sigma, "Big", max_size=100)
+    z = np.asarray(fig.data[0].z)
+    assert z.shape == (100, 100)
+    assert z[0, 0] == pytest.approx(Sigma[:3, :3].mean())
+    assert z[-1, -1] == pytest.approx(Sigma[-3:, -3:].mean())
+    assert list(fig.data[0].x[:2]) == [0, 3]
+
+def test_uneven_blocks_average_their_own_entries():
+    Sigma = np.random.default_rng(1).random((7, 7))
+    z = np.asarray(visualize_covariance_matrix(Sigma, "Uneven", max_size=3).data[0].z)
+    assert z.shape == (3, 3)
+    assert z[2, 2] == pytest.approx(Sigma[6:, 6:].mean())
+    assert z[0, 1] == pytest.approx(Sigma[:3, 3:6].mean())
+
+def test_region_drill_down_keeps_asset_indices_and_labels_small_matrices():
+    Sigma = np.random.default_rng(2).random((500, 500))
+    fig = visualize_covariance_matrix(Sigma, "Detail", region=((100, 110), (200, 205)))
+    assert np.allclose(fig.data[0].z, Sigma[100:110, 200:205])
+    assert list(fig.data[0].y) == list(range(100, 110))
+    assert list(fig.data[0].x) == list(range(200, 205))
+    assert fig.data[0].texttemplate == "%{z:.2f}"
+    assert not visualize_covariance_matrix(Sigma, "Full").data[0].texttemplate
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+from definition_3fe01ace03f7405399148c343e7b39c9 import RiskAccumulator, sample_risk_statistics, sample_portfolio_risks
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(0).normal(1.0, 0.2, size=200000)
+
+def test_accumulator_streams_exact_moments_and_bounded_sketch(values):
+    accumulator = RiskAccumulator()
+    for chunk in np.array_split(values, 37):
+        accumulator.update(chunk)
+    assert accumulator.count == len(values)
+    assert accumulator.mean == pytest.approx(np.mean(values), rel=1e-12)
+    assert accumulator.variance == pytest.approx(np.var(values, ddof=1), rel=1e-10)
+    assert (accumulator.min, accumulator.max) == (np.min(values), np.max(values))
+    assert len(accumulator._means) <= 110
+    for q in (0.01, 0.05, 0.5, 0.95, 0.99):
+        assert accumulator.quantile(q) == pytest.approx(np.quantile(values, q), abs=0.01)
+    tail = values[values >= np.quantile(values, 0.95)].mean()
+    assert accumulator.tail_mean(0.95) == pytest.approx(tail, abs=0.01)
+
+def test_merged_accumulators_match_single_pass(values):
+    single = RiskAccumulator().update(values)
+    merged = RiskAccumulator()
+    for part in np.array_split(values, 4):
+        merged.merge(RiskAccumulator().update(part))
+    assert merged.count == single.count
+    assert merged.mean == pytest.approx(single.mean, rel=1e-12)
+    assert merged.variance == pytest.approx(single.variance, rel=1e-10)
+    assert merged.quantile(0.9) == pytest.approx(single.quantile(0.9), abs=0.005)
+    counts, edges = merged.histogram(20)
+    assert np.sum(counts) == pytest.approx(len(values))
+    assert (edges[0], edges[-1]) == (merged.min, merged.max)
+
+def test_early_stopping_meets_tolerance_and_reuses_streams():
+    Sigma_nom, w = np.eye(6), np.full(6, 1 / 6)
+    stats = sample_risk_statistics(Sigma_nom, w, 0.5, mean_tol=1e-3, rng=3)
+    assert 1000 <= stats.count < 1000000
+    assert stats.mean_half_width() <= 1e-3
+    risks = sample_portfolio_risks(Sigma_nom, w, 0.5, stats.count, rng=3)
+    assert stats.mean == pytest.approx(np.mean(risks), rel=1e-12)
+    assert stats.max == np.max(risks)
+
+def test_quantile_tolerance_and_sample_cap():
+    Sigma_nom, w = np.eye(4), np.full(4, 0.25)
+    loose = sample_risk_statistics(Sigma_nom, w, 0.5, quantile_tol=0.01, rng=1)
+    tight = sample_risk_statistics(Sigma_nom, w, 0.5, quantile_tol=1e-5, max_samples=20000, rng=1)
+    assert all(loose.quantile_half_width(q) <= 0.01 for q in (0.05, 0.5, 0.95))
+    assert tight.count == 20000
+    assert loose.count < tight.count
+
+def test_parallel_workers_merge_partial_results():
+    Sigma_nom, w = np.eye(5), np.full(5, 0.2)
+    serial = sample_risk_statistics(Sigma_nom, w, 0.2, max_samples=30000, rng=5)
+    parallel = sample_risk_statistics(Sigma_nom, w, 0.2, max_samples=30000, batch_size=8192, rng=5, max_workers=2)
+    assert parallel.count == serial.count == 30000
+    assert parallel.mean == pytest.approx(serial.mean, rel=1e-12)
+    assert parallel.variance == pytest.approx(serial.variance, rel=1e-10)
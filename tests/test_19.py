@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from definition_434dd4df864944249ecd813f727c3441 import (
+    sample_portfolio_risks, sample_risk_quantiles, generate_uncertainty_set, generate_packed_uncertainty_set, SAMPLING_METHODS,
+)
+
+@pytest.fixture
+def sample_inputs():
+    rng = np.random.default_rng(0)
+    A = rng.uniform(-0.15, 0.8, size=(5, 5))
+    return A.T @ A, rng.dirichlet(np.ones(5))
+
+@pytest.mark.parametrize("method", SAMPLING_METHODS)
+def test_methods_stay_in_uncertainty_set_and_are_chunk_invariant(sample_inputs, method):
+    Sigma_nom, w = sample_inputs
+    expected = sample_portfolio_risks(Sigma_nom, w, 0.1, 3000, rng=4, method=method)
+    assert np.array_equal(sample_portfolio_risks(Sigma_nom, w, 0.1, 3000, rng=4, method=method, chunk_size=100), expected)
+    packed = generate_packed_uncertainty_set(Sigma_nom, 0.1, 300, zero_diagonal=True, rng=4, method=method)
+    Delta = packed.to_dense() - Sigma_nom
+    assert np.all(np.abs(Delta) <= 0.1) and np.all(np.diagonal(Delta, axis1=1, axis2=2) == 0)
+
+def test_antithetic_pairs_cancel(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    risks = sample_portfolio_risks(Sigma_nom, w, 0.2, 1000, rng=1, method="antithetic")
+    assert np.allclose((risks[0::2] + risks[1::2]) / 2, w @ Sigma_nom @ w)
+    result = sample_risk_quantiles(Sigma_nom, w, 0.2, 1000, method="antithetic", rng=1)
+    assert result["effective_sample_size"]["mean"] == np.inf
+
+def test_symmetric_qmc_uncertainty_set(sample_inputs):
+    Sigma_nom, _ = sample_inputs
+    Sigma_nom = (Sigma_nom + Sigma_nom.T) / 2
+    for Sigma in generate_uncertainty_set(Sigma_nom, 0.05, 10, rng=0, method="sobol"):
+        assert np.allclose(Sigma, Sigma.T)
+        assert np.allclose(np.diag(Sigma), np.diag(Sigma_nom))
+        assert np.all(np.abs(Sigma - Sigma_nom) <= 0.05 + 1e-12)
+    with pytest.raises(ValueError):
+        generate_uncertainty_set(Sigma_nom, 0.05, 10, method="grid")
+
+def test_sobol_dimension_limit_names_n():
+    w = np.full(206, 1 / 206)
+    with pytest.raises(ValueError, match="n <= 205"):
+        sample_portfolio_risks(np.eye(206), w, 0.1, 16, rng=0, method="sobol")
+    with pytest.raises(ValueError, match="n <= 205"):
+        generate_packed_uncertainty_set(np.eye(206), 0.1, 4, rng=0, method="sobol")
+    assert sample_portfolio_risks(np.eye(206), w, 0.1, 16, rng=0, method="sobol", zero_diagonal=True).shape == (16,)
+    assert sample_portfolio_risks(np.eye(206), w, 0.1, 16, rng=0, method="lhs").shape == (16,)
+
+def test_sobol_reduces_quantile_error(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    reference = np.quantile(sample_portfolio_risks(Sigma_nom, w, 0.3, 1000000, rng=99), 0.95)
+    errors = {method: [sample_risk_quantiles(Sigma_nom, w, 0.3, 4096, method=method, quantiles=(0.95,), rng=seed)["quantiles"][0.95] - reference
+                       for seed in range(12)] for method in ("random", "sobol")}
+    assert np.mean(np.square(errors["sobol"])) < np.mean(np.square(errors["random"]))
+
+def test_effective_sample_size_reported(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    plain = sample_risk_quantiles(Sigma_nom, w, 0.3, 4096, method="random", rng=0)
+    assert plain["effective_sample_size"]["quantiles"][0.95] == 4096
+    sobol = sample_risk_quantiles(Sigma_nom, w, 0.3, 4096, method="sobol", rng=0)
+    assert sobol["effective_sample_size"]["mean"] > 10 * 4096
+    assert sobol["effective_sample_size"]["quantiles"][0.95] > 4096
+    assert np.isnan(sample_risk_quantiles(Sigma_nom, w, 0.3, 100, method="lhs", rng=0)["effective_sample_size"]["mean"])
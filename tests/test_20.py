@@ -0,0 +1,68 @@
+import time
+import tracemalloc
+import pytest
+import numpy as np
+import cvxpy as cp
+from definition_ee0c38e4a02a4996b5624e64aa7bbe6d import (
+    optimize_robust_portfolio, optimize_min_variance_portfolio, worst_case_risk, generate_market_data, FactorCovariance,
+    RobustPortfolioProblem,
+)
+
+@pytest.fixture
+def market():
+    return generate_market_data(5, 2)
+
+def test_robust_risk_is_worst_case_of_robust_weights(market):
+    mu, Sigma_nom = market
+    w, risk = optimize_robust_portfolio(Sigma_nom, mu, 0.05)
+    assert np.sum(w) == pytest.approx(1, abs=1e-6)
+    assert mu.reshape(-1) @ w >= 0.1 - 1e-6
+    assert np.sum(np.abs(w)) <= 2 + 1e-6
+    assert risk == pytest.approx(worst_case_risk(Sigma_nom, w, 0.05)[0], abs=1e-4)
+
+@pytest.mark.parametrize("delta", [0.02, 0.1, 0.3])
+def test_robust_beats_nominal_portfolio_in_worst_case(market, delta):
+    mu, Sigma_nom = market
+    w_nominal = optimize_min_variance_portfolio(Sigma_nom, mu)
+    _, risk = optimize_robust_portfolio(Sigma_nom, mu, delta)
+    assert risk <= worst_case_risk(Sigma_nom, w_nominal, delta)[0] + 1e-5
+
+def test_zero_delta_recovers_min_variance(market):
+    mu, Sigma_nom = market
+    w_nominal = optimize_min_variance_portfolio(Sigma_nom, mu)
+    _, risk = optimize_robust_portfolio(Sigma_nom, mu, 0.0)
+    assert risk == pytest.approx(w_nominal @ Sigma_nom @ w_nominal, abs=1e-5)
+
+def test_factor_covariance_accepted():
+    rng = np.random.default_rng(0)
+    Sigma = FactorCovariance(rng.standard_normal((6, 2)), np.eye(2), np.full(6, 0.5))
+    mu = np.linspace(0.05, 0.15, 6)
+    w, risk = optimize_robust_portfolio(Sigma, mu, 0.1)
+    assert risk == pytest.approx(worst_case_risk(Sigma.to_dense(), w, 0.1)[0], abs=1e-4)
+
+def test_invalid_inputs(market):
+    mu, Sigma_nom = market
+    with pytest.raises(TypeError):
+        optimize_robust_portfolio(Sigma_nom.tolist(), mu, 0.1)
+    with pytest.raises(ValueError):
+        optimize_robust_portfolio(Sigma_nom, mu, -0.1)
+    with pytest.raises(ValueError):
+        optimize_robust_portfolio(Sigma_nom, mu, 0.1, target_return=10.0)
+
+def test_compilation_is_bounded_at_moderate_n():
+    rng = np.random.default_rng(0)
+    n = 150
+    A = rng.normal(size=(n, n))
+    Sigma_nom, mu = A @ A.T / n, rng.uniform(0.0, 0.2, n)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        problem = RobustPortfolioProblem(Sigma_nom, mu)
+        problem.delta.value, problem.target_return.value, problem.l1_bound.value = 0.1, 0.1, 2.0
+        problem.problem.get_problem_data(cp.SCS)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert time.perf_counter() - start < 10.0
+    assert peak < 200e6
+    assert [p.size for p in problem.problem.parameters()] == [1, 1, 1]
@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+from definition_aa6364c6daec4476a03da131fa461348 import (
+    efficient_frontier, optimize_portfolio, optimize_min_variance_portfolio, generate_market_data,
+)
+
+@pytest.fixture
+def market():
+    mu, Sigma_nom = generate_market_data(5, 2)
+    return mu.reshape(-1), Sigma_nom
+
+def test_gamma_point_matches_optimize_portfolio(market):
+    mu, Sigma_nom = market
+    frontier = efficient_frontier(Sigma_nom, mu, gammas=[0.1, 1.0])
+    assert frontier["weights"].shape == (2, 5)
+    np.testing.assert_allclose(frontier["weights"][0], optimize_portfolio(Sigma_nom, mu, gamma=0.1), atol=1e-4)
+    np.testing.assert_allclose(frontier["weights"][1], optimize_portfolio(Sigma_nom, mu, gamma=1.0), atol=1e-4)
+
+def test_target_return_frontier(market):
+    mu, Sigma_nom = market
+    targets = np.linspace(0.0, 0.1, 5)
+    frontier = efficient_frontier(Sigma_nom, mu, target_returns=targets)
+    np.testing.assert_array_equal(frontier["target_return"], targets)
+    w = optimize_min_variance_portfolio(Sigma_nom, mu, 0.1)
+    assert frontier["risk"][-1] == pytest.approx(w @ Sigma_nom @ w, abs=1e-5)
+    assert np.all(frontier["return"] >= targets - 1e-6)
+    np.testing.assert_allclose(frontier["std"], np.sqrt(frontier["risk"]))
+
+def test_infeasible_points_are_nan(market):
+    mu, Sigma_nom = market
+    frontier = efficient_frontier(Sigma_nom, mu, target_returns=[0.05, 100.0])
+    assert np.isfinite(frontier["risk"][0])
+    assert np.isnan(frontier["risk"][1])
+    assert np.all(np.isnan(frontier["weights"][1]))
+
+def test_workers_give_same_frontier(market):
+    mu, Sigma_nom = market
+    gammas = np.logspace(-1, 1, 6)
+    serial = efficient_frontier(Sigma_nom, mu, gammas=gammas)
+    parallel = efficient_frontier(Sigma_nom, mu, gammas=gammas, max_workers=2)
+    np.testing.assert_allclose(parallel["weights"], serial["weights"], atol=1e-6)
+
+def test_return_decreases_with_risk_aversion(market):
+    mu, Sigma_nom = market
+    frontier = efficient_frontier(Sigma_nom, mu)
+    assert len(frontier["gamma"]) == 50
+    assert np.all(np.diff(frontier["return"]) <= 1e-6)
+    assert np.all(np.diff(frontier["risk"]) <= 1e-6)
+
+def test_invalid_inputs(market):
+    mu, Sigma_nom = market
+    with pytest.raises(ValueError):
+        efficient_frontier(Sigma_nom, mu, gammas=[1.0], target_returns=[0.1])
+    with pytest.raises(TypeError):
+        efficient_frontier(Sigma_nom.tolist(), mu)
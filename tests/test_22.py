@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+import cvxpy as cp
+from definition_7bbcb524003140d48a9f44345f6ef3a6 import (
+    optimize_portfolio, efficient_frontier, generate_market_data, generate_factor_covariance, generate_nominal_covariance_matrix,
+)
+
+@pytest.fixture
+def market():
+    mu, Sigma_nom = generate_market_data(5, 2)
+    return mu.reshape(-1), Sigma_nom
+
+@pytest.mark.parametrize("gamma", [0.0, 0.01, 0.1, 1.0, 100.0])
+def test_native_matches_cvxpy(market, gamma):
+    mu, Sigma_nom = market
+    w = optimize_portfolio(Sigma_nom, mu, gamma=gamma, backend="native", verify=True)
+    assert np.sum(w) == pytest.approx(1)
+    assert np.all(w >= 0)
+    np.testing.assert_allclose(w, optimize_portfolio(Sigma_nom, mu, gamma=gamma), atol=1e-4)
+
+def test_native_large_dense_and_factor():
+    rng = np.random.default_rng(0)
+    n = 60
+    Sigma_nom = generate_nominal_covariance_matrix(n, rng=1) / n + 0.1 * np.eye(n)
+    mu = rng.uniform(0.0, 0.2, n)
+    w = optimize_portfolio(Sigma_nom, mu, gamma=1.0, backend="native", verify=True)
+    assert 1 < np.count_nonzero(w) < n
+    Sigma = generate_factor_covariance(200, 5, seed=0)
+    mu = rng.uniform(0.0, 0.2, 200)
+    optimize_portfolio(Sigma, mu, gamma=1.0, backend="native", verify=True, tol=1e-5)
+
+def test_warm_start_gives_same_solution(market):
+    mu, Sigma_nom = market
+    w = optimize_portfolio(Sigma_nom, mu, gamma=1.0, backend="native")
+    for w0 in [w, np.full(5, 0.2), np.array([3.0, -1.0, 0.0, 0.0, 0.0])]:
+        np.testing.assert_allclose(optimize_portfolio(Sigma_nom, mu, gamma=1.1, backend="native", w0=w0),
+                                   optimize_portfolio(Sigma_nom, mu, gamma=1.1, backend="native"), atol=1e-10)
+
+def test_native_frontier_matches_cvxpy(market):
+    mu, Sigma_nom = market
+    gammas = np.logspace(-1, 1, 5)
+    native = efficient_frontier(Sigma_nom, mu, gammas=gammas, backend="native")
+    np.testing.assert_allclose(native["weights"], efficient_frontier(Sigma_nom, mu, gammas=gammas)["weights"], atol=1e-4)
+
+def test_invalid_inputs(market):
+    mu, Sigma_nom = market
+    with pytest.raises(ValueError):
+        optimize_portfolio(Sigma_nom, mu, backend="scipy")
+    with pytest.raises(ValueError):
+        optimize_portfolio(Sigma_nom, mu, gamma=-1.0, backend="native")
+    with pytest.raises(ValueError):
+        efficient_frontier(Sigma_nom, mu, target_returns=[0.1], backend="native")
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+import pandas as pd
+from definition_666f45b4337c49ffbe0b9e77665cf500 import estimate_covariance, optimize_min_variance_portfolio, worst_case_risk
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    mixing = np.eye(8) + 0.3 * rng.standard_normal((8, 8))
+    return rng.standard_normal((600, 8)) @ mixing * 0.01 + np.linspace(0.29, 0.31, 8)
+
+def ledoit_wolf_reference(X):
+    Y = X - X.mean(axis=0)
+    T, n = Y.shape
+    S = Y.T @ Y / T
+    target = np.trace(S) / n
+    distance = np.sum((S - target * np.eye(n)) ** 2)
+    beta = sum(np.sum((np.outer(y, y) - S) ** 2) for y in Y) / T ** 2
+    shrinkage = min(beta, distance) / distance
+    return (1 - shrinkage) * S + shrinkage * target * np.eye(n)
+
+def test_sample_matches_numpy_for_any_chunking(returns):
+    for chunk_rows in [1, 37, 10000]:
+        np.testing.assert_allclose(estimate_covariance(returns, "sample", chunk_rows=chunk_rows), np.cov(returns.T), atol=1e-14)
+
+def test_ledoit_wolf_matches_direct_formula(returns):
+    for X in [returns, returns[:20]]:
+        np.testing.assert_allclose(estimate_covariance(X, chunk_rows=7), ledoit_wolf_reference(X), atol=1e-14)
+
+def test_ewma_matches_pandas(returns):
+    mu, Sigma = estimate_covariance(returns, "ewma", halflife=30, chunk_rows=50, return_mean=True)
+    ewm = pd.DataFrame(returns).ewm(halflife=30)
+    np.testing.assert_allclose(mu, ewm.mean().iloc[-1].to_numpy(), atol=1e-12)
+    np.testing.assert_allclose(Sigma, ewm.cov(bias=True).iloc[-8:].to_numpy(), atol=1e-14)
+
+def test_files_and_downstream_use(returns, tmp_path):
+    np.save(tmp_path / "returns.npy", returns)
+    frame = pd.DataFrame(returns, columns=[f"a{i}" for i in range(8)])
+    frame.insert(0, "date", pd.date_range("2020-01-01", periods=len(returns)))
+    frame.to_parquet(tmp_path / "returns.parquet", row_group_size=100)
+    expected = np.cov(returns.T)
+    np.testing.assert_allclose(estimate_covariance(str(tmp_path / "returns.npy"), "sample", chunk_rows=64), expected, atol=1e-14)
+    mu, Sigma = estimate_covariance(str(tmp_path / "returns.parquet"), "sample", chunk_rows=64, return_mean=True)
+    np.testing.assert_allclose(Sigma, expected, atol=1e-14)
+    np.testing.assert_allclose(estimate_covariance(str(tmp_path / "returns.parquet"), "sample", columns=["a2", "a5"]),
+                               expected[np.ix_([2, 5], [2, 5])], atol=1e-14)
+    w = optimize_min_variance_portfolio(Sigma, mu, target_return=0.3)
+    assert mu @ w >= 0.3 - 1e-6 and np.sum(w) == pytest.approx(1.0, abs=1e-6)
+    assert worst_case_risk(Sigma, w, 0.001)[0] >= w @ Sigma @ w
+
+def test_parquet_chunks_are_sized_by_numeric_columns(returns, tmp_path, monkeypatch):
+    frame = pd.DataFrame(returns, columns=[f"a{i}" for i in range(8)])
+    for i in range(24):
+        frame.insert(0, f"ticker{i}", "x")
+    frame.to_parquet(tmp_path / "returns.parquet")
+    module = estimate_covariance.__globals__
+    chunk_sizes = []
+    return_chunks = module["_return_chunks"]
+    def recording(source, chunk_rows, columns=None):
+        chunk_sizes.append(chunk_rows)
+        return return_chunks(source, chunk_rows, columns)
+    monkeypatch.setitem(module, "_CHUNK_ELEMENTS", 800)
+    monkeypatch.setitem(module, "_return_chunks", recording)
+    np.testing.assert_allclose(estimate_covariance(str(tmp_path / "returns.parquet"), "sample"), np.cov(returns.T), atol=1e-14)
+    assert chunk_sizes == [100]
+
+def test_invalid_inputs(returns):
+    with pytest.raises(ValueError):
+        estimate_covariance(returns, "shrunk")
+    with pytest.raises(ValueError):
+        estimate_covariance(returns, "ewma")
+    with pytest.raises(ValueError):
+        estimate_covariance(returns[:1])
+    bad = returns.copy()
+    bad[3, 2] = np.nan
+    with pytest.raises(ValueError):
+        estimate_covariance(bad)
+    with pytest.raises(TypeError):
+        estimate_covariance(returns.tolist())
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from definition_6dfc8b10d74640228cb46d1a7e7a32a5 import (
+    psd_mask, nearest_psd, screen_psd, generate_uncertainty_tensor, generate_nominal_covariance_matrix,
+    sample_portfolio_risks, sample_risk_statistics,
+)
+
+@pytest.fixture
+def inputs():
+    Sigma_nom = generate_nominal_covariance_matrix(5, rng=0)
+    w = np.array([0.3, 0.2, 0.1, 0.25, 0.15])
+    return Sigma_nom, w
+
+def smallest_eigenvalues(Sigmas):
+    return np.linalg.eigvalsh((Sigmas + np.swapaxes(Sigmas, 1, 2)) / 2)[:, 0]
+
+@pytest.mark.parametrize("n", [3, 5, 12])
+def test_mask_matches_eigenvalues(n):
+    Sigmas = generate_uncertainty_tensor(generate_nominal_covariance_matrix(n, rng=n), 0.2, 2000, rng=1)
+    mask = psd_mask(Sigmas)
+    assert 0 < mask.sum() < len(mask) or n == 12
+    np.testing.assert_array_equal(mask, smallest_eigenvalues(Sigmas) > -1e-10 * np.trace(Sigmas, axis1=1, axis2=2) / n)
+
+def test_projection_is_nearest_psd():
+    A = np.array([[1.0, 2.0], [2.0, 1.0]])
+    np.testing.assert_allclose(nearest_psd(A), [[1.5, 1.5], [1.5, 1.5]])
+    B = np.diag([2.0, 1.0])
+    np.testing.assert_allclose(nearest_psd(B), B)
+
+def test_screen_modes(inputs):
+    Sigma_nom, _ = inputs
+    Sigmas = generate_uncertainty_tensor(Sigma_nom, 0.3, 1000, rng=2)
+    rejected, stats = screen_psd(Sigmas, "reject")
+    assert len(rejected) == stats["psd"] < 1000
+    assert stats["acceptance_rate"] == pytest.approx(stats["psd"] / 1000)
+    assert np.all(smallest_eigenvalues(rejected) > -1e-8)
+    projected, stats = screen_psd(Sigmas, "project")
+    assert len(projected) == 1000 and stats["projected"] == 1000 - stats["psd"]
+    assert np.all(psd_mask(projected, tol=1e-8))
+    np.testing.assert_array_equal(generate_uncertainty_tensor(Sigma_nom, 0.3, 1000, rng=2, psd="reject"), rejected)
+
+@pytest.mark.parametrize("symmetric,zero_diagonal", [(True, False), (True, True), (False, False)])
+def test_screened_sampling_matches_dense(inputs, symmetric, zero_diagonal):
+    Sigma_nom, w = inputs
+    risks = sample_portfolio_risks(Sigma_nom, w, 0.2, 3000, symmetric=symmetric, zero_diagonal=zero_diagonal, rng=3)
+    kept = sample_portfolio_risks(Sigma_nom, w, 0.2, 3000, symmetric=symmetric, zero_diagonal=zero_diagonal, rng=3, psd="reject", chunk_size=500)
+    assert 0 < len(kept) < len(risks)
+    assert np.all(np.isin(kept, risks))
+    projected = sample_portfolio_risks(Sigma_nom, w, 0.2, 3000, symmetric=symmetric, zero_diagonal=zero_diagonal, rng=3, psd="project")
+    assert len(projected) == len(risks)
+    assert np.all(projected >= -1e-12)
+    np.testing.assert_array_equal(np.isin(risks, kept), projected == risks)
+
+def test_statistics_report_acceptance(inputs):
+    Sigma_nom, w = inputs
+    stats = sample_risk_statistics(Sigma_nom, w, 0.2, max_samples=4096, rng=4, psd="reject")
+    assert stats.count + stats.rejected == 4096
+    assert stats.count == len(sample_portfolio_risks(Sigma_nom, w, 0.2, 4096, rng=4, psd="reject"))
+    assert stats.acceptance_rate == pytest.approx(stats.count / 4096)
+    with pytest.raises(ValueError):
+        sample_portfolio_risks(Sigma_nom, w, 0.2, 10, psd="clip")
@@ -0,0 +1,63 @@
+import threading
+import time
+import pytest
+import numpy as np
+from definition_8cbddcbf66d446848ea2e42d01085e69 import BackgroundRunner, sample_risk_statistics, generate_nominal_covariance_matrix
+
+def slow(steps, progress=None, started=None):
+    if started is not None:
+        started.set()
+    for i in range(steps):
+        time.sleep(0.01)
+        if progress is not None and progress({"step": i}):
+            return "stopped"
+    return steps
+
+@pytest.fixture
+def runner():
+    runner = BackgroundRunner(max_workers=2, max_results=3)
+    yield runner
+    runner.shutdown()
+
+def test_same_inputs_share_one_job(runner):
+    job = runner.submit("a", slow, 3)
+    assert runner.submit("b", slow, 3) is job
+    assert job.result(timeout=5) == 3
+    assert runner.submit("a", slow, 3) is job
+    assert runner.job("a") is job
+
+def test_new_input_cancels_stale_job(runner):
+    started = threading.Event()
+    stale = runner.submit("slider", slow, 1000, progressive=True, started=started)
+    started.wait(5)
+    fresh = runner.submit("slider", slow, 2, progressive=True)
+    assert stale.cancelled
+    assert stale.result(timeout=5) == "stopped"
+    assert fresh.result(timeout=5) == 2
+    assert not fresh.cancelled
+
+def test_job_in_use_by_another_slot_is_not_cancelled(runner):
+    shared = runner.submit("a", slow, 20)
+    runner.submit("b", slow, 20)
+    runner.submit("a", slow, 2)
+    assert not shared.cancelled
+    assert shared.result(timeout=5) == 20
+
+def test_partial_results_and_eviction(runner):
+    job = runner.submit("a", slow, 5, progressive=True)
+    job.result(timeout=5)
+    assert job.partial() == {"step": 4} and job.updates == 5
+    for steps in range(6, 10):
+        runner.submit("a", slow, steps).wait(5)
+    assert len(runner._jobs) <= 3
+    assert runner.submit("a", slow, 5, progressive=True) is not job
+
+def test_progress_callback_stops_sampling():
+    Sigma_nom = generate_nominal_covariance_matrix(4, rng=0)
+    w = np.full(4, 0.25)
+    snapshots = []
+    stats = sample_risk_statistics(Sigma_nom, w, 0.1, max_samples=100000, rng=1,
+                                   progress=lambda accumulator: snapshots.append(accumulator.count) or len(snapshots) == 3)
+    assert len(snapshots) == 3
+    assert stats.count == snapshots[-1] < 100000
+    assert snapshots == sorted(snapshots)
@@ -0,0 +1,102 @@
+import concurrent.futures
+import importlib.util
+import multiprocessing
+import os
+import pytest
+import numpy as np
+import cvxpy as cp
+from definition_b783354abd114116813071e93dce8890 import (
+    ResultStore, configure_result_store, cached_min_variance_portfolio, cached_worst_case_risk, cached_sample_portfolio_risks,
+    generate_market_data, analysis_pipeline, content_cache, RESULT_STORE_VERSION,
+)
+
+def store_and_load(root, key):
+    store = ResultStore(root)
+    store.put(key, (np.arange(1000.0) * int(key[-1]), {"k": 1}))
+    return float(store.get(key)[0].sum())
+
+@pytest.fixture
+def store(tmp_path):
+    store = configure_result_store(str(tmp_path / "store"))
+    yield store
+    configure_result_store(None)
+
+def test_round_trip(tmp_path):
+    store = ResultStore(str(tmp_path))
+    value = {"w": np.arange(3.0), "scalars": (1, 2.5, None, "x"), 0.95: [np.empty(0), True]}
+    assert store.put("ab12", value)
+    loaded = store.get("ab12")
+    np.testing.assert_array_equal(loaded["w"], value["w"])
+    assert not loaded["w"].flags.writeable
+    assert loaded["scalars"] == (1, 2.5, None, "x") and loaded[0.95][1] is True
+    assert store.get("cd34") is None
+    assert not store.put("ef56", object())
+
+def test_cold_start_skips_solver(store, monkeypatch):
+    mu, Sigma_nom = generate_market_data(5, 2)
+    w = cached_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0)
+    risk, Delta = cached_worst_case_risk(Sigma_nom, w, 0.3)
+    for cached in (cached_min_variance_portfolio, cached_worst_case_risk):
+        cached.cache_clear()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("solver called")
+    monkeypatch.setattr(cp.Problem, "solve", fail)
+    hits = store.stats["hits"]
+    np.testing.assert_array_equal(cached_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0), w)
+    assert cached_worst_case_risk(Sigma_nom, w, 0.3)[0] == risk
+    assert store.stats["hits"] == hits + 2
+
+def test_cold_start_loads_seeded_risks(store, monkeypatch):
+    pipeline = analysis_pipeline(psd="reject")
+    risks = cached_sample_portfolio_risks(pipeline.get("Sigma_nom"), pipeline.get("weights"), 0.3, 500, rng=1)
+    quantiles, statistics = pipeline.get("risk_quantiles"), pipeline.get("risk_statistics")
+    cached_sample_portfolio_risks.cache_clear()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("sampled")
+    monkeypatch.setitem(content_cache.__globals__, "_sample_risk_chunk", fail)
+    cold = analysis_pipeline(psd="reject")
+    np.testing.assert_array_equal(cached_sample_portfolio_risks(cold.get("Sigma_nom"), cold.get("weights"), 0.3, 500, rng=1), risks)
+    np.testing.assert_array_equal(cold.get("risk_quantiles")["risks"], quantiles["risks"])
+    assert cold.get("risk_statistics").summary() == statistics.summary()
+    assert cold.get("risk_statistics").rejected == statistics.rejected
+    with pytest.raises(TypeError):
+        cached_sample_portfolio_risks(cold.get("Sigma_nom"), cold.get("weights"), 0.3, 500, rng=None)
+
+def load_model(path, scale):
+    path.write_text(f"def helper(x):\n    return {scale} * x\n\ndef model(x):\n    return helper(x)\n")
+    spec = importlib.util.spec_from_file_location("risk_model", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return content_cache(persist=True)(module.model)
+
+def test_stored_entries_follow_helper_source_and_version(store, tmp_path, monkeypatch):
+    old, new = load_model(tmp_path / "old.py", 2), load_model(tmp_path / "new.py", 3)
+    assert old(1.0) == 2.0
+    assert new(1.0) == 3.0
+    old.cache_clear()
+    assert old(1.0) == 2.0 and store.stats["hits"] == 1
+    monkeypatch.setitem(content_cache.__globals__, "RESULT_STORE_VERSION", RESULT_STORE_VERSION + 1)
+    old.cache_clear()
+    old(1.0)
+    assert store.stats["hits"] == 1
+
+def test_lru_eviction(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=30000)
+    for i in range(3):
+        store.put(f"k{i}", np.zeros(1000))
+        os.utime(store._path(f"k{i}"), (i, i))
+    store.get("k0")
+    store.put("k3", np.zeros(1000))
+    assert store.size() <= 30000
+    assert store.get("k0") is not None and store.get("k1") is None
+    assert store.stats["evictions"] == 1
+
+def test_concurrent_writers(tmp_path):
+    keys = ["aa1", "aa2", "aa1", "aa2", "aa3", "aa1"]
+    with concurrent.futures.ProcessPoolExecutor(3, mp_context=multiprocessing.get_context("spawn")) as executor:
+        sums = list(executor.map(store_and_load, [str(tmp_path)] * len(keys), keys))
+    assert sums == [499500.0 * int(key[-1]) for key in keys]
+    assert sorted(os.listdir(tmp_path / "aa")) == ["aa1", "aa2", "aa3"]
+    assert os.listdir(tmp_path / "tmp") == []
@@ -0,0 +1,63 @@
+import threading
+import time
+import pytest
+import numpy as np
+from definition_99039aed5571478b9628a831cc4afb79 import (
+    SolverPool, configure_solver_pool, pooled, generate_market_data, optimize_min_variance_portfolio, worst_case_risk,
+)
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SolverPool(max_workers=1, max_queue=2, timeout=30.0)
+    yield pool
+    pool.shutdown()
+
+def test_solve_matches_inline(pool):
+    mu, Sigma_nom = generate_market_data(5, 2)
+    w = pool.solve(optimize_min_variance_portfolio, Sigma_nom, mu, 0.1, 2.0)
+    np.testing.assert_allclose(w, optimize_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0), atol=1e-6)
+    risk, Delta = pool.solve(worst_case_risk, Sigma_nom, w, 0.2)
+    assert risk == pytest.approx(worst_case_risk(Sigma_nom, w, 0.2)[0], rel=1e-6)
+    metrics = pool.metrics()
+    assert metrics["completed"] >= 2 and metrics["latency_p99"] >= metrics["solve_p99"] > 0
+
+def test_identical_requests_share_one_solve(pool):
+    before = pool.metrics()
+    first = pool.submit(time.sleep, 0.3)
+    assert pool.submit(time.sleep, 0.3) is first
+    first.result(timeout=30)
+    metrics = pool.metrics()
+    assert metrics["deduplicated"] - before["deduplicated"] == 1
+    assert metrics["completed"] - before["completed"] == 1
+    assert metrics["queue_depth"] == 0
+
+def test_timeout_and_full_queue(pool):
+    pool.solve(time.sleep, 0.0)  # the worker is up
+    running = pool.submit(time.sleep, 0.6)
+    with pytest.raises(TimeoutError):
+        pool.solve(time.sleep, 0.5, timeout=0.1)
+    # The timed-out request may already have been handed to the worker, so it can still hold a place.
+    if pool.metrics()["queue_depth"] < 2:
+        pool.submit(time.sleep, 0.01)
+    with pytest.raises(TimeoutError, match="queue is full"):
+        pool.submit(time.sleep, 0.02, timeout=0.05)
+    running.result(timeout=30)
+    metrics = pool.metrics()
+    assert metrics["timeouts"] >= 1 and metrics["rejected"] >= 1
+    assert metrics["peak_queue_depth"] == 2
+
+def test_concurrent_callers_wait_for_a_free_place(pool):
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(pool.solve(abs, -i))) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == list(range(8))
+
+def test_pooled_runs_inline_without_a_pool():
+    assert configure_solver_pool(0) is None
+    mu, Sigma_nom = generate_market_data(5, 2)
+    solve = pooled(optimize_min_variance_portfolio)
+    assert solve.__wrapped__ is optimize_min_variance_portfolio
+    np.testing.assert_allclose(solve(Sigma_nom, mu, 0.1, 2.0), optimize_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0))
@@ -0,0 +1,80 @@
+import collections
+import pytest
+import numpy as np
+from definition_7413c1b1922e4ad4b2cc1204f66d3390 import Pipeline, analysis_pipeline, optimize_min_variance_portfolio, worst_case_risk, efficient_frontier
+
+@pytest.fixture
+def chain():
+    calls = collections.Counter()
+
+    def stage(name, func):
+        def run(*args):
+            calls[name] += 1
+            return func(*args)
+        return run
+
+    pipeline = Pipeline(a=1, b=2, c=10)
+    pipeline.add_stage("x", stage("x", lambda a: a + 1), ("a",))
+    pipeline.add_stage("y", stage("y", lambda x, b: x * b), ("x", "b"))
+    pipeline.add_stage("z", stage("z", lambda x, c: x + c), ("x", "c"))
+    return pipeline, calls
+
+def test_stages_are_lazy_and_memoized(chain):
+    pipeline, calls = chain
+    assert pipeline.get("y") == 4
+    assert calls == {"x": 1, "y": 1}
+    assert pipeline.get("z") == 12 and pipeline.get("y") == 4
+    assert calls == {"x": 1, "y": 1, "z": 1}
+    assert pipeline.stats == {"computed": 3, "reused": 2}
+
+def test_set_invalidates_only_downstream(chain):
+    pipeline, calls = chain
+    pipeline.get("y"), pipeline.get("z")
+    assert pipeline.set(b=3) == {"y"}
+    assert pipeline.get("y") == 6 and pipeline.get("z") == 12
+    assert calls == {"x": 1, "y": 2, "z": 1}
+    assert pipeline.set(a=1, c=10) == set()
+    assert pipeline.set(a=2) == {"x", "y", "z"}
+    assert not pipeline.is_current("z")
+    assert pipeline.get("z") == 13
+
+def test_undefined_names(chain):
+    pipeline, _ = chain
+    with pytest.raises(ValueError):
+        pipeline.add_stage("w", max, ("x", "missing"))
+    with pytest.raises(ValueError):
+        pipeline.add_stage("x", max, ("a",))
+    with pytest.raises(ValueError):
+        pipeline.set(missing=1)
+    with pytest.raises(ValueError):
+        pipeline.get("missing")
+
+def test_analysis_pipeline_matches_functions():
+    pipeline = analysis_pipeline(n=5, seed=2, target_return=0.1, delta=0.2)
+    mu, Sigma_nom = pipeline.get("mu"), pipeline.get("Sigma_nom")
+    w = pipeline.get("weights")
+    np.testing.assert_allclose(w, optimize_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0))
+    assert pipeline.get("worst_case")[0] == pytest.approx(worst_case_risk(Sigma_nom, w, 0.2)[0])
+    func, args, options = pipeline.arguments("worst_case")
+    assert args[2] == 0.2 and args[1] is w
+
+def test_delta_keeps_the_nominal_stages():
+    pipeline = analysis_pipeline()
+    pipeline.get("weights"), pipeline.get("worst_case_curve"), pipeline.get("exact_distribution")
+    invalidated = pipeline.set(delta=0.3)
+    assert {"worst_case", "robust_portfolio", "exact_distribution", "risk_quantiles", "risk_statistics"} == invalidated
+    assert pipeline.is_current("weights") and pipeline.is_current("worst_case_curve")
+    assert "weights" in pipeline.set(target_return=0.12)
+
+def test_l1_bound_reaches_max_return_and_frontier():
+    pipeline = analysis_pipeline()
+    mu, Sigma_nom = pipeline.get("mu"), pipeline.get("Sigma_nom")
+    assert pipeline.get("max_return") == pytest.approx(np.floor((1.5 * mu.max() - 0.5 * mu.min()) * 100) / 100)
+    pipeline.get("frontier")
+    assert {"max_return", "frontier", "weights"} <= pipeline.set(l1_bound=3.0)
+    max_return = pipeline.get("max_return")
+    assert max_return == pytest.approx(np.floor((2 * mu.max() - mu.min()) * 100) / 100)
+    frontier = pipeline.get("frontier")
+    expected = efficient_frontier(Sigma_nom, mu, target_returns=np.linspace(0.0, max_return, 41), l1_bound=3.0)
+    np.testing.assert_allclose(frontier["risk"], expected["risk"], rtol=1e-4, atol=1e-8)
+    assert np.all(np.sum(np.abs(frontier["weights"][np.isfinite(frontier["risk"])]), axis=1) <= 3.0 + 1e-4)
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+from definition_df1bf81c3c07486a8216a928e62887ea import WhatIfSession, optimize_portfolio, worst_case_risk
+
+@pytest.fixture
+def book():
+    rng = np.random.default_rng(3)
+    n = 60
+    F = rng.normal(size=(n, 4))
+    Sigma = (F @ F.T / 16 + np.diag(rng.uniform(1.0, 2.0, n))) / n
+    return Sigma, rng.uniform(0.0, 0.2, n)
+
+def test_factor_tracks_a_sequence_of_edits(book):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma, mu)
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+        i, j = rng.choice(len(mu), 2, replace=False)
+        session.set_correlation(i, j, rng.uniform(-0.3, 0.3))
+        session.set_volatility(j, rng.uniform(0.5, 2.0) * session.volatility(j))
+    np.testing.assert_allclose(session.factor, np.linalg.cholesky(session.Sigma).T, atol=1e-12)
+    np.testing.assert_allclose(session.Sigma, session.Sigma.T)
+
+def test_volatility_edit(book):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma, mu, gamma=1.0)
+    result = session.set_volatility(7, 2.0 * session.volatility(7))
+    expected = Sigma.copy()
+    expected[7] *= 2.0
+    expected[:, 7] *= 2.0
+    np.testing.assert_allclose(session.Sigma, expected)
+    np.testing.assert_allclose(session.factor, np.linalg.cholesky(expected).T, atol=1e-12)
+    np.testing.assert_allclose(result["weights"], optimize_portfolio(expected, mu, gamma=1.0, backend="native"), atol=1e-10)
+    assert result["nominal_risk"] == pytest.approx(result["weights"] @ expected @ result["weights"])
+
+def test_correlation_edit(book):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma, mu, gamma=1.0)
+    held = np.argsort(session.weights)[-2:]
+    for correlation in (0.4, -0.2):
+        result = session.set_correlation(held[0], held[1], correlation)
+        assert session.correlation(held[0], held[1]) == pytest.approx(correlation)
+        np.testing.assert_allclose(session.factor, np.linalg.cholesky(session.Sigma).T, atol=1e-12)
+        np.testing.assert_allclose(result["weights"], optimize_portfolio(session.Sigma, mu, gamma=1.0, backend="native"), atol=1e-10)
+    np.testing.assert_allclose(np.diag(session.Sigma), np.diag(Sigma))
+
+def test_non_psd_edit_is_rejected(book):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma, mu, gamma=1.0)
+    session.set_correlation(0, 1, 0.4)
+    session.set_correlation(0, 2, 0.4)
+    before, R, w = session.Sigma.copy(), session.factor.copy(), session.weights.copy()
+    with pytest.raises(ValueError):
+        session.set_correlation(1, 2, -0.9)
+    np.testing.assert_array_equal(session.Sigma, before)
+    np.testing.assert_array_equal(session.factor, R)
+    np.testing.assert_array_equal(session.weights, w)
+    with pytest.raises(ValueError):
+        WhatIfSession(np.diag([1.0, -1.0]), np.zeros(2))
+    with pytest.raises(TypeError):
+        WhatIfSession([[1.0]], np.zeros(1))
+
+@pytest.mark.parametrize("delta", [0.001, 0.05])
+def test_worst_case_matches_worst_case_risk(book, delta):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma[:10, :10], mu[:10], gamma=0.5, delta=delta)
+    result = session.set_volatility(2, 1.5 * session.volatility(2))
+    assert result["worst_case_exact"]
+    assert result["worst_case_risk"] == pytest.approx(worst_case_risk(session.Sigma, result["weights"], delta)[0], rel=1e-4)
+    bound = WhatIfSession(Sigma[:10, :10], mu[:10], gamma=0.5, delta=delta, max_sdp_n=0).set_volatility(2, 1.5 * session.volatility(2) / 1.5)
+    assert bound["worst_case_risk"] >= result["worst_case_risk"] * (1 - 1e-6)
+
+def test_edits_with_most_assets_held(book):
+    Sigma, mu = book
+    session = WhatIfSession(Sigma, mu, gamma=200.0)
+    for edit in (lambda: session.set_correlation(3, 5, 0.3), lambda: session.set_volatility(3, 3.0 * session.volatility(3))):
+        result = edit()
+        assert np.count_nonzero(result["weights"]) == len(mu)
+        np.testing.assert_allclose(result["weights"], optimize_portfolio(session.Sigma, mu, gamma=200.0, backend="native"), atol=1e-10)
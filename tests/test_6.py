@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+from definition_48eba96850674f7d82d9881faf74ef98 import calculate_risk_batch, calculate_risk_distribution, sample_portfolio_risks
+
+@pytest.fixture
+def sample_inputs():
+    Sigma_nom = np.array([[0.1, 0.05, 0.02],
+                          [0.05, 0.2, 0.03],
+                          [0.02, 0.03, 0.3]])
+    w = np.array([0.2, 0.3, 0.5])
+    return Sigma_nom, w
+
+def test_calculate_risk_batch_matches_loop(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    Sigmas = Sigma_nom + np.random.uniform(-0.05, 0.05, size=(10, 3, 3))
+    expected = [w @ Sigma @ w for Sigma in Sigmas]
+    assert np.allclose(calculate_risk_batch(Sigmas, w), expected)
+
+def test_calculate_risk_batch_incompatible_shapes(sample_inputs):
+    Sigma_nom, _ = sample_inputs
+    with pytest.raises(ValueError):
+        calculate_risk_batch(np.stack([Sigma_nom, Sigma_nom]), np.array([0.5, 0.5]))
+
+def test_calculate_risk_distribution_list_wrapper(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    risks = calculate_risk_distribution([Sigma_nom, 2 * Sigma_nom], w)
+    assert isinstance(risks, list)
+    assert np.allclose(risks, [w @ Sigma_nom @ w, 2 * w @ Sigma_nom @ w])
+
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_sample_portfolio_risks_within_bounds(sample_inputs, symmetric):
+    Sigma_nom, w = sample_inputs
+    delta = 0.1
+    risks = sample_portfolio_risks(Sigma_nom, w, delta, 1000, symmetric=symmetric, chunk_size=64)
+    nominal = w @ Sigma_nom @ w
+    bound = delta * np.sum(np.abs(w)) ** 2
+    assert risks.shape == (1000,)
+    assert np.all(np.abs(risks - nominal) <= bound + 1e-12)
+
+def test_sample_portfolio_risks_zero_delta(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    risks = sample_portfolio_risks(Sigma_nom, w, 0.0, 5)
+    assert np.allclose(risks, w @ Sigma_nom @ w)
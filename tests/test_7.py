@@ -0,0 +1,53 @@
+import pytest
+import numpy as np
+from definition_136298beeddb4e22a44a2b8793af8c5e import worst_case_risk, solve_worst_case_sdp
+
+@pytest.fixture
+def well_conditioned_inputs():
+    Sigma_nom = np.array([[1.0, 0.1, 0.0],
+                          [0.1, 1.0, 0.2],
+                          [0.0, 0.2, 1.0]])
+    w = np.array([0.5, -0.2, 0.7])
+    return Sigma_nom, w
+
+def test_worst_case_risk_closed_form(well_conditioned_inputs):
+    Sigma_nom, w = well_conditioned_inputs
+    delta = 0.1
+    risk, Delta = worst_case_risk(Sigma_nom, w, delta)
+    expected = w @ Sigma_nom @ w + delta * (np.sum(np.abs(w)) ** 2 - np.sum(w ** 2))
+    assert risk == pytest.approx(expected)
+    assert np.all(np.diag(Delta) == 0)
+    assert np.all(np.abs(Delta) <= delta)
+
+def test_worst_case_risk_matches_sdp(well_conditioned_inputs):
+    Sigma_nom, w = well_conditioned_inputs
+    risk, _ = worst_case_risk(Sigma_nom, w, 0.1)
+    risk_sdp, _ = solve_worst_case_sdp(Sigma_nom, w, 0.1)
+    assert risk == pytest.approx(risk_sdp, rel=1e-4)
+
+def test_worst_case_risk_falls_back_to_sdp():
+    Sigma_nom = np.array([[1.0, 0.99], [0.99, 1.0]])
+    w = np.array([0.5, 0.5])
+    risk, Delta = worst_case_risk(Sigma_nom, w, 0.5)
+    assert np.linalg.eigvalsh(Sigma_nom + Delta).min() >= -1e-6
+    assert risk == pytest.approx(1.0, rel=1e-4)
+
+def test_worst_case_risk_certified_without_factorization(monkeypatch):
+    n = 30
+    Sigma_nom = np.full((n, n), 0.01) + 0.99 * np.eye(n)
+    w = np.full(n, 1.0 / n)
+    def no_cholesky(*args, **kwargs):
+        raise AssertionError("Cholesky attempted")
+    monkeypatch.setattr(np.linalg, "cholesky", no_cholesky)
+    risk, Delta = worst_case_risk(Sigma_nom, w, 0.5)
+    assert risk == pytest.approx(w @ Sigma_nom @ w + 0.5 * (1 - 1 / n))
+    assert np.all(np.diag(Delta) == 0)
+
+def test_worst_case_risk_negative_delta(well_conditioned_inputs):
+    Sigma_nom, w = well_conditioned_inputs
+    with pytest.raises(ValueError):
+        worst_case_risk(Sigma_nom, w, -0.1)
+
+def test_worst_case_risk_incompatible_shapes():
+    with pytest.raises(ValueError):
+        worst_case_risk(np.eye(2), np.array([0.2, 0.3, 0.5]), 0.1)
@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+import plotly.graph_objects as go
+from definition_75d95f73296e4975a91ba6473a3d3bb0 import risk_distribution_exact, sample_portfolio_risks, visualize_risk_distribution
+
+@pytest.fixture
+def sample_inputs():
+    Sigma_nom = np.array([[0.1, 0.05, 0.02],
+                          [0.05, 0.2, 0.03],
+                          [0.02, 0.03, 0.3]])
+    w = np.array([0.2, 0.3, 0.5])
+    return Sigma_nom, w
+
+def test_risk_distribution_exact_cdf(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    result = risk_distribution_exact(Sigma_nom, w, 0.1)
+    assert np.all(np.diff(result["cdf"]) >= 0)
+    assert result["cdf"][0] == pytest.approx(0.0)
+    assert result["cdf"][-1] == pytest.approx(1.0)
+    assert np.all(result["density"] >= 0)
+
+def test_risk_distribution_exact_symmetric_around_nominal(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    result = risk_distribution_exact(Sigma_nom, w, 0.1)
+    nominal = w @ Sigma_nom @ w
+    q = result["quantiles"]
+    assert q[0.5] == pytest.approx(nominal, abs=1e-4)
+    assert q[0.95] - nominal == pytest.approx(nominal - q[0.05], abs=1e-4)
+
+@pytest.mark.parametrize("zero_diagonal", [False, True])
+def test_risk_distribution_exact_matches_sampling(sample_inputs, zero_diagonal):
+    Sigma_nom, w = sample_inputs
+    result = risk_distribution_exact(Sigma_nom, w, 0.1, quantiles=(0.05, 0.95), zero_diagonal=zero_diagonal)
+    risks = sample_portfolio_risks(Sigma_nom, w, 0.1, 200000, zero_diagonal=zero_diagonal)
+    for q in (0.05, 0.95):
+        assert result["quantiles"][q] == pytest.approx(np.quantile(risks, q), abs=5e-4)
+
+def test_risk_distribution_exact_zero_delta(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    result = risk_distribution_exact(Sigma_nom, w, 0.0)
+    assert result["quantiles"][0.99] == pytest.approx(w @ Sigma_nom @ w)
+    assert np.all(np.isfinite(result["density"])) and result["cdf"][-1] == 1.0
+    fig = visualize_risk_distribution(result)
+    assert list(fig.data[0].x) == pytest.approx([w @ Sigma_nom @ w]) and list(fig.data[0].y) == [1.0]
+
+def test_risk_distribution_exact_feeds_visualization(sample_inputs):
+    Sigma_nom, w = sample_inputs
+    fig = visualize_risk_distribution(risk_distribution_exact(Sigma_nom, w, 0.1))
+    assert isinstance(fig, go.Figure)
@@ -0,0 +1,54 @@
+import pytest
+import numpy as np
+from definition_e98d866a88a4465485988a8c12e9e114 import content_cache, generate_market_data, optimize_min_variance_portfolio
+
+def test_content_cache_hits_on_equal_contents():
+    calls = []
+
+    @content_cache(maxsize=4)
+    def total(a, scale=1.0):
+        calls.append(1)
+        return a.sum() * scale
+
+    total(np.arange(3.0))
+    total(np.arange(3.0))
+    total(np.arange(3.0), scale=2.0)
+    info = total.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert len(calls) == 2
+
+def test_content_cache_lru_eviction():
+    @content_cache(maxsize=2)
+    def identity(a):
+        return a.copy()
+
+    for value in (1.0, 2.0, 3.0, 1.0):
+        identity(np.array([value]))
+    info = identity.cache_info()
+    assert info.currsize == 2
+    assert info.misses == 4
+
+def test_content_cache_results_are_read_only():
+    @content_cache()
+    def double(a):
+        return 2 * a
+
+    result = double(np.ones(3))
+    with pytest.raises(ValueError):
+        result[0] = 0.0
+
+def test_content_cache_clear():
+    @content_cache()
+    def double(a):
+        return 2 * a
+
+    double(np.ones(3))
+    double.cache_clear()
+    assert double.cache_info().currsize == 0
+
+def test_optimize_min_variance_portfolio_constraints():
+    mu, Sigma_nom = generate_market_data(5, 2)
+    w = optimize_min_variance_portfolio(Sigma_nom, mu, 0.1, 2.0)
+    assert np.sum(w) == pytest.approx(1.0, abs=1e-6)
+    assert mu.reshape(-1) @ w >= 0.1 - 1e-6
+    assert np.sum(np.abs(w)) <= 2.0 + 1e-6
@@ -0,0 +1,244 @@
+"""Headless worst-case risk analysis over many portfolios.
+
+Reads the nominal covariance matrix, expected returns and a set of portfolio
+weights, runs optimize -> worst-case -> risk-distribution for every portfolio
+across a process pool, and appends one JSON line per portfolio to the output
+as soon as it finishes. Only numpy, pandas and cvxpy are imported; streamlit
+and plotly are never loaded.
+
+Inputs are .npz (arrays "Sigma_nom" or "Sigma", "mu", "weights"), .npy, .csv
+or .parquet. In CSV/Parquet files a non-numeric first column is taken as row
+labels, which name the portfolios of a weights file. A CSV header row is
+detected from the first row (override with --header/--no-header), so plain
+numeric files such as those written by np.savetxt keep their first row.
+Without weights, one minimum-variance portfolio is optimized per
+--target-returns value.
+
+Instead of a covariance matrix, --returns can name a (time, asset) .npy or
+.parquet returns history; Sigma_nom and mu are then estimated from it in a
+single streamed pass (see estimate_covariance).
+
+Usage:
+    python worst_case_batch.py --npz books.npz --output results.jsonl
+    python worst_case_batch.py --sigma sigma.csv --mu mu.csv --weights books.parquet \\
+        --deltas 0.05 0.1 0.2 --workers 8 --output results.jsonl
+    python worst_case_batch.py --returns history.parquet --estimator ewma --halflife 60 --output results.jsonl
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from definitions.definitions import (
+    estimate_covariance, optimize_min_variance_portfolio, risk_distribution_exact, sample_portfolio_risks, worst_case_risk,
+)
+
+_inputs = {}
+
+
+def _is_header(cells):
+    """Whether the first CSV row, given as strings, holds column names rather than numbers.
+
+    The first cell may be a row label, so only the others must be numeric for a
+    data row. pandas writes default column names as bare integers 0..k-1,
+    which are names too; written floats always carry a decimal point or exponent.
+    """
+    import pandas as pd
+    cells = list(cells)
+    numeric = pd.to_numeric(pd.Series(cells, dtype=object), errors="coerce").notna().tolist()
+    if not all(numeric[1:]) or (len(cells) == 1 and not numeric[0]):
+        return True
+    names = [str(i) for i in range(len(cells))]
+    return cells == names or (len(cells) > 1 and cells[1:] == names[:-1])
+
+
+def load_table(path, key=None, header=None):
+    """Loads a float array and optional row labels from .npz, .npy, .csv or .parquet.
+
+    For .npz files the array called key is read, or the only array if there is one.
+    A .csv file may or may not start with a header row; header=None detects it
+    from the first row, True or False forces it.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npz":
+        with np.load(path) as data:
+            if key not in data and len(data.files) == 1:
+                key = data.files[0]
+            return None, np.asarray(data[key], dtype=float)
+    if extension == ".npy":
+        return None, np.load(path).astype(float)
+
+    import pandas as pd
+    if extension == ".csv":
+        if header is None:
+            header = _is_header(pd.read_csv(path, header=None, nrows=1, dtype=str, keep_default_na=False).iloc[0])
+        frame = pd.read_csv(path, header=0 if header else None)
+    elif extension in (".parquet", ".pq"):
+        frame = pd.read_parquet(path)
+    else:
+        raise ValueError(f"Unsupported input format: {path}")
+
+    labels = None
+    if len(frame.columns) and not pd.api.types.is_numeric_dtype(frame.dtypes.iloc[0]):
+        labels = [str(label) for label in frame.iloc[:, 0]]
+        frame = frame.iloc[:, 1:]
+    return labels, frame.to_numpy(dtype=float)
+
+
+def load_inputs(args):
+    """Returns (Sigma_nom, mu, portfolios) with portfolios a list of (name, weights, target return).
+
+    Weights are None, and the target return set, for portfolios still to be optimized.
+    """
+    if args.npz:
+        with np.load(args.npz) as data:
+            Sigma_nom = np.asarray(data["Sigma_nom"] if "Sigma_nom" in data else data["Sigma"], dtype=float)
+            mu = np.asarray(data["mu"], dtype=float).reshape(-1) if "mu" in data else None
+            weights = np.asarray(data["weights"], dtype=float) if "weights" in data else None
+        labels = None
+    else:
+        if args.returns:
+            mu, Sigma_nom = estimate_covariance(args.returns, args.estimator, halflife=args.halflife, return_mean=True)
+        elif args.sigma:
+            _, Sigma_nom = load_table(args.sigma, "Sigma_nom", args.header)
+            mu = None
+        else:
+            raise ValueError("One of --npz, --sigma or --returns is required.")
+        if args.mu:
+            mu = load_table(args.mu, "mu", args.header)[1].reshape(-1)
+        labels, weights = load_table(args.weights, "weights", args.header) if args.weights else (None, None)
+
+    n = Sigma_nom.shape[0]
+    if Sigma_nom.ndim != 2 or Sigma_nom.shape[1] != n:
+        raise ValueError("Sigma_nom must be a square matrix.")
+    if mu is not None and len(mu) != n:
+        raise ValueError("mu and Sigma_nom must have compatible dimensions.")
+
+    portfolios = []
+    if weights is not None:
+        weights = np.atleast_2d(weights)
+        if weights.shape[1] != n:
+            raise ValueError("Each weight set must have one entry per asset.")
+        labels = labels or [str(i) for i in range(len(weights))]
+        portfolios += [(label, w, None) for label, w in zip(labels, weights)]
+    if weights is None or args.optimize:
+        if mu is None:
+            raise ValueError("mu is required to optimize portfolios.")
+        portfolios += [(f"min_variance@{target:g}", None, target) for target in args.target_returns]
+    return Sigma_nom, mu, portfolios
+
+
+def _init_worker(Sigma_nom, mu):
+    # Inputs are sent once per worker instead of once per portfolio.
+    _inputs["Sigma_nom"] = Sigma_nom
+    _inputs["mu"] = mu
+
+
+def analyze_portfolio(name, w, target_return, options):
+    """Runs optimize -> worst-case -> risk distribution for one portfolio and returns a JSON-serializable record."""
+    start = time.perf_counter()
+    Sigma_nom, mu = _inputs["Sigma_nom"], _inputs["mu"]
+    record = {"portfolio": name}
+    try:
+        if w is None:
+            w = optimize_min_variance_portfolio(Sigma_nom, mu, target_return, options["l1_bound"])
+        w = np.asarray(w, dtype=float).reshape(-1)
+        nominal_risk = float(w @ Sigma_nom @ w)
+        record.update(weights=w.tolist(), nominal_risk=nominal_risk, nominal_std=float(np.sqrt(max(nominal_risk, 0.0))))
+        if mu is not None:
+            record["expected_return"] = float(mu @ w)
+
+        record["worst_case"] = []
+        record["distribution"] = []
+        for delta in options["deltas"]:
+            risk, _ = worst_case_risk(Sigma_nom, w, delta)
+            record["worst_case"].append({"delta": delta, "risk": risk, "std": float(np.sqrt(max(risk, 0.0)))})
+            if options["method"] == "exact":
+                quantiles = risk_distribution_exact(Sigma_nom, w, delta, quantiles=options["quantiles"])["quantiles"]
+                record["distribution"].append({"delta": delta, "quantiles": {f"{q:g}": float(v) for q, v in quantiles.items()}})
+            else:
+                risks = sample_portfolio_risks(Sigma_nom, w, delta, options["num_samples"], rng=options["seed"])
+                values = np.quantile(risks, options["quantiles"])
+                record["distribution"].append({"delta": delta, "mean": float(np.mean(risks)),
+                                               "quantiles": {f"{q:g}": float(v) for q, v in zip(options["quantiles"], values)}})
+        record["status"] = "ok"
+    except Exception as error:  # one bad book must not stop the batch
+        record.update(status="error", error=f"{type(error).__name__}: {error}")
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def run_batch(Sigma_nom, mu, portfolios, options, out, max_workers=None):
+    """Analyzes every portfolio and writes each record to out as it completes. Returns the number of failures."""
+    failures = 0
+
+    def emit(record):
+        nonlocal failures
+        failures += record["status"] != "ok"
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(portfolios))
+    if max_workers <= 1:
+        _init_worker(Sigma_nom, mu)
+        for portfolio in portfolios:
+            emit(analyze_portfolio(*portfolio, options))
+        return failures
+
+    # spawn rather than fork: cvxpy and BLAS thread pools do not survive a fork.
+    with concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker, initargs=(Sigma_nom, mu)) as executor:
+        futures = [executor.submit(analyze_portfolio, *portfolio, options) for portfolio in portfolios]
+        for future in concurrent.futures.as_completed(futures):
+            emit(future.result())
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npz", help="npz file with Sigma_nom (or Sigma), mu and weights arrays")
+    parser.add_argument("--sigma", help="nominal covariance matrix file")
+    parser.add_argument("--returns", help="returns history (.npy or .parquet, one row per period) to estimate Sigma_nom and mu from")
+    parser.add_argument("--estimator", choices=["sample", "ledoit_wolf", "ewma"], default="ledoit_wolf",
+                        help="covariance estimator for --returns")
+    parser.add_argument("--halflife", type=float, default=60.0, help="EWMA half-life in periods")
+    parser.add_argument("--mu", help="expected returns file")
+    parser.add_argument("--weights", help="weight sets, one portfolio per row")
+    parser.add_argument("--header", action=argparse.BooleanOptionalAction,
+                        help="whether .csv inputs start with a header row (default: detect from the first row)")
+    parser.add_argument("--optimize", action="store_true", help="also optimize min-variance portfolios when weights are given")
+    parser.add_argument("--target-returns", type=float, nargs="+", default=[0.1], help="target returns of the optimized portfolios")
+    parser.add_argument("--l1-bound", type=float, default=2.0, help="L1 bound of the optimized portfolios")
+    parser.add_argument("--deltas", type=float, nargs="+", default=[0.1], help="uncertainty parameters to evaluate")
+    parser.add_argument("--method", choices=["exact", "monte-carlo"], default="exact", help="risk distribution method")
+    parser.add_argument("--samples", type=int, default=10000, help="Monte Carlo samples per delta")
+    parser.add_argument("--quantiles", type=float, nargs="+", default=[0.05, 0.5, 0.95], help="risk quantiles to report")
+    parser.add_argument("--seed", type=int, default=0, help="seed for Monte Carlo sampling")
+    parser.add_argument("--workers", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--output", default="-", help="JSON-lines output path, or - for stdout")
+    args = parser.parse_args(argv)
+
+    Sigma_nom, mu, portfolios = load_inputs(args)
+    options = {"deltas": args.deltas, "method": args.method, "num_samples": args.samples,
+               "quantiles": tuple(args.quantiles), "seed": args.seed, "l1_bound": args.l1_bound}
+
+    if args.output == "-":
+        failures = run_batch(Sigma_nom, mu, portfolios, options, sys.stdout, args.workers)
+    else:
+        with open(args.output, "w") as out:
+            failures = run_batch(Sigma_nom, mu, portfolios, options, out, args.workers)
+    if failures:
+        print(f"{failures} of {len(portfolios)} portfolios failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())